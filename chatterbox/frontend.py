@@ -0,0 +1,79 @@
+"""
+Reference-audio frontend.
+
+Preparing conditionals used to decode the reference twice with librosa (24 kHz and
+16 kHz), resample it a third time inside `S3Gen.embed_ref`, and run the voice
+encoder's mel on the CPU in numpy. `ReferenceFrontend` decodes a clip once,
+resamples it once per model rate on the target device, and derives every encoder
+input from those two waveforms (filterbanks and windows are cached per device in
+`s3gen.utils.mel` and `voice_encoder.melspec`).
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Union
+
+import librosa
+import numpy as np
+import torch
+
+from .models.s3tokenizer import S3_SR
+from .models.s3gen import S3GEN_SR
+from .models.utils import get_resampler
+
+
+@dataclass
+class ReferenceAudio:
+    """A reference clip decoded once and resampled to both model rates, as 1-D tensors on the frontend device."""
+    wav_24k: torch.Tensor
+    wav_16k: torch.Tensor
+
+
+class ReferenceFrontend:
+    def __init__(self, device):
+        self.device = device
+
+    def resample(self, wav: torch.Tensor, src_sr: int, dst_sr: int) -> torch.Tensor:
+        if src_sr == dst_sr:
+            return wav
+        return get_resampler(src_sr, dst_sr, self.device)(wav)
+
+    def load(self, wav: Union[str, Path, np.ndarray, torch.Tensor], sr: int = None) -> ReferenceAudio:
+        """Decode `wav` (a path, or an array at rate `sr`) once at its native rate and resample to 24 kHz and 16 kHz."""
+        if isinstance(wav, (str, Path)):
+            wav, sr = librosa.load(wav, sr=None, mono=True)
+        elif sr is None:
+            raise ValueError("`sr` is required when passing a waveform array to ReferenceFrontend.load")
+
+        if isinstance(wav, np.ndarray):
+            wav = torch.from_numpy(np.ascontiguousarray(wav))
+        wav = wav.float().to(self.device)
+        if wav.dim() > 1:
+            wav = wav.reshape(-1)
+
+        return ReferenceAudio(
+            wav_24k=self.resample(wav, sr, S3GEN_SR),
+            wav_16k=self.resample(wav, sr, S3_SR),
+        )
+
+    def s3gen_ref_dict(self, s3gen, ref: ReferenceAudio, dec_cond_len: int) -> dict:
+        """S3Gen conditioning (prompt tokens, prompt mel, x-vector) from the first `dec_cond_len` 24 kHz samples."""
+        wav_24k = ref.wav_24k[:dec_cond_len]
+        n_16k = int(wav_24k.shape[-1] * S3_SR / S3GEN_SR)
+        return s3gen.embed_ref(wav_24k, S3GEN_SR, device=self.device, ref_wav_16=ref.wav_16k[:n_16k])
+
+    def s3gen_ref_dicts(self, s3gen, refs, dec_cond_len: int) -> list:
+        """`s3gen_ref_dict` for many references, with the x-vectors and prompt tokens computed as one batch."""
+        wavs_24k = [ref.wav_24k[:dec_cond_len] for ref in refs]
+        wavs_16k = [ref.wav_16k[:int(wav.shape[-1] * S3_SR / S3GEN_SR)] for ref, wav in zip(refs, wavs_24k)]
+        return s3gen.embed_ref_batch(wavs_24k, wavs_16k, device=self.device)
+
+    def speech_prompt_tokens(self, tokenizer, ref: ReferenceAudio, enc_cond_len: int, max_len: int) -> torch.Tensor:
+        """T3 speech-prompt tokens, (1, <=max_len), from the first `enc_cond_len` 16 kHz samples."""
+        tokens, _ = tokenizer.forward([ref.wav_16k[:enc_cond_len]], max_len=max_len)
+        return torch.atleast_2d(tokens[0]).to(self.device)
+
+    def speaker_embedding(self, ve, ref: ReferenceAudio, trim_top_db: float = 20, rate: float = 1.3) -> torch.Tensor:
+        """VoiceEncoder speaker embedding, (1, E), with trimming and the mel computed on-device."""
+        assert ve.hp.sample_rate == S3_SR, "VoiceEncoder is expected to run at the S3 tokenizer rate"
+        embeds = ve.embeds_from_wav_tensors([ref.wav_16k], S3_SR, trim_top_db=trim_top_db, rate=rate)
+        return torch.from_numpy(embeds).to(self.device)
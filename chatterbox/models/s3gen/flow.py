@@ -13,6 +13,7 @@
 # limitations under the License.
 import logging
 import random
+import weakref
 from typing import Dict, Optional
 import torch
 import torch.nn as nn
@@ -193,6 +194,51 @@ class CausalMaskedDiffWithXvec(torch.nn.Module):
         # FIXME: this was missing - just putting it in as false
         self.fp16 = False
 
+        # prompt-side tensors of the last reference seen by `inference`, see `_prompt_conditioning`
+        self._prompt_cache = None
+
+    def clear_prompt_cache(self):
+        self._prompt_cache = None
+
+    @torch.inference_mode()
+    def _prompt_conditioning(self, prompt_token, prompt_feat, embedding):
+        """
+        Everything `inference` derives from the reference alone: the embedded prompt
+        tokens, the projected speaker vector and the prompt mel conditioning.
+
+        A chatterbox voice keeps the same `ref_dict` tensors for every chunk, so the
+        result is cached against the identity of those tensors (held by weak reference,
+        so a replaced or freed reference is never matched by accident).
+
+        NOTE: the encoder states of the prompt region are not cached. The encoder runs
+        with `static_chunk_size=0` (full bidirectional attention) plus a lookahead conv,
+        so prompt frames depend on the chunk tokens and caching them would not be exact.
+        """
+        cache = self._prompt_cache
+        sources = (prompt_token, prompt_feat, embedding)
+        if cache is not None and cache["fp16"] == self.fp16 and all(ref() is src for ref, src in zip(cache["refs"], sources)):
+            return cache
+
+        if self.fp16 is True:
+            prompt_feat = prompt_feat.half()
+            embedding = embedding.half()
+
+        # xvec projection
+        embedding = F.normalize(embedding, dim=1)
+        embedding = self.spk_embed_affine_layer(embedding)
+
+        cache = dict(
+            refs=tuple(weakref.ref(src) for src in sources),
+            fp16=self.fp16,
+            embedding=embedding,
+            prompt_token_emb=self.input_embedding(torch.clamp(prompt_token, min=0)),
+            # (1, 80, mel_len1), right-padded with zeros per chunk in `inference`
+            prompt_cond=prompt_feat.to(self.encoder_proj.weight.dtype).transpose(1, 2).contiguous(),
+            mel_len1=prompt_feat.shape[1],
+        )
+        self._prompt_cache = cache
+        return cache
+
     @torch.inference_mode()
     def inference(self,
                   token,
@@ -203,31 +249,25 @@ class CausalMaskedDiffWithXvec(torch.nn.Module):
                   prompt_feat_len,
                   embedding,
                   finalize):
-        if self.fp16 is True:
-            prompt_feat = prompt_feat.half()
-            embedding = embedding.half()
-
         assert token.shape[0] == 1
-        # xvec projection
-        embedding = F.normalize(embedding, dim=1)
-        embedding = self.spk_embed_affine_layer(embedding)
+        prompt = self._prompt_conditioning(prompt_token, prompt_feat, embedding)
+        embedding = prompt["embedding"]
 
-        # concat text and prompt_text
-        token, token_len = torch.concat([prompt_token, token], dim=1), prompt_token_len + token_len
+        # concat text and prompt_text (the prompt part is already embedded)
+        token_len = prompt_token_len + token_len
         mask = (~make_pad_mask(token_len)).unsqueeze(-1).to(embedding)
-        token = self.input_embedding(torch.clamp(token, min=0)) * mask
+        token = torch.concat([prompt["prompt_token_emb"], self.input_embedding(torch.clamp(token, min=0))], dim=1) * mask
 
         # text encode
         h, h_lengths = self.encoder(token, token_len)
         if finalize is False:
             h = h[:, :-self.pre_lookahead_len * self.token_mel_ratio]
-        mel_len1, mel_len2 = prompt_feat.shape[1], h.shape[1] - prompt_feat.shape[1]
+        mel_len1 = prompt["mel_len1"]
+        mel_len2 = h.shape[1] - mel_len1
         h = self.encoder_proj(h)
 
         # get conditions
-        conds = torch.zeros([1, mel_len1 + mel_len2, self.output_size], device=token.device).to(h.dtype)
-        conds[:, :mel_len1] = prompt_feat
-        conds = conds.transpose(1, 2)
+        conds = F.pad(prompt["prompt_cond"].to(h.dtype), (0, mel_len2))
 
         mask = (~make_pad_mask(torch.tensor([mel_len1 + mel_len2]))).to(h)
         feat, _ = self.decoder(
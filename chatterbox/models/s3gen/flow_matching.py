@@ -135,6 +135,9 @@ class ConditionalCFM(BASECFM):
     def forward_estimator(self, x, mask, mu, t, spks, cond):
         if isinstance(self.estimator, torch.nn.Module):
             return self.estimator.forward(x, mask, mu, t, spks, cond)
+        elif not hasattr(self.estimator, "execute_v2"):
+            # callable runtime backends, e.g. onnx_estimator.OnnxEstimator
+            return self.estimator(x, mask, mu, t, spks, cond)
         else:
             with self.lock:
                 self.estimator.set_input_shape('x', (2, 80, x.size(2)))
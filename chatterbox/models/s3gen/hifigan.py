@@ -24,7 +24,8 @@ import torch
 import torch.nn.functional as F
 from torch.nn import Conv1d
 from torch.nn import ConvTranspose1d
-from torch.nn.utils import remove_weight_norm
+from torch.nn.utils import remove_weight_norm as _legacy_remove_weight_norm
+from torch.nn.utils import parametrize
 from torch.nn.utils.parametrizations import weight_norm
 from torch.distributions.uniform import Uniform
 from torch import nn, sin, pow
@@ -69,6 +70,20 @@ class Snake(nn.Module):
         self.alpha.requires_grad = alpha_trainable
 
         self.no_div_by_zero = 0.000000001
+        self.fused = False
+
+    def fuse(self):
+        '''
+        Precompute the [1, C, 1] alpha and 1/alpha terms so inference only runs
+        the elementwise sin^2 kernel. Call again if alpha is changed afterwards.
+        '''
+        with torch.no_grad():
+            alpha = self.alpha.detach().unsqueeze(0).unsqueeze(-1)
+            if self.alpha_logscale:
+                alpha = torch.exp(alpha)
+            self.register_buffer("alpha_fused", alpha.clone(), persistent=False)
+            self.register_buffer("inv_alpha_fused", 1.0 / (alpha + self.no_div_by_zero), persistent=False)
+        self.fused = True
 
     def forward(self, x):
         '''
@@ -76,6 +91,9 @@ class Snake(nn.Module):
         Applies the function to the input elementwise.
         Snake ∶= x + 1/a * sin^2 (xa)
         '''
+        if self.fused and not self.training:
+            return snake_fused(x, self.alpha_fused, self.inv_alpha_fused)
+
         alpha = self.alpha.unsqueeze(0).unsqueeze(-1) # line up with x to [B, C, T]
         if self.alpha_logscale:
             alpha = torch.exp(alpha)
@@ -84,6 +102,20 @@ class Snake(nn.Module):
         return x
 
 
+@torch.jit.script
+def snake_fused(x: torch.Tensor, alpha: torch.Tensor, inv_alpha: torch.Tensor) -> torch.Tensor:
+    # scripted so the TorchScript fuser can emit a single elementwise kernel
+    return x + inv_alpha * torch.sin(x * alpha).pow(2)
+
+
+
+def remove_weight_norm(module):
+    """Fold weight norm into `module.weight`, for both the parametrization and legacy hook APIs."""
+    if parametrize.is_parametrized(module, "weight"):
+        parametrize.remove_parametrizations(module, "weight", leave_parametrized=True)
+    elif hasattr(module, "weight_g"):
+        _legacy_remove_weight_norm(module)
+
 
 def get_padding(kernel_size, dilation=1):
     return int((kernel_size * dilation - dilation) / 2)
@@ -204,9 +236,9 @@ class SineGen(torch.nn.Module):
         :return: [B, 1, sample_len]
         """
 
-        F_mat = torch.zeros((f0.size(0), self.harmonic_num + 1, f0.size(-1))).to(f0.device)
-        for i in range(self.harmonic_num + 1):
-            F_mat[:, i: i + 1, :] = f0 * (i + 1) / self.sampling_rate
+        # all harmonics at once: [B, 1, T] * [1, H+1, 1] -> [B, H+1, T]
+        harmonics = torch.arange(1, self.harmonic_num + 2, device=f0.device, dtype=f0.dtype).view(1, -1, 1)
+        F_mat = f0 * harmonics / self.sampling_rate
 
         theta_mat = 2 * np.pi * (torch.cumsum(F_mat, dim=-1) % 1)
         u_dist = Uniform(low=-np.pi, high=np.pi)
@@ -376,8 +408,14 @@ class HiFTGenerator(nn.Module):
         self.ups.apply(init_weights)
         self.conv_post.apply(init_weights)
         self.reflection_pad = nn.ReflectionPad1d((1, 0))
-        self.stft_window = torch.from_numpy(get_window("hann", istft_params["n_fft"], fftbins=True).astype(np.float32))
+        # non-persistent buffer: follows the module across devices without entering the state dict
+        self.register_buffer(
+            "stft_window",
+            torch.from_numpy(get_window("hann", istft_params["n_fft"], fftbins=True).astype(np.float32)),
+            persistent=False,
+        )
         self.f0_predictor = f0_predictor
+        self.inference_optimized = False
 
     def remove_weight_norm(self):
         print('Removing weight norm...')
@@ -387,16 +425,34 @@ class HiFTGenerator(nn.Module):
             l.remove_weight_norm()
         remove_weight_norm(self.conv_pre)
         remove_weight_norm(self.conv_post)
-        self.m_source.remove_weight_norm()
         for l in self.source_downs:
             remove_weight_norm(l)
         for l in self.source_resblocks:
             l.remove_weight_norm()
+        if self.f0_predictor is not None:
+            for l in self.f0_predictor.modules():
+                remove_weight_norm(l)
+
+    def optimize_for_inference(self):
+        """
+        Prepare the generator for inference only: fold weight norm into plain conv
+        weights and fuse the Snake activations. Must be called after the checkpoint
+        is loaded; the module can no longer be trained or re-loaded afterwards.
+        """
+        if self.inference_optimized:
+            return self
+        self.eval()
+        self.remove_weight_norm()
+        for m in self.modules():
+            if isinstance(m, Snake):
+                m.fuse()
+        self.inference_optimized = True
+        return self
 
     def _stft(self, x):
         spec = torch.stft(
             x,
-            self.istft_params["n_fft"], self.istft_params["hop_len"], self.istft_params["n_fft"], window=self.stft_window.to(x.device),
+            self.istft_params["n_fft"], self.istft_params["hop_len"], self.istft_params["n_fft"], window=self.stft_window,
             return_complex=True)
         spec = torch.view_as_real(spec)  # [B, F, TT, 2]
         return spec[..., 0], spec[..., 1]
@@ -406,7 +462,7 @@ class HiFTGenerator(nn.Module):
         real = magnitude * torch.cos(phase)
         img = magnitude * torch.sin(phase)
         inverse_transform = torch.istft(torch.complex(real, img), self.istft_params["n_fft"], self.istft_params["hop_len"],
-                                        self.istft_params["n_fft"], window=self.stft_window.to(magnitude.device))
+                                        self.istft_params["n_fft"], window=self.stft_window)
         return inverse_transform
 
     def decode(self, x: torch.Tensor, s: torch.Tensor = torch.zeros(1, 1, 0)) -> torch.Tensor:
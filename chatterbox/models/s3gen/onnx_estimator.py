@@ -0,0 +1,217 @@
+"""
+ONNX export and onnxruntime execution of the CFM estimator (`ConditionalDecoder`).
+
+`ConditionalCFM.forward_estimator` calls any non-`nn.Module` estimator as
+`estimator(x, mask, mu, t, spks, cond)`, so an `OnnxEstimator` can be dropped in
+for the torch module once the checkpoint has been loaded.
+
+Export (and check parity against the torch estimator) from the command line:
+
+    python -m chatterbox.models.s3gen.onnx_estimator --out estimator.onnx --check
+"""
+import argparse
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+import torch
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+
+ONNX_CACHE_DIR = Path(os.getenv("XDG_CACHE_HOME", Path.home() / ".cache")) / "chatterbox_onnx"
+ESTIMATOR_INPUT_NAMES = ["x", "mask", "mu", "t", "spks", "cond"]
+ESTIMATOR_OUTPUT_NAMES = ["dphi_dt"]
+
+
+def _dummy_estimator_inputs(n_frames: int, device="cpu", dtype=torch.float32, seed: int = 0):
+    """Inputs shaped like the CFG batch built in `ConditionalCFM.solve_euler` (batch of 2, 80 mel bins)."""
+    g = torch.Generator(device="cpu").manual_seed(seed)
+    x = torch.randn(2, 80, n_frames, generator=g)
+    mask = torch.ones(2, 1, n_frames)
+    mu = torch.randn(2, 80, n_frames, generator=g)
+    t = torch.rand(2, generator=g)
+    spks = torch.randn(2, 80, generator=g)
+    cond = torch.randn(2, 80, n_frames, generator=g)
+    return tuple(v.to(device=device, dtype=dtype) for v in (x, mask, mu, t, spks, cond))
+
+
+@torch.no_grad()
+def _partial_path(path: Path) -> Path:
+    """A per-process scratch file beside `path`, moved over it with `os.replace` once complete."""
+    return path.with_name(f".{path.name}.{os.getpid()}.partial")
+
+
+def export_estimator_onnx(estimator: torch.nn.Module, onnx_path, opset_version: int = 17, n_frames: int = 256):
+    """
+    Export a loaded `ConditionalDecoder` to ONNX with a dynamic time axis on every
+    time-varying input and on the output. The batch axis is fixed at 2 (cond/uncond).
+
+    The export is written to a scratch file and moved into place, so workers exporting
+    the same file concurrently never open a half-written one.
+    """
+    onnx_path = Path(onnx_path)
+    onnx_path.parent.mkdir(parents=True, exist_ok=True)
+    partial = _partial_path(onnx_path)
+
+    was_training = estimator.training
+    estimator.eval()
+    device = next(estimator.parameters()).device
+    dummy_inputs = _dummy_estimator_inputs(n_frames, device=device)
+    dynamic_axes = {
+        "x": {2: "T"},
+        "mask": {2: "T"},
+        "mu": {2: "T"},
+        "cond": {2: "T"},
+        "dphi_dt": {2: "T"},
+    }
+    try:
+        torch.onnx.export(
+            estimator,
+            dummy_inputs,
+            str(partial),
+            input_names=ESTIMATOR_INPUT_NAMES,
+            output_names=ESTIMATOR_OUTPUT_NAMES,
+            dynamic_axes=dynamic_axes,
+            opset_version=opset_version,
+            do_constant_folding=True,
+        )
+        os.replace(partial, onnx_path)
+    finally:
+        partial.unlink(missing_ok=True)
+        estimator.train(was_training)
+    logging.info(f"Exported CFM estimator to {onnx_path}")
+    return onnx_path
+
+
+class OnnxEstimator:
+    """
+    onnxruntime drop-in for the CFM estimator.
+
+    Called with the same torch tensors as `ConditionalDecoder.forward` and returns a
+    torch tensor on the device/dtype of `x`, so the Euler solver is unchanged.
+    """
+
+    def __init__(self, onnx_path, providers: Optional[Sequence[str]] = None, num_threads: int = 0):
+        if ort is None:
+            raise ImportError("onnxruntime is required for the ONNX estimator backend (pip install onnxruntime).")
+
+        sess_options = ort.SessionOptions()
+        sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            sess_options.intra_op_num_threads = num_threads
+        self.onnx_path = str(onnx_path)
+        self.session = ort.InferenceSession(
+            self.onnx_path,
+            sess_options=sess_options,
+            providers=list(providers or ["CPUExecutionProvider"]),
+        )
+
+    def __call__(self, x, mask, mu, t, spks, cond):
+        feeds = {
+            name: tensor.detach().to("cpu", torch.float32).contiguous().numpy()
+            for name, tensor in zip(ESTIMATOR_INPUT_NAMES, (x, mask, mu, t, spks, cond))
+        }
+        out, = self.session.run(ESTIMATOR_OUTPUT_NAMES, feeds)
+        return torch.from_numpy(out).to(device=x.device, dtype=x.dtype)
+
+
+@torch.no_grad()
+def check_estimator_parity(
+    torch_estimator: torch.nn.Module,
+    onnx_estimator: OnnxEstimator,
+    lengths: Sequence[int] = (50, 173, 512),
+    atol: float = 1e-3,
+):
+    """
+    Run both estimators on random inputs of several lengths (exercising the dynamic
+    time axis) and return the max absolute difference per length. Raises if any
+    length exceeds `atol`.
+    """
+    torch_estimator.eval()
+    device = next(torch_estimator.parameters()).device
+    diffs = {}
+    for n_frames in lengths:
+        inputs = _dummy_estimator_inputs(n_frames, device=device, seed=n_frames)
+        ref = torch_estimator(*inputs).float().cpu()
+        out = onnx_estimator(*inputs).float().cpu()
+        diffs[n_frames] = (ref - out).abs().max().item()
+    worst = max(diffs.values())
+    if worst > atol:
+        raise AssertionError(f"ONNX estimator diverges from torch estimator: max |diff| per length = {diffs}")
+    return diffs
+
+
+def estimator_fingerprint(estimator: torch.nn.Module) -> str:
+    """Short hash of the estimator's weights, so an export is never reused for a different checkpoint."""
+    h = hashlib.sha256()
+    for name, tensor in sorted(estimator.state_dict().items()):
+        h.update(name.encode())
+        h.update(tensor.detach().to("cpu").contiguous().view(torch.uint8).numpy().tobytes())
+    return h.hexdigest()[:16]
+
+
+def load_onnx_estimator(torch_estimator: torch.nn.Module, onnx_path=None, **kwargs) -> OnnxEstimator:
+    """
+    Export `torch_estimator` unless an export of these exact weights exists, then open an onnxruntime
+    session on it. The default cache file is named after the weights' fingerprint; an explicit
+    `onnx_path` records it in a `.sha256` file beside the export. Both files are replaced atomically,
+    the stamp last, so a stamp that matches always describes the export next to it.
+    """
+    fingerprint = estimator_fingerprint(torch_estimator)
+    if onnx_path:
+        onnx_path = Path(onnx_path)
+        stamp = onnx_path.with_name(onnx_path.name + ".sha256")
+        stale = not onnx_path.exists() or not stamp.exists() or stamp.read_text().strip() != fingerprint
+        if stale:
+            export_estimator_onnx(torch_estimator, onnx_path)
+            partial = _partial_path(stamp)
+            try:
+                partial.write_text(fingerprint)
+                os.replace(partial, stamp)
+            finally:
+                partial.unlink(missing_ok=True)
+    else:
+        onnx_path = ONNX_CACHE_DIR / f"s3gen_estimator_{fingerprint}.onnx"
+        if not onnx_path.exists():
+            export_estimator_onnx(torch_estimator, onnx_path)
+    return OnnxEstimator(onnx_path, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the S3Gen CFM estimator to ONNX.")
+    parser.add_argument("--ckpt_dir", type=str, default=None, help="Directory containing s3gen.pt. Downloads from the hub if omitted.")
+    parser.add_argument("--out", type=str, default=str(ONNX_CACHE_DIR / "s3gen_estimator.onnx"), help="Output .onnx path.")
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--check", action="store_true", help="Check numerical parity against the torch estimator after export.")
+    args = parser.parse_args()
+
+    from huggingface_hub import hf_hub_download
+    from .s3gen import S3Token2Wav
+
+    if args.ckpt_dir:
+        ckpt_path = Path(args.ckpt_dir) / "s3gen.pt"
+    else:
+        ckpt_path = Path(hf_hub_download(repo_id="ResembleAI/chatterbox", filename="s3gen.pt"))
+
+    s3gen = S3Token2Wav()
+    s3gen.load_state_dict(torch.load(ckpt_path, map_location="cpu"))
+    estimator = s3gen.flow.decoder.estimator.eval()
+
+    export_estimator_onnx(estimator, args.out, opset_version=args.opset)
+    print(f"Exported estimator to {args.out}")
+
+    if args.check:
+        diffs = check_estimator_parity(estimator, OnnxEstimator(args.out))
+        for n_frames, diff in diffs.items():
+            print(f"  T={n_frames}: max |torch - onnx| = {diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
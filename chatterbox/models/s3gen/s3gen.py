@@ -16,12 +16,11 @@ import logging
 
 import numpy as np
 import torch
-import torchaudio as ta
-from functools import lru_cache
-from typing import Optional
+from typing import List, Optional
 from omegaconf import DictConfig
 
 from ..s3tokenizer import S3_SR, SPEECH_VOCAB_SIZE, S3Tokenizer
+from ..utils import get_resampler
 from .const import S3GEN_SR
 from .flow import CausalMaskedDiffWithXvec
 from .xvector import CAMPPlus
@@ -38,20 +37,24 @@ def drop_invalid_tokens(x):
     return x[x < SPEECH_VOCAB_SIZE]
 
 
-# TODO: global resampler cache
-@lru_cache(100)
-def get_resampler(src_sr, dst_sr, device):
-    return ta.transforms.Resample(src_sr, dst_sr).to(device)
-
-
 class S3Token2Mel(torch.nn.Module):
     """
     CosyVoice2's CFM decoder maps S3 speech tokens to mel-spectrograms.
 
     TODO: make these modules configurable?
+
+    `estimator_backend` selects how the CFM estimator runs: "torch" (default) or
+    "onnxruntime", which exports the loaded estimator to `estimator_onnx_path`
+    (if missing) and runs it through onnxruntime on the CPU.
     """
-    def __init__(self):
+    ESTIMATOR_BACKENDS = ("torch", "onnxruntime")
+
+    def __init__(self, estimator_backend: str = "torch", estimator_onnx_path: Optional[str] = None):
         super().__init__()
+        if estimator_backend not in self.ESTIMATOR_BACKENDS:
+            raise ValueError(f"Unknown estimator backend '{estimator_backend}', expected one of {self.ESTIMATOR_BACKENDS}")
+        self.estimator_backend = estimator_backend
+        self.estimator_onnx_path = estimator_onnx_path
         self.tokenizer = S3Tokenizer("speech_tokenizer_v2_25hz")
         self.mel_extractor = mel_spectrogram # TODO: make it a torch module?
         self.speaker_encoder = CAMPPlus()  # use default args
@@ -108,16 +111,42 @@ class S3Token2Mel(torch.nn.Module):
 
     @property
     def device(self):
-        params = self.tokenizer.parameters()
+        # Not the tokenizer: conditioning encoders may be offloaded to the meta device (see chatterbox/offload.py).
+        params = self.flow.parameters()
         return next(params).device
 
+    def load_state_dict(self, state_dict, strict: bool = True, **kwargs):
+        result = super().load_state_dict(state_dict, strict=strict, **kwargs)
+        # runtime backends are built from the loaded torch weights, so swap them in only now
+        if self.estimator_backend == "onnxruntime":
+            self.use_onnx_estimator(self.estimator_onnx_path)
+        return result
+
+    def use_onnx_estimator(self, onnx_path=None, **kwargs):
+        """Replace the torch CFM estimator with an onnxruntime session (exporting it first if needed)."""
+        from .onnx_estimator import load_onnx_estimator
+
+        decoder = self.flow.decoder
+        if not isinstance(decoder.estimator, torch.nn.Module):
+            return decoder.estimator
+        decoder.estimator = load_onnx_estimator(decoder.estimator.eval(), onnx_path, **kwargs)
+        self.estimator_backend = "onnxruntime"
+        return decoder.estimator
+
     def embed_ref(
         self,
         ref_wav: torch.Tensor,
         ref_sr: int,
         device="auto",
         ref_fade_out=True,
+        ref_wav_16: Optional[torch.Tensor] = None,
     ):
+        """
+        Build the S3Gen `ref_dict` for a reference clip.
+
+        `ref_wav_16` may carry the same clip already resampled to 16 kHz (see
+        `chatterbox.frontend.ReferenceFrontend`), which skips resampling here.
+        """
         device = self.device if device == "auto" else device
         if isinstance(ref_wav, np.ndarray):
             ref_wav = torch.from_numpy(ref_wav).float()
@@ -139,7 +168,14 @@ class S3Token2Mel(torch.nn.Module):
         ref_mels_24_len = None
 
         # Resample to 16kHz
-        ref_wav_16 = get_resampler(ref_sr, S3_SR, device)(ref_wav).to(device)
+        if ref_wav_16 is None:
+            ref_wav_16 = get_resampler(ref_sr, S3_SR, device)(ref_wav)
+        else:
+            if isinstance(ref_wav_16, np.ndarray):
+                ref_wav_16 = torch.from_numpy(ref_wav_16).float()
+            if ref_wav_16.dim() == 1:
+                ref_wav_16 = ref_wav_16.unsqueeze(0)
+        ref_wav_16 = ref_wav_16.to(device)
 
         # Speaker embedding
         ref_x_vector = self.speaker_encoder.inference(ref_wav_16)
@@ -163,6 +199,30 @@ class S3Token2Mel(torch.nn.Module):
             embedding=ref_x_vector,
         )
 
+    def embed_ref_batch(self, ref_wavs_24: List[torch.Tensor], ref_wavs_16: List[torch.Tensor], device="auto"):
+        """
+        `embed_ref` for many references at once, from 1-D waveforms already at 24 kHz and 16 kHz:
+        one masked CAMPPlus forward for all x-vectors and one tokenizer call for all prompt tokens.
+        Returns one `ref_dict` per reference, each matching `embed_ref` on that reference alone.
+        """
+        device = self.device if device == "auto" else device
+        ref_wavs_16 = [wav.reshape(-1).to(device) for wav in ref_wavs_16]
+        x_vectors = self.speaker_encoder.inference_batch(ref_wavs_16)
+        tokens, token_lens = self.tokenizer(ref_wavs_16)
+
+        ref_dicts = []
+        for i, wav_24 in enumerate(ref_wavs_24):
+            ref_mels_24 = self.mel_extractor(wav_24.reshape(1, -1).to(device)).transpose(1, 2).to(device)
+            n_tokens = min(int(token_lens[i]), ref_mels_24.shape[1] // 2)
+            ref_dicts.append(dict(
+                prompt_token=tokens[i:i + 1, :n_tokens].to(device),
+                prompt_token_len=torch.tensor([n_tokens], device=token_lens.device),
+                prompt_feat=ref_mels_24,
+                prompt_feat_len=None,
+                embedding=x_vectors[i:i + 1],
+            ))
+        return ref_dicts
+
     def forward(
         self,
         speech_tokens: torch.LongTensor,
@@ -223,8 +283,8 @@ class S3Token2Wav(S3Token2Mel):
     TODO: make these modules configurable?
     """
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, estimator_backend: str = "torch", estimator_onnx_path: Optional[str] = None):
+        super().__init__(estimator_backend=estimator_backend, estimator_onnx_path=estimator_onnx_path)
 
         f0_predictor = ConvRNNF0Predictor()
         self.mel2wav = HiFTGenerator(
@@ -1,12 +1,21 @@
 """mel-spectrogram extraction in Matcha-TTS"""
+from functools import lru_cache
+
 from librosa.filters import mel as librosa_mel_fn
 import torch
 import numpy as np
 
 
-# NOTE: they decalred these global vars
-mel_basis = {}
-hann_window = {}
+@lru_cache(maxsize=None)
+def get_mel_basis(sampling_rate, n_fft, num_mels, fmin, fmax, device):
+    """Mel filterbank, built once per (config, device) and kept on that device."""
+    mel = librosa_mel_fn(sr=sampling_rate, n_fft=n_fft, n_mels=num_mels, fmin=fmin, fmax=fmax)
+    return torch.from_numpy(mel).float().to(device)
+
+
+@lru_cache(maxsize=None)
+def get_hann_window(win_size, device):
+    return torch.hann_window(win_size).to(device)
 
 
 def dynamic_range_compression_torch(x, C=1, clip_val=1e-5):
@@ -34,6 +43,9 @@ def mel_spectrogram(y, n_fft=1920, num_mels=80, sampling_rate=24000, hop_size=48
                     fmin=0, fmax=8000, center=False):
     """Copied from https://github.com/shivammehta25/Matcha-TTS/blob/main/matcha/utils/audio.py
     Set default values according to Cosyvoice's config.
+
+    NOTE: the upstream version also printed (and synced on) out-of-range min/max values
+    on every call; inputs are expected in [-1, 1] and are not checked here.
     """
 
     if isinstance(y, np.ndarray):
@@ -42,16 +54,8 @@ def mel_spectrogram(y, n_fft=1920, num_mels=80, sampling_rate=24000, hop_size=48
     if len(y.shape) == 1:
         y = y[None, ]
 
-    if torch.min(y) < -1.0:
-        print("min value is ", torch.min(y))
-    if torch.max(y) > 1.0:
-        print("max value is ", torch.max(y))
-
-    global mel_basis, hann_window  # pylint: disable=global-statement,global-variable-not-assigned
-    if f"{str(fmax)}_{str(y.device)}" not in mel_basis:
-        mel = librosa_mel_fn(sr=sampling_rate, n_fft=n_fft, n_mels=num_mels, fmin=fmin, fmax=fmax)
-        mel_basis[str(fmax) + "_" + str(y.device)] = torch.from_numpy(mel).float().to(y.device)
-        hann_window[str(y.device)] = torch.hann_window(win_size).to(y.device)
+    mel_basis = get_mel_basis(sampling_rate, n_fft, num_mels, fmin, fmax, y.device)
+    hann_window = get_hann_window(win_size, y.device)
 
     y = torch.nn.functional.pad(
         y.unsqueeze(1), (int((n_fft - hop_size) / 2), int((n_fft - hop_size) / 2)), mode="reflect"
@@ -64,7 +68,7 @@ def mel_spectrogram(y, n_fft=1920, num_mels=80, sampling_rate=24000, hop_size=48
             n_fft,
             hop_length=hop_size,
             win_length=win_size,
-            window=hann_window[str(y.device)],
+            window=hann_window,
             center=center,
             pad_mode="reflect",
             normalized=False,
@@ -75,7 +79,7 @@ def mel_spectrogram(y, n_fft=1920, num_mels=80, sampling_rate=24000, hop_size=48
 
     spec = torch.sqrt(spec.pow(2).sum(-1) + (1e-9))
 
-    spec = torch.matmul(mel_basis[str(fmax) + "_" + str(y.device)], spec)
+    spec = torch.matmul(mel_basis, spec)
     spec = spectral_normalize_torch(spec)
 
     return spec
@@ -58,6 +58,45 @@ def extract_feature(audio):
     return features_padded, feature_lengths, feature_times
 
 
+def extract_feature_batch(audio, frame_length=400, frame_shift=160):
+    """Batched `extract_feature`: one `Kaldi.fbank` call for the whole list.
+
+    Kaldi fbank (snip_edges=True, no dither) processes every frame independently, so
+    the utterances are laid end to end, each starting on a frame-shift boundary with a
+    zero gap after it; the frames of each utterance then only ever see its own samples.
+    Per-utterance mean normalization uses only that utterance's frames.
+
+    Returns:
+        (features (B, Tmax, 80) zero-padded, feature_lengths (B,) LongTensor, feature_times)
+    """
+    device = audio[0].device
+    feature_times = [au.shape[0] for au in audio]
+    assert min(feature_times) >= frame_length, "Every utterance needs at least one fbank frame"
+    feature_lengths = torch.tensor([1 + (t - frame_length) // frame_shift for t in feature_times], device=device)
+    n_slots = torch.tensor([-(-t // frame_shift) for t in feature_times], device=device)
+    start_frames = torch.cumsum(n_slots, dim=0) - n_slots
+
+    signal = audio[0].new_zeros(int(n_slots.sum()) * frame_shift + frame_length)
+    for au, start in zip(audio, (start_frames * frame_shift).tolist()):
+        signal[start:start + au.shape[0]] = au
+    fbank = Kaldi.fbank(signal.unsqueeze(0), num_mel_bins=80, frame_length=frame_length * 1000 / 16000,
+                        frame_shift=frame_shift * 1000 / 16000)
+
+    max_len = int(feature_lengths.max())
+    frame_idx = torch.arange(max_len, device=device).unsqueeze(0)
+    valid = (frame_idx < feature_lengths.unsqueeze(1)).unsqueeze(-1)
+    idx = (start_frames.unsqueeze(1) + frame_idx).clamp(max=fbank.shape[0] - 1)
+    features = fbank[idx] * valid
+    mean = features.sum(dim=1, keepdim=True) / feature_lengths.view(-1, 1, 1)
+    features = (features - mean) * valid
+    return features, feature_lengths, feature_times
+
+
+def _time_mask(lengths, max_len):
+    """(B, max_len) bool mask of valid frames."""
+    return torch.arange(max_len, device=lengths.device).unsqueeze(0) < lengths.unsqueeze(1)
+
+
 class BasicResBlock(torch.nn.Module):
     expansion = 1
 
@@ -83,11 +122,15 @@ class BasicResBlock(torch.nn.Module):
                 torch.nn.BatchNorm2d(self.expansion * planes),
             )
 
-    def forward(self, x):
+    def forward(self, x, mask=None):
         out = F.relu(self.bn1(self.conv1(x)))
+        if mask is not None:
+            out = out * mask
         out = self.bn2(self.conv2(out))
         out += self.shortcut(x)
         out = F.relu(out)
+        if mask is not None:
+            out = out * mask
         return out
 
 
@@ -115,11 +158,19 @@ class FCM(torch.nn.Module):
             self.in_planes = planes * block.expansion
         return torch.nn.Sequential(*layers)
 
-    def forward(self, x):
+    def forward(self, x, mask=None):
+        """`mask`: optional (B, T) valid-frame mask; padded frames are zeroed before every 3x3 conv."""
         x = x.unsqueeze(1)
+        if mask is not None:
+            mask = mask[:, None, None, :].to(x.dtype)
         out = F.relu(self.bn1(self.conv1(x)))
-        out = self.layer1(out)
-        out = self.layer2(out)
+        if mask is None:
+            out = self.layer1(out)
+            out = self.layer2(out)
+        else:
+            out = out * mask
+            for block in (*self.layer1, *self.layer2):
+                out = block(out, mask)
         out = F.relu(self.bn2(self.conv2(out)))
 
         shape = out.shape
@@ -152,8 +203,19 @@ def statistics_pooling(x, dim=-1, keepdim=False, unbiased=True, eps=1e-2):
     return stats
 
 
+def masked_statistics_pooling(x, mask, unbiased=True):
+    """`statistics_pooling` over the time axis of (B, C, T) `x`, using only frames where (B, T) `mask` is set."""
+    mask = mask.unsqueeze(1).to(x.dtype)
+    n = mask.sum(dim=-1)
+    mean = (x * mask).sum(dim=-1) / n
+    var = (((x - mean.unsqueeze(-1)) * mask) ** 2).sum(dim=-1) / (n - 1 if unbiased else n)
+    return torch.cat([mean, var.sqrt()], dim=-1)
+
+
 class StatsPool(torch.nn.Module):
-    def forward(self, x):
+    def forward(self, x, mask=None):
+        if mask is not None:
+            return masked_statistics_pooling(x, mask)
         return statistics_pooling(x)
 
 
@@ -211,13 +273,35 @@ class CAMLayer(torch.nn.Module):
         self.linear2 = torch.nn.Conv1d(bn_channels // reduction, out_channels, 1)
         self.sigmoid = torch.nn.Sigmoid()
 
-    def forward(self, x):
+    def forward(self, x, mask=None):
+        if mask is not None:
+            return self._forward_masked(x, mask)
         y = self.linear_local(x)
         context = x.mean(-1, keepdim=True) + self.seg_pooling(x)
         context = self.relu(self.linear1(context))
         m = self.sigmoid(self.linear2(context))
         return y * m
 
+    def _forward_masked(self, x, mask, seg_len=100):
+        """`forward` on a padded batch: the local conv sees zeros past each item's end, and the
+        global / segment means only average valid frames (the last segment is partial, as with ceil_mode)."""
+        fmask = mask.unsqueeze(1).to(x.dtype)
+        x = x * fmask
+        y = self.linear_local(x)
+
+        n_valid = fmask.sum(-1, keepdim=True)
+        # ratio of window averages = sum over valid frames / number of valid frames in each segment
+        seg_x = F.avg_pool1d(x, kernel_size=seg_len, stride=seg_len, ceil_mode=True)
+        seg_n = F.avg_pool1d(fmask, kernel_size=seg_len, stride=seg_len, ceil_mode=True)
+        seg = seg_x / seg_n.clamp(min=1.0 / seg_len)
+        shape = seg.shape
+        seg = seg.unsqueeze(-1).expand(*shape, seg_len).reshape(*shape[:-1], -1)[..., : x.shape[-1]]
+
+        context = x.sum(-1, keepdim=True) / n_valid + seg
+        context = self.relu(self.linear1(context))
+        m = self.sigmoid(self.linear2(context))
+        return y * m
+
     def seg_pooling(self, x, seg_len=100, stype="avg"):
         if stype == "avg":
             seg = F.avg_pool1d(x, kernel_size=seg_len, stride=seg_len, ceil_mode=True)
@@ -266,12 +350,12 @@ class CAMDenseTDNNLayer(torch.nn.Module):
     def bn_function(self, x):
         return self.linear1(self.nonlinear1(x))
 
-    def forward(self, x):
+    def forward(self, x, mask=None):
         if self.training and self.memory_efficient:
             x = cp.checkpoint(self.bn_function, x)
         else:
             x = self.bn_function(x)
-        x = self.cam_layer(self.nonlinear2(x))
+        x = self.cam_layer(self.nonlinear2(x), mask)
         return x
 
 
@@ -304,9 +388,9 @@ class CAMDenseTDNNBlock(torch.nn.ModuleList):
             )
             self.add_module("tdnnd%d" % (i + 1), layer)
 
-    def forward(self, x):
+    def forward(self, x, mask=None):
         for layer in self:
-            x = torch.cat([x, layer(x)], dim=1)
+            x = torch.cat([x, layer(x, mask)], dim=1)
         return x
 
 
@@ -414,15 +498,49 @@ class CAMPPlus(torch.nn.Module):
                 if m.bias is not None:
                     torch.nn.init.zeros_(m.bias)
 
-    def forward(self, x):
+    def forward(self, x, x_lens=None):
+        """
+        x: (B, T, F) fbank features. With `x_lens`, x is a zero-padded batch and every
+        time-mixing op (3x3 / k>1 convs, CAM context means, stats pooling) is masked, so each
+        row matches running that item alone.
+        """
         x = x.permute(0, 2, 1)  # (B,T,F) => (B,F,T)
-        x = self.head(x)
-        x = self.xvector(x)
+        if x_lens is None:
+            x = self.head(x)
+            x = self.xvector(x)
+        else:
+            x = self._forward_masked(x, x_lens)
         if self.output_level == "frame":
             x = x.transpose(1, 2)
         return x
 
+    def _forward_masked(self, x, x_lens):
+        mask = _time_mask(x_lens, x.shape[-1])
+        x = self.head(x, mask) * mask.unsqueeze(1)
+        for name, layer in self.xvector.named_children():
+            if name == "tdnn":
+                x = layer(x)
+                # k=5, stride 2, padding 2
+                x_lens = torch.div(x_lens - 1, 2, rounding_mode="floor") + 1
+                mask = _time_mask(x_lens, x.shape[-1])
+            elif isinstance(layer, (CAMDenseTDNNBlock, StatsPool)):
+                x = layer(x, mask)
+            else:
+                x = layer(x)
+        if self.output_level == "frame":
+            x = x * mask.unsqueeze(1)
+        return x
+
     def inference(self, audio_list):
         speech, speech_lengths, speech_times = extract_feature(audio_list)
         results = self.forward(speech.to(torch.float32))
         return results
+
+    def inference_batch(self, audio_list):
+        """
+        `inference` for many utterances of different lengths in one forward: fbank is computed
+        in one call and the padded batch runs through the masked forward. Each row matches
+        `inference([audio])` up to float summation order.
+        """
+        speech, speech_lengths, _ = extract_feature_batch(audio_list)
+        return self.forward(speech.to(torch.float32), speech_lengths)
@@ -4,12 +4,13 @@ import numpy as np
 import librosa
 import torch
 import torch.nn.functional as F
-from s3tokenizer.utils import padding
 from s3tokenizer.model_v2 import (
     S3TokenizerV2,
     ModelConfig,
 )
 
+from ..utils import reflect_pad_rows
+
 
 # Sampling rate of the inputs to S3TokenizerV2
 S3_SR = 16_000
@@ -87,6 +88,15 @@ class S3Tokenizer(S3TokenizerV2):
             processed_wavs.append(wav)
         return processed_wavs
 
+    def _batch_audio(self, wavs) -> Tuple[torch.Tensor, torch.LongTensor]:
+        """Right-pad a list of 1-D (or [1, T]) waveforms, or a [B, T] tensor, into one [B, T_max] batch on device."""
+        processed_wavs = [wav.reshape(-1) for wav in self._prepare_audio(wavs)]
+        wav_lens = [wav.shape[0] for wav in processed_wavs]
+        batch = torch.zeros(len(processed_wavs), max(wav_lens), dtype=torch.float32, device=self.device)
+        for i, wav in enumerate(processed_wavs):
+            batch[i, :wav_lens[i]] = wav.to(self.device)
+        return batch, torch.tensor(wav_lens, dtype=torch.long, device=self.device)
+
     @torch.no_grad()
     def forward(
         self,
@@ -96,30 +106,27 @@ class S3Tokenizer(S3TokenizerV2):
     ) -> Tuple[torch.Tensor, torch.LongTensor]:
         """
         NOTE: mel-spec has a hop size of 160 points (100 frame/sec).
-        FIXME: this class inherits `nn.Module` but doesn't accept `torch.Tensor` and handles a list of wavs one by one, which is unexpected.
+        All wavs are featurized as one padded batch (see `log_mel_spectrogram_batch`)
+        and quantized in a single call; per-item results match featurizing them one by one.
 
         Args
         ----
-        - `wavs`: 16 kHz speech audio
+        - `wavs`: 16 kHz speech audio, a list of waveforms or a [B, T] tensor
         - `max_len` max length to truncate the output sequence to (25 token/sec).
         NOTE: please pad the waveform if longer sequence is needed.
         """
-        processed_wavs = self._prepare_audio(wavs)
-        mels, mel_lens = [], []
-        for wav in processed_wavs:
-            wav = wav.to(self.device)
-            mel = self.log_mel_spectrogram(wav)  # [B=1, F, T]
-            if max_len is not None:
-                mel = mel[..., :max_len * 4]  # num_mel_frames = 4 * num_tokens
-            mels.append(mel.squeeze(0))
-
-        mels, mel_lens = padding(mels)
+        audio, audio_lens = self._batch_audio(wavs)
+        mels, mel_lens = self.log_mel_spectrogram_batch(audio, audio_lens)
+        if max_len is not None:
+            mels = mels[..., :max_len * 4]  # num_mel_frames = 4 * num_tokens
+            mel_lens = mel_lens.clamp(max=max_len * 4)
+
         if accelerator is None:
             tokenizer = self
         else:
             tokenizer = accelerator.unwrap_model(self)
 
-        speech_tokens, speech_token_lens = tokenizer.quantize(mels, mel_lens.to(self.device))
+        speech_tokens, speech_token_lens = tokenizer.quantize(mels, mel_lens)
         return (
             speech_tokens.long().detach(),
             speech_token_lens.long().detach(),
@@ -163,6 +170,54 @@ class S3Tokenizer(S3TokenizerV2):
         mel_spec = self._mel_filters.to(self.device) @ magnitudes
 
         log_spec = torch.clamp(mel_spec, min=1e-10).log10()
-        log_spec = torch.maximum(log_spec, log_spec.max() - 8.0)
+        # clamp against each item's own max (identical to a global max for a single wav)
+        log_spec = torch.maximum(log_spec, log_spec.amax(dim=(-2, -1), keepdim=True) - 8.0)
         log_spec = (log_spec + 4.0) / 4.0
         return log_spec
+
+    def log_mel_spectrogram_batch(
+        self,
+        audio: torch.Tensor,
+        audio_lens: torch.LongTensor,
+    ) -> Tuple[torch.Tensor, torch.LongTensor]:
+        """
+        Batched `log_mel_spectrogram` over right-padded audio.
+
+        Each row is reflect-padded at its own boundaries (what `torch.stft(center=True)`
+        does for a lone wav), so frames next to the padding match the per-item path.
+        The max-8 clamp uses each item's own valid frames, and padded frames are zeroed.
+
+        Parameters
+        ----------
+        audio: torch.Tensor, shape = (B, T_max), 16 kHz
+        audio_lens: torch.LongTensor, shape = (B,)
+
+        Returns
+        -------
+        (log_spec [B, 128, n_frames], mel_lens [B])
+        """
+        audio = audio.to(self.device)
+        audio_lens = audio_lens.to(self.device)
+        audio = reflect_pad_rows(audio, audio_lens, self.n_fft // 2)
+
+        stft = torch.stft(
+            audio, self.n_fft, S3_HOP,
+            window=self.window.to(self.device),
+            center=False,
+            return_complex=True
+        )
+        magnitudes = stft.abs()**2
+        mel_spec = self._mel_filters.to(self.device) @ magnitudes
+
+        # the per-item path keeps T // hop frames (it drops the last centered frame)
+        mel_lens = torch.div(audio_lens, S3_HOP, rounding_mode="floor")
+        n_frames = int(mel_lens.max())
+        mel_spec = mel_spec[..., :n_frames]
+        valid = (torch.arange(n_frames, device=self.device).unsqueeze(0) < mel_lens.unsqueeze(1)).unsqueeze(1)
+
+        log_spec = torch.clamp(mel_spec, min=1e-10).log10()
+        log_max = log_spec.masked_fill(~valid, float("-inf")).amax(dim=(-2, -1), keepdim=True)
+        log_spec = torch.maximum(log_spec, log_max - 8.0)
+        log_spec = (log_spec + 4.0) / 4.0
+        log_spec = log_spec.masked_fill(~valid, 0.0)
+        return log_spec, mel_lens
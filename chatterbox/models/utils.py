@@ -0,0 +1,25 @@
+"""Signal helpers shared by the S3 tokenizer, S3Gen and the voice encoder."""
+from functools import lru_cache
+
+import torch
+import torchaudio as ta
+
+
+@lru_cache(100)
+def get_resampler(src_sr, dst_sr, device):
+    """One `Resample` per (rates, device), shared process-wide."""
+    return ta.transforms.Resample(src_sr, dst_sr).to(device)
+
+
+def reflect_pad_rows(audio: torch.Tensor, audio_lens: torch.Tensor, pad: int) -> torch.Tensor:
+    """
+    Reflect-pad every row of a right-padded (B, T) batch by `pad` samples at its own
+    boundaries, i.e. what `torch.stft(center=True)` does to a lone waveform.
+    Returns (B, T + 2 * pad); samples past a row's padded length are don't-cares.
+    """
+    # index -p for p < 0, 2 * (L - 1) - p for p >= L
+    pos = torch.arange(-pad, audio.shape[1] + pad, device=audio.device).unsqueeze(0)
+    last = (audio_lens.to(audio.device) - 1).unsqueeze(1)
+    idx = torch.where(pos < 0, -pos, pos)
+    idx = torch.where(idx > last, 2 * last - idx, idx)
+    return torch.gather(audio, 1, idx.clamp(min=0, max=audio.shape[1] - 1))
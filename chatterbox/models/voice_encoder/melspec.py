@@ -3,6 +3,10 @@ from functools import lru_cache
 from scipy import signal
 import numpy as np
 import librosa
+import torch
+import torch.nn.functional as F
+
+from ..utils import reflect_pad_rows
 
 
 @lru_cache()
@@ -16,6 +20,17 @@ def mel_basis(hp):
         fmax=hp.fmax)  # -> (nmel, nfreq)
 
 
+@lru_cache()
+def mel_basis_torch(hp, device):
+    return torch.from_numpy(mel_basis(hp)).float().to(device)
+
+
+@lru_cache()
+def stft_window_torch(hp, device):
+    # periodic Hann, same as librosa's default "hann" window
+    return torch.hann_window(hp.win_size).to(device)
+
+
 def preemphasis(wav, hp):
     assert hp.preemphasis != 0
     wav = signal.lfilter([1, -hp.preemphasis], [1], wav)
@@ -51,6 +66,105 @@ def melspectrogram(wav, hp, pad=True):
     return mel   # (M, T)
 
 
+def melspectrogram_torch(wav: torch.Tensor, hp, pad=True):
+    """
+    On-device equivalent of `melspectrogram` for a (T,) or (B, T) float tensor.
+    Returns (M, T') for a 1-D input, else (B, M, T').
+    """
+    squeeze = wav.dim() == 1
+    if squeeze:
+        wav = wav.unsqueeze(0)
+
+    if hp.preemphasis > 0:
+        wav = torch.cat([wav[:, :1], wav[:, 1:] - hp.preemphasis * wav[:, :-1]], dim=1).clamp(-1, 1)
+
+    spec_complex = torch.stft(
+        wav,
+        n_fft=hp.n_fft,
+        hop_length=hp.hop_size,
+        win_length=hp.win_size,
+        window=stft_window_torch(hp, wav.device),
+        center=pad,
+        pad_mode="reflect",
+        return_complex=True,
+    )
+    spec_magnitudes = spec_complex.abs()
+
+    if hp.mel_power != 1.0:
+        spec_magnitudes = spec_magnitudes ** hp.mel_power
+
+    mel = mel_basis_torch(hp, wav.device) @ spec_magnitudes
+    if hp.mel_type == "db":
+        mel = 20 * torch.log10(torch.clamp(mel, min=hp.stft_magnitude_min))
+
+    if hp.normalized_mels:
+        mel = _normalize(mel, hp)
+
+    return mel.squeeze(0) if squeeze else mel
+
+
+def melspectrogram_torch_batch(wavs: torch.Tensor, wav_lens: torch.Tensor, hp):
+    """
+    `melspectrogram_torch` (pad=True) over a right-padded (B, T) batch. Each row is
+    reflect-padded at its own length, so every item's frames match the per-item path.
+    Returns (mels (B, M, T'), mel_lens (B,)) with mel_lens = 1 + len // hop_size.
+    """
+    wav_lens = wav_lens.to(wavs.device)
+    if hp.preemphasis > 0:
+        wavs = torch.cat([wavs[:, :1], wavs[:, 1:] - hp.preemphasis * wavs[:, :-1]], dim=1).clamp(-1, 1)
+
+    wavs = reflect_pad_rows(wavs, wav_lens, hp.n_fft // 2)
+
+    spec_complex = torch.stft(
+        wavs,
+        n_fft=hp.n_fft,
+        hop_length=hp.hop_size,
+        win_length=hp.win_size,
+        window=stft_window_torch(hp, wavs.device),
+        center=False,
+        return_complex=True,
+    )
+    spec_magnitudes = spec_complex.abs()
+    if hp.mel_power != 1.0:
+        spec_magnitudes = spec_magnitudes ** hp.mel_power
+
+    mel = mel_basis_torch(hp, wavs.device) @ spec_magnitudes
+    if hp.mel_type == "db":
+        mel = 20 * torch.log10(torch.clamp(mel, min=hp.stft_magnitude_min))
+    if hp.normalized_mels:
+        mel = _normalize(mel, hp)
+
+    mel_lens = 1 + torch.div(wav_lens, hp.hop_size, rounding_mode="floor")
+    return mel[..., :int(mel_lens.max())], mel_lens
+
+
+def trim_silence_torch(wavs: torch.Tensor, wav_lens: torch.Tensor, top_db=20, frame_length=2048, hop_length=512):
+    """
+    Batched `librosa.effects.trim` bounds for a right-padded (B, T) batch: frames whose
+    RMS is within `top_db` of the item's loudest frame are kept. Returns (starts, ends)
+    in samples. Items with no frame above the threshold are kept whole.
+    """
+    wav_lens = wav_lens.to(wavs.device)
+    # librosa.feature.rms with center=True and constant padding, so zero everything past each item's end
+    wavs = wavs.masked_fill(torch.arange(wavs.size(1), device=wavs.device).unsqueeze(0) >= wav_lens.unsqueeze(1), 0)
+    half = frame_length // 2
+    frames = F.pad(wavs, (half, half)).unfold(-1, frame_length, hop_length)
+    power = frames.pow(2).mean(dim=-1)
+    db = 10 * torch.log10(power.clamp(min=1e-10))
+    ref_db = 10 * torch.log10(power.amax(dim=1, keepdim=True).clamp(min=1e-10))
+    non_silent = db > ref_db - top_db
+
+    n_frames = non_silent.size(1)
+    frame_idx = torch.arange(n_frames, device=wavs.device).unsqueeze(0)
+    first = torch.where(non_silent, frame_idx, n_frames).amin(dim=1)
+    last = torch.where(non_silent, frame_idx, -1).amax(dim=1)
+
+    found = last >= 0
+    starts = torch.where(found, first * hop_length, torch.zeros_like(wav_lens))
+    ends = torch.where(found, torch.minimum(wav_lens, (last + 1) * hop_length), wav_lens)
+    return starts, ends
+
+
 def _stft(y, hp, pad=True):
     # NOTE: after 0.8, pad mode defaults to constant, setting this to reflect for
     #   historical consistency and streaming-version consistency
@@ -10,7 +10,8 @@ import torch.nn.functional as F
 from torch import nn, Tensor
 
 from .config import VoiceEncConfig
-from .melspec import melspectrogram
+from .melspec import melspectrogram, melspectrogram_torch_batch, trim_silence_torch
+from ..utils import get_resampler
 
 
 def pack(arrays, seq_len: int=None, pad_value=0):
@@ -175,26 +176,25 @@ class VoiceEncoder(nn.Module):
         # Possibly pad the mels to reach the target lengths
         len_diff = max(target_lens) - mels.size(1)
         if len_diff > 0:
-            pad = torch.full((mels.size(0), len_diff, self.hp.num_mels), 0, dtype=torch.float32)
-            mels = torch.cat((mels, pad.to(mels.device)), dim=1)
+            mels = F.pad(mels, (0, 0, 0, len_diff))
 
-        # Group all partials together so that we can batch them easily
-        partials = [
-            mel[i * frame_step: i * frame_step + self.hp.ve_partial_frames]
-            for mel, n_partial in zip(mels, n_partials) for i in range(n_partial)
-        ]
-        assert all(partials[0].shape == partial.shape for partial in partials)
-        partials = torch.stack(partials)
+        # Cut every utterance into overlapping partials at once: (B, W, M, P) -> (B, W, P, M), then keep
+        # the first n_partials windows of each utterance. Boolean indexing preserves utterance order.
+        windows = mels.unfold(1, self.hp.ve_partial_frames, frame_step).transpose(2, 3)
+        n_partials = torch.tensor(n_partials, device=mels.device)
+        keep = torch.arange(windows.size(1), device=mels.device).unsqueeze(0) < n_partials.unsqueeze(1)
+        partials = windows[keep]
 
         # Forward the partials
         n_chunks = int(np.ceil(len(partials) / (batch_size or len(partials))))
-        partial_embeds = torch.cat([self(batch) for batch in partials.chunk(n_chunks)], dim=0).cpu()
+        partial_embeds = torch.cat([self(batch) for batch in partials.chunk(n_chunks)], dim=0)
 
-        # Reduce the partial embeds into full embeds and L2-normalize them
-        slices = np.concatenate(([0], np.cumsum(n_partials)))
-        raw_embeds = [torch.mean(partial_embeds[start:end], dim=0) for start, end in zip(slices[:-1], slices[1:])]
-        raw_embeds = torch.stack(raw_embeds)
-        embeds = raw_embeds / torch.linalg.norm(raw_embeds, dim=1, keepdim=True)
+        # Reduce the partial embeds into full embeds (segment mean) and L2-normalize them
+        utt_ids = torch.repeat_interleave(torch.arange(len(n_partials), device=mels.device), n_partials)
+        raw_embeds = torch.zeros(len(n_partials), partial_embeds.size(1), device=mels.device, dtype=partial_embeds.dtype)
+        raw_embeds.index_add_(0, utt_ids, partial_embeds)
+        raw_embeds = raw_embeds / n_partials.unsqueeze(1).to(raw_embeds.dtype)
+        embeds = (raw_embeds / torch.linalg.norm(raw_embeds, dim=1, keepdim=True)).cpu()
 
         return embeds
 
@@ -272,3 +272,48 @@ class VoiceEncoder(nn.Module):
         mels = [melspectrogram(w, self.hp).T for w in wavs]
 
         return self.embeds_from_mels(mels, as_spk=as_spk, batch_size=batch_size, **kwargs)
+
+    def embeds_from_wav_tensors(
+        self,
+        wavs: List[Union[np.ndarray, Tensor]],
+        sample_rate,
+        as_spk=False,
+        batch_size=32,
+        trim_top_db: Optional[float]=20,
+        files_per_batch=64,
+        **kwargs
+    ):
+        """
+        On-device, batched equivalent of embeds_from_wavs for many files at once: resampling, silence
+        trimming and mel extraction run on padded batches on the encoder's device, and the partials of
+        every file in a batch go through the LSTM together.
+
+        :param wavs: list of 1-D waveforms (numpy arrays or tensors) at `sample_rate`
+        :param files_per_batch: number of files resampled / trimmed / embedded together
+        :returns: same as embeds_from_wavs
+        """
+        if "rate" not in kwargs:
+            kwargs["rate"] = 1.3  # Resemble's default value.
+
+        utt_embeds = []
+        with torch.inference_mode():
+            for start in range(0, len(wavs), files_per_batch):
+                group = [torch.as_tensor(w).float().reshape(-1).to(self.device) for w in wavs[start:start + files_per_batch]]
+                audio = pack(group)
+                audio_lens = torch.tensor([len(w) for w in group], device=self.device)
+
+                if sample_rate != self.hp.sample_rate:
+                    audio = get_resampler(sample_rate, self.hp.sample_rate, self.device)(audio)
+                    audio_lens = torch.ceil(audio_lens * self.hp.sample_rate / sample_rate).long()
+
+                if trim_top_db:
+                    starts, ends = trim_silence_torch(audio, audio_lens, top_db=trim_top_db)
+                    audio_lens = ends - starts
+                    idx = starts.unsqueeze(1) + torch.arange(max(int(audio_lens.max()), 1), device=self.device)
+                    audio = torch.gather(audio, 1, idx.clamp(max=audio.size(1) - 1))
+
+                mels, mel_lens = melspectrogram_torch_batch(audio, audio_lens, self.hp)
+                utt_embeds.append(self.inference(mels.transpose(1, 2), mel_lens, batch_size=batch_size, **kwargs))
+
+        utt_embeds = torch.cat(utt_embeds).numpy()
+        return self.utt_to_spk_embed(utt_embeds) if as_spk else utt_embeds
@@ -0,0 +1,65 @@
+"""
+Offloading for modules that are only needed occasionally (the conditioning encoders).
+
+`offload_module` moves a module's parameters to the meta device, which frees their
+memory while keeping the module object (and every reference to it) in place.
+Buffers are small (windows, filterbanks, batch-norm statistics) and some are not
+in the checkpoints, so they are stashed on the CPU instead. `materialize_module`
+re-reads the parameters from the checkpoint they came from; checkpoints are opened
+with `mmap=True`, so only the requested tensors are actually read.
+"""
+import torch
+from torch import nn
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def module_nbytes(module: nn.Module) -> int:
+    """Bytes held by a module's parameters and buffers (offloaded tensors count as zero)."""
+    tensors = list(module.parameters()) + list(module.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors if not t.is_meta)
+
+
+def is_offloaded(module: nn.Module) -> bool:
+    return any(p.is_meta for p in module.parameters())
+
+
+def offload_module(module: nn.Module):
+    """Free a module's parameters, stashing its buffers on the CPU for `materialize_module`."""
+    if is_offloaded(module):
+        return module
+    module._offload_buffers = {name: buf.detach().cpu() for name, buf in module.named_buffers()}
+    module.to_empty(device="meta")
+    return module
+
+
+def materialize_module(module: nn.Module, ckpt_path, prefix: str = "", device="cpu"):
+    """Reload an offloaded module's parameters from `ckpt_path` (keys under `prefix`) onto `device`."""
+    if not is_offloaded(module):
+        return module
+    state_dict = torch.load(ckpt_path, map_location="cpu", mmap=True, weights_only=True)
+    state_dict = {k[len(prefix):]: v for k, v in state_dict.items() if k.startswith(prefix)}
+
+    stashed = getattr(module, "_offload_buffers", {})
+    module.to_empty(device=device)
+    for name, buf in stashed.items():
+        owner_name, _, buf_name = name.rpartition(".")
+        owner = module.get_submodule(owner_name) if owner_name else module
+        owner._buffers[buf_name].copy_(buf)
+
+    missing, unexpected = module.load_state_dict(state_dict, strict=False)
+    missing = [k for k in missing if k not in stashed]
+    if missing or unexpected:
+        raise RuntimeError(f"Checkpoint {ckpt_path} (prefix '{prefix}') does not match module: missing={missing}, unexpected={unexpected}")
+    module._offload_buffers = {}
+    return module.eval()
+
+
+def process_rss_bytes():
+    """Resident set size of this process, or None without psutil."""
+    if psutil is None:
+        return None
+    return psutil.Process().memory_info().rss
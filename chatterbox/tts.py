@@ -1,10 +1,12 @@
-from dataclasses import dataclass
+from collections import OrderedDict
+from dataclasses import dataclass, replace
 from pathlib import Path
+from typing import List
 import hashlib
 import os
+import threading
 import numpy as np
 
-import librosa
 import torch
 import perth
 import torch.nn.functional as F
@@ -16,11 +18,15 @@ from .models.s3gen import S3GEN_SR, S3Gen
 from .models.tokenizers import EnTokenizer
 from .models.voice_encoder import VoiceEncoder
 from .models.t3.modules.cond_enc import T3Cond
+from .frontend import ReferenceFrontend
+from .offload import module_nbytes, is_offloaded, offload_module, materialize_module, process_rss_bytes
 
 
 REPO_ID = "ResembleAI/chatterbox"
 COND_CACHE_DIR = Path(os.getenv("XDG_CACHE_HOME", Path.home() / ".cache")) / "chatterbox_conds"
 COND_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+# Packed voice library (see chatterbox/voice_library.py), opened automatically when present.
+VOICE_LIBRARY_PATH = Path(os.getenv("CHATTERBOX_VOICE_LIBRARY", COND_CACHE_DIR / "voices.safetensors"))
 
 
 def punc_norm(text: str) -> str:
@@ -110,6 +116,9 @@ class Conditionals:
 class ChatterboxTTS:
     ENC_COND_LEN = 6 * S3_SR
     DEC_COND_LEN = 10 * S3GEN_SR
+    # "resident": conditioning encoders stay loaded; "lazy": loaded on first use and kept;
+    # "offload": loaded for each conditionals computation and released afterwards.
+    ENCODER_POLICIES = ("resident", "lazy", "offload")
 
     def __init__(
         self,
@@ -119,14 +128,47 @@ class ChatterboxTTS:
         tokenizer: EnTokenizer,
         device: str,
         conds: Conditionals = None,
+        cond_cache_size: int = 8,
+        voice_library=None,
+        encoder_policy: str = "resident",
+        encoder_ckpts: dict = None,
     ):
+        if encoder_policy not in self.ENCODER_POLICIES:
+            raise ValueError(f"Unknown encoder policy '{encoder_policy}', expected one of {self.ENCODER_POLICIES}")
+        if encoder_policy != "resident" and not encoder_ckpts:
+            raise ValueError("Lazy / offloaded encoders need `encoder_ckpts` to reload from (see `from_local`)")
         self.sr = S3GEN_SR
         self.device = device
 
         self.t3 = t3.to(self.device).eval()
         self.s3gen = s3gen.to(self.device).eval()
         self.ve = ve.to(self.device).eval()
+
+        # The VoiceEncoder, S3Tokenizer and CAMPPlus are only used to compute conditionals.
+        # encoder_ckpts maps each of them to the (checkpoint, key prefix) it can be reloaded from.
+        self.encoder_policy = encoder_policy
+        self.encoder_ckpts = encoder_ckpts or {}
+        # Worker stage threads (speaker screening) use the VoiceEncoder while the generating thread
+        # may be loading or offloading encoders; every load, use and release holds this lock.
+        self._encoder_lock = threading.RLock()
+        self._pinned_encoders = set()
+        if encoder_policy != "resident":
+            self.release_conditioning_encoders()
         self.tokenizer = tokenizer
+        self.frontend = ReferenceFrontend(self.device)
+
+        # In-memory LRU of device-resident conditionals, keyed by (path, mtime, size).
+        # Entries hold the exaggeration-independent Conditionals plus one emotion_adv
+        # tensor per exaggeration seen, see `prepare_conditionals`.
+        self.cond_cache_size = cond_cache_size
+        self._cond_lru = OrderedDict()
+
+        self.voice_library = None
+        self.load_voice_library(voice_library)
+
+        # (emotion_adv tensor, the exaggeration it holds), so `generate` can check the
+        # exaggeration without reading the tensor back from the device every chunk.
+        self._emotion_adv_value = (None, None)
 
         if conds:
             self.conds = conds.to(self.device)
@@ -136,14 +178,15 @@ class ChatterboxTTS:
         self.watermarker = perth.PerthImplicitWatermarker()
 
     @classmethod
-    def from_local(cls, ckpt_dir, device) -> 'ChatterboxTTS':
+    def from_local(cls, ckpt_dir, device, estimator_backend="torch", encoder_policy="resident") -> 'ChatterboxTTS':
         ckpt_dir = Path(ckpt_dir)
         map_location = device
 
         ve = VoiceEncoder()
-        ve.load_state_dict(
-            torch.load(ckpt_dir / "ve.pt", map_location=map_location)
-        )
+        if encoder_policy == "resident":
+            ve.load_state_dict(
+                torch.load(ckpt_dir / "ve.pt", map_location=map_location)
+            )
 
         t3 = T3()
         t3_state_dict = torch.load(ckpt_dir / "t3_cfg.pt", map_location=map_location)
@@ -158,10 +201,12 @@ class ChatterboxTTS:
              t3_state_dict = t3_state_dict["state_dict"]
         t3.load_state_dict(t3_state_dict)
 
-        s3gen = S3Gen()
+        s3gen = S3Gen(estimator_backend=estimator_backend)
         s3gen.load_state_dict(
             torch.load(ckpt_dir / "s3gen.pt", map_location=map_location)
         )
+        # The vocoder runs once per candidate; fold weight norm and fuse activations up front.
+        s3gen.mel2wav.optimize_for_inference()
 
         tokenizer = EnTokenizer(
             str(ckpt_dir / "tokenizer.json")
@@ -171,10 +216,16 @@ class ChatterboxTTS:
         if (builtin_voice := ckpt_dir / "conds.pt").exists():
             conds_obj = Conditionals.load(builtin_voice, map_location=map_location)
 
-        return cls(t3, s3gen, ve, tokenizer, device, conds=conds_obj)
+        encoder_ckpts = {
+            "voice_encoder": (ckpt_dir / "ve.pt", ""),
+            "s3_tokenizer": (ckpt_dir / "s3gen.pt", "tokenizer."),
+            "campplus": (ckpt_dir / "s3gen.pt", "speaker_encoder."),
+        }
+        return cls(t3, s3gen, ve, tokenizer, device, conds=conds_obj,
+                   encoder_policy=encoder_policy, encoder_ckpts=encoder_ckpts)
 
     @classmethod
-    def from_pretrained(cls, device) -> 'ChatterboxTTS':
+    def from_pretrained(cls, device, estimator_backend="torch", encoder_policy="resident") -> 'ChatterboxTTS':
         downloaded_files = {}
         # Make sure all necessary files for from_local are downloaded
         required_files = ["ve.pt", "t3_cfg.pt", "s3gen.pt", "tokenizer.json"]
@@ -195,7 +246,72 @@ class ChatterboxTTS:
                     raise RuntimeError(f"Required file {fpath_str} could not be downloaded: {e}")
 
         ckpt_dir = Path(downloaded_files["ve.pt"]).parent
-        return cls.from_local(ckpt_dir, device)
+        return cls.from_local(ckpt_dir, device, estimator_backend=estimator_backend, encoder_policy=encoder_policy)
+
+    def _conditioning_encoders(self) -> dict:
+        return {
+            "voice_encoder": self.ve,
+            "s3_tokenizer": self.s3gen.tokenizer,
+            "campplus": self.s3gen.speaker_encoder,
+        }
+
+    def load_conditioning_encoders(self):
+        """Materialize any offloaded conditioning encoder on the model device."""
+        with self._encoder_lock:
+            for name, module in self._conditioning_encoders().items():
+                if is_offloaded(module):
+                    ckpt_path, prefix = self.encoder_ckpts[name]
+                    materialize_module(module, ckpt_path, prefix=prefix, device=self.device)
+
+    def release_conditioning_encoders(self):
+        """
+        Free the conditioning encoders' weights; they are reloaded on the next conditionals computation.
+        Encoders pinned by `speaker_similarity` stay resident.
+        """
+        if not self.encoder_ckpts:
+            return
+        with self._encoder_lock:
+            for name, module in self._conditioning_encoders().items():
+                if name not in self._pinned_encoders:
+                    offload_module(module)
+        if str(self.device).startswith("cuda"):
+            torch.cuda.empty_cache()
+
+    def memory_report(self) -> dict:
+        """Resident bytes per component (offloaded encoders report 0), plus the process RSS when psutil is available."""
+        encoders = self._conditioning_encoders()
+        s3gen_core = module_nbytes(self.s3gen) - module_nbytes(self.s3gen.mel2wav) \
+            - module_nbytes(encoders["s3_tokenizer"]) - module_nbytes(encoders["campplus"])
+        report = {
+            "t3": module_nbytes(self.t3),
+            "s3gen_flow": s3gen_core,
+            "hifigan": module_nbytes(self.s3gen.mel2wav),
+            **{name: module_nbytes(module) for name, module in encoders.items()},
+        }
+        report["total_modules"] = sum(report.values())
+        report["process_rss"] = process_rss_bytes()
+        return report
+
+    def speaker_similarity(self, wavs_16k, speaker_emb=None) -> np.ndarray:
+        """
+        Cosine similarity between each 16 kHz waveform's VoiceEncoder embedding and `speaker_emb`
+        (default: the current voice's). Pass it explicitly when calling from another thread, since
+        `prepare_conditionals` may switch voices meanwhile. An offloaded VoiceEncoder is materialized
+        for this and, as it is small and screening needs it for every candidate, kept resident from then on.
+        """
+        if speaker_emb is None:
+            if self.conds is None:
+                raise ValueError("Conditionals not prepared; there is no reference voice to compare against.")
+            speaker_emb = self.conds.t3.speaker_emb
+        ref = speaker_emb.reshape(-1).float().cpu().numpy()
+        with self._encoder_lock:
+            self._pinned_encoders.add("voice_encoder")
+            if is_offloaded(self.ve):
+                ckpt_path, prefix = self.encoder_ckpts["voice_encoder"]
+                materialize_module(self.ve, ckpt_path, prefix=prefix, device=self.device)
+            embeds = self.ve.embeds_from_wav_tensors(list(wavs_16k), S3_SR)
+        embeds = embeds / np.linalg.norm(embeds, axis=1, keepdims=True)
+        return embeds @ (ref / np.linalg.norm(ref))
 
     def _get_audio_hash(self, wav_fpath_or_bytes):
         hasher = hashlib.md5()
@@ -211,10 +327,54 @@ class ChatterboxTTS:
             raise TypeError("Input must be a file path or bytes object for hashing.")
         return hasher.hexdigest()
 
-    def prepare_conditionals(self, wav_fpath, exaggeration=0.5, use_cache=True):
-        audio_hash = None
-        cache_file = None
+    def _cond_lru_key(self, wav_fpath):
+        try:
+            stat = os.stat(wav_fpath)
+        except OSError:
+            return None
+        return (os.path.abspath(wav_fpath), stat.st_mtime_ns, stat.st_size)
+
+    def _conds_for_exaggeration(self, entry, exaggeration) -> Conditionals:
+        """Resident conditionals with only the emotion_adv scalar swapped in; no copies, no host syncs."""
+        base = entry["conds"]
+        emotion_adv = entry["emotion_adv"].get(exaggeration)
+        if emotion_adv is None:
+            emotion_adv = exaggeration * torch.ones(1, 1, 1, device=self.device, dtype=base.t3.speaker_emb.dtype)
+            entry["emotion_adv"][exaggeration] = emotion_adv
+        return Conditionals(replace(base.t3, emotion_adv=emotion_adv), base.gen)
+
+    def _remember_conds(self, lru_key, conds: Conditionals, exaggeration):
+        if lru_key is None or self.cond_cache_size <= 0:
+            return
+        entry = {"conds": Conditionals(conds.t3, conds.gen), "emotion_adv": {exaggeration: conds.t3.emotion_adv}}
+        self._cond_lru[lru_key] = entry
+        self._cond_lru.move_to_end(lru_key)
+        while len(self._cond_lru) > self.cond_cache_size:
+            self._cond_lru.popitem(last=False)
+
+    def clear_cond_cache(self):
+        self._cond_lru.clear()
+
+    def load_voice_library(self, path=None):
+        """
+        Open a packed voice library (memory-mapped, shared by every process that opens it).
+        With no path, opens VOICE_LIBRARY_PATH if it exists.
+        """
+        from .voice_library import VoiceLibrary
+
+        if path is None:
+            if not VOICE_LIBRARY_PATH.exists():
+                return None
+            path = VOICE_LIBRARY_PATH
+        try:
+            self.voice_library = path if isinstance(path, VoiceLibrary) else VoiceLibrary(path)
+            print(f"Opened voice library {self.voice_library.path} ({len(self.voice_library)} voices)")
+        except Exception as e:
+            print(f"[TTS.load_voice_library/WARN] Could not open voice library {path}: {e}")
+            self.voice_library = None
+        return self.voice_library
 
+    def prepare_conditionals(self, wav_fpath, exaggeration=0.5, use_cache=True):
         if not wav_fpath or not Path(wav_fpath).exists():
             print(f"[TTS.prepare_conditionals/WARN] Invalid reference audio path: {wav_fpath}. Skipping conditional preparation.")
             # Potentially load default or raise error if reference is mandatory for current state
@@ -224,6 +384,29 @@ class ChatterboxTTS:
             print("[TTS.prepare_conditionals/WARN] Proceeding with existing/default conditionals.")
             return
 
+        lru_key = self._cond_lru_key(wav_fpath) if use_cache else None
+        if lru_key is not None and lru_key in self._cond_lru:
+            self._cond_lru.move_to_end(lru_key)
+            self.conds = self._conds_for_exaggeration(self._cond_lru[lru_key], exaggeration)
+            self._emotion_adv_value = (self.conds.t3.emotion_adv, exaggeration)
+            return
+
+        if use_cache and self.voice_library is not None:
+            conds = self.voice_library.load(wav_fpath, exaggeration=exaggeration, device=self.device)
+            if conds is not None:
+                self.conds = conds
+                self._remember_conds(lru_key, self.conds, exaggeration)
+                self._emotion_adv_value = (self.conds.t3.emotion_adv, exaggeration)
+                return
+
+        self._load_or_compute_conditionals(wav_fpath, exaggeration, use_cache)
+        self._remember_conds(lru_key, self.conds, exaggeration)
+        self._emotion_adv_value = (self.conds.t3.emotion_adv, exaggeration)
+
+    def _load_or_compute_conditionals(self, wav_fpath, exaggeration, use_cache):
+        audio_hash = None
+        cache_file = None
+
 
         if use_cache:
             try:
@@ -271,32 +454,63 @@ class ChatterboxTTS:
                     except Exception as e:
                         print(f"Failed to load or validate cached conditionals: {e}. Recomputing.")
 
-        s3gen_ref_wav_np, _sr_s3gen = librosa.load(wav_fpath, sr=S3GEN_SR)
-        ref_16k_wav_np, _sr_16k = librosa.load(wav_fpath, sr=S3_SR)
-
-        # Ensure they are numpy arrays for functions expecting them
-        if not isinstance(s3gen_ref_wav_np, np.ndarray): s3gen_ref_wav_np = np.array(s3gen_ref_wav_np)
-        if not isinstance(ref_16k_wav_np, np.ndarray): ref_16k_wav_np = np.array(ref_16k_wav_np)
+        with self._encoder_lock:
+            self.load_conditioning_encoders()
+            try:
+                self._compute_conditionals(wav_fpath, exaggeration)
+            finally:
+                if self.encoder_policy == "offload":
+                    self.release_conditioning_encoders()
 
-        s3gen_ref_wav_trimmed = s3gen_ref_wav_np[:self.DEC_COND_LEN]
-        # s3gen.embed_ref expects a numpy array or tensor, and its length
-        s3gen_ref_dict = self.s3gen.embed_ref(torch.from_numpy(s3gen_ref_wav_trimmed).float(), S3GEN_SR, device=self.device)
+        if use_cache and cache_file:
+            try:
+                self.conds.save(cache_file)
+                print(f"Saved new conditionals to cache: {cache_file}")
+            except Exception as e:
+                print(f"Failed to save conditionals to cache: {e}")
 
+    def compute_conditionals_batch(self, wav_fpaths, exaggeration=0.5) -> List[Conditionals]:
+        """
+        Conditionals for many reference files at once, for bulk precompute (see voice_library.py).
+        S3Gen x-vectors and prompt tokens, T3 prompt tokens and VoiceEncoder embeddings each come
+        from one batched call. Leaves `self.conds` and the caches untouched.
+        """
+        target_dtype = self.t3.text_emb.weight.dtype if hasattr(self.t3, 'text_emb') else torch.float32
+        with self._encoder_lock, torch.inference_mode():
+            self.load_conditioning_encoders()
+            try:
+                refs = [self.frontend.load(wav_fpath) for wav_fpath in wav_fpaths]
+                s3gen_ref_dicts = self.frontend.s3gen_ref_dicts(self.s3gen, refs, self.DEC_COND_LEN)
+
+                prompt_tokens = [None] * len(refs)
+                if (plen := getattr(self.t3.hp, 'speech_cond_prompt_len', 0)) and plen > 0:
+                    tokens, token_lens = self.s3gen.tokenizer.forward([ref.wav_16k[:self.ENC_COND_LEN] for ref in refs], max_len=plen)
+                    prompt_tokens = [tokens[i:i + 1, :int(token_lens[i])].to(self.device) for i in range(len(refs))]
+
+                ve_embeds = torch.from_numpy(self.ve.embeds_from_wav_tensors([ref.wav_16k for ref in refs], S3_SR)).to(self.device)
+            finally:
+                if self.encoder_policy == "offload":
+                    self.release_conditioning_encoders()
+
+        return [
+            Conditionals(T3Cond(
+                speaker_emb=ve_embeds[i:i + 1].to(dtype=target_dtype),
+                cond_prompt_speech_tokens=prompt_tokens[i],
+                emotion_adv=exaggeration * torch.ones(1, 1, 1, device=self.device, dtype=target_dtype),
+            ).to(device=self.device), s3gen_ref_dicts[i])
+            for i in range(len(refs))
+        ]
+
+    def _compute_conditionals(self, wav_fpath, exaggeration):
+        # Decode once, resample once per model rate, and derive every encoder input from that.
+        ref = self.frontend.load(wav_fpath)
+        s3gen_ref_dict = self.frontend.s3gen_ref_dict(self.s3gen, ref, self.DEC_COND_LEN)
 
         t3_cond_prompt_tokens = None
         if (plen := getattr(self.t3.hp, 'speech_cond_prompt_len', 0)) and plen > 0 :
-            s3_tokzr = self.s3gen.tokenizer
-            ref_16k_for_tokenizer = [ref_16k_wav_np[:self.ENC_COND_LEN]] # list of numpy arrays
+            t3_cond_prompt_tokens = self.frontend.speech_prompt_tokens(self.s3gen.tokenizer, ref, self.ENC_COND_LEN, max_len=plen)
 
-            # S3Tokenizer.forward expects a list of tensors or list of numpy arrays
-            # It returns a tuple: (tokens_tensor_batch, token_lengths_tensor_batch)
-            t3_cond_prompt_tokens_batch, _ = s3_tokzr.forward(ref_16k_for_tokenizer, max_len=plen)
-            t3_cond_prompt_tokens = torch.atleast_2d(t3_cond_prompt_tokens_batch[0]).to(self.device)
-
-        ve_embed_numpy = self.ve.embeds_from_wavs([ref_16k_wav_np], sample_rate=S3_SR) # Expects list of numpy
-        ve_embed = torch.from_numpy(ve_embed_numpy).to(self.device)
-        if ve_embed.ndim > 1 and ve_embed.shape[0] > 1: ve_embed = ve_embed.mean(axis=0, keepdim=True)
-        elif ve_embed.ndim == 1: ve_embed = ve_embed.unsqueeze(0)
+        ve_embed = self.frontend.speaker_embedding(self.ve, ref)
 
         # Determine dtype for emotion_adv from a model parameter to ensure consistency
         target_dtype = self.t3.text_emb.weight.dtype if hasattr(self.t3, 'text_emb') else torch.float32
@@ -310,13 +524,6 @@ class ChatterboxTTS:
 
         self.conds = Conditionals(t3_cond_obj, s3gen_ref_dict)
 
-        if use_cache and cache_file:
-            try:
-                self.conds.save(cache_file)
-                print(f"Saved new conditionals to cache: {cache_file}")
-            except Exception as e:
-                print(f"Failed to save conditionals to cache: {e}")
-
     def generate(
         self,
         text,
@@ -336,7 +543,12 @@ class ChatterboxTTS:
         current_emotion_adv = self.conds.t3.emotion_adv
         target_dtype = self.conds.t3.speaker_emb.dtype # Use dtype from existing speaker_emb
 
-        if not torch.is_tensor(current_emotion_adv) or not np.isclose(current_emotion_adv.item(), exaggeration):
+        if self._emotion_adv_value[0] is not current_emotion_adv:
+            # Conditionals set from outside prepare_conditionals: read the value once, not per chunk.
+            held = current_emotion_adv.item() if torch.is_tensor(current_emotion_adv) else None
+            self._emotion_adv_value = (current_emotion_adv, held)
+
+        if self._emotion_adv_value[1] is None or not np.isclose(self._emotion_adv_value[1], exaggeration):
             _cond_t3: T3Cond = self.conds.t3
             new_emotion_adv = exaggeration * torch.ones(1, 1, 1, device=self.device, dtype=target_dtype)
 
@@ -347,6 +559,7 @@ class ChatterboxTTS:
                 cond_prompt_speech_emb=getattr(_cond_t3, 'cond_prompt_speech_emb', None),
                 emotion_adv=new_emotion_adv
             ).to(device=self.device)
+            self._emotion_adv_value = (self.conds.t3.emotion_adv, exaggeration)
 
         text = punc_norm(text)
         text_tokens_single = self.tokenizer.text_to_tokens(text).to(self.device) # [1, T_text]
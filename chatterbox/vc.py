@@ -1,17 +1,31 @@
 from pathlib import Path
 
 import librosa
+import numpy as np
+import soundfile as sf
 import torch
 import perth
 from huggingface_hub import hf_hub_download
+from tqdm import tqdm
 
 from .models.s3tokenizer import S3_SR
 from .models.s3gen import S3GEN_SR, S3Gen
+from .models.utils import get_resampler
+from .frontend import ReferenceFrontend
 
 
 REPO_ID = "ResembleAI/chatterbox"
 
 
+def find_low_energy_cut(wav: torch.Tensor, lo: int, hi: int, frame: int = 320, hop: int = 160) -> int:
+    """Sample index in [lo, hi) of `wav` (1-D, 16 kHz) at the centre of the quietest `frame`-long window."""
+    region = wav[lo:hi]
+    if region.shape[0] < frame:
+        return (lo + hi) // 2
+    energy = region.unfold(0, frame, hop).pow(2).mean(dim=-1)
+    return lo + int(energy.argmin()) * hop + frame // 2
+
+
 class ChatterboxVC:
     ENC_COND_LEN = 6 * S3_SR
     DEC_COND_LEN = 10 * S3GEN_SR
@@ -26,6 +40,7 @@ class ChatterboxVC:
         self.s3gen = s3gen
         self.device = device
         self.watermarker = perth.PerthImplicitWatermarker()
+        self.frontend = ReferenceFrontend(device)
         if ref_dict is None:
             self.ref_dict = None
         else:
@@ -46,6 +61,7 @@ class ChatterboxVC:
         s3gen.load_state_dict(
             torch.load(ckpt_dir / "s3gen.pt")
         )
+        s3gen.mel2wav.optimize_for_inference()
         s3gen.to(device).eval()
 
         return cls(s3gen, device, ref_dict=ref_dict)
@@ -58,16 +74,15 @@ class ChatterboxVC:
         return cls.from_local(Path(local_path).parent, device)
 
     def set_target_voice(self, wav_fpath):
-        ## Load reference wav
-        s3gen_ref_wav, _sr = librosa.load(wav_fpath, sr=S3GEN_SR)
-
-        s3gen_ref_wav = s3gen_ref_wav[:self.DEC_COND_LEN]
-        self.ref_dict = self.s3gen.embed_ref(s3gen_ref_wav, S3GEN_SR, device=self.device)
+        ## Load reference wav (decoded once, resampled once per model rate)
+        ref = self.frontend.load(wav_fpath)
+        self.ref_dict = self.frontend.s3gen_ref_dict(self.s3gen, ref, self.DEC_COND_LEN)
 
     def generate(
         self,
         audio,
         target_voice_path=None,
+        apply_watermark=True,
     ):
         if target_voice_path:
             self.set_target_voice(target_voice_path)
@@ -84,5 +99,110 @@ class ChatterboxVC:
                 ref_dict=self.ref_dict,
             )
             wav = wav.squeeze(0).detach().cpu().numpy()
-            watermarked_wav = self.watermarker.apply_watermark(wav, sample_rate=self.sr)
-        return torch.from_numpy(watermarked_wav).unsqueeze(0)
+            if apply_watermark:
+                wav = self.watermarker.apply_watermark(wav, sample_rate=self.sr)
+        return torch.from_numpy(wav).unsqueeze(0)
+
+    def _read_16k(self, snd: sf.SoundFile, start: int, end: int) -> torch.Tensor:
+        """Samples [start, end) of `snd`, given in 16 kHz samples, as a mono 16 kHz tensor on device."""
+        scale = snd.samplerate / S3_SR
+        snd.seek(int(round(start * scale)))
+        block = snd.read(int(round((end - start) * scale)), dtype="float32", always_2d=True).mean(axis=1)
+        wav = torch.from_numpy(block).to(self.device)
+        if snd.samplerate != S3_SR:
+            wav = get_resampler(snd.samplerate, S3_SR, self.device)(wav)
+        return wav[:end - start]
+
+    def generate_streaming(
+        self,
+        audio,
+        out_path,
+        target_voice_path=None,
+        window_s: float = 30.0,
+        context_s: float = 1.0,
+        crossfade_s: float = 0.2,
+        search_s: float = 3.0,
+        progress_callback=None,
+        apply_watermark=True,
+    ):
+        """
+        Convert an arbitrarily long recording window by window, writing `out_path` as it goes.
+
+        Each window ends at the quietest point within `search_s` before its nominal `window_s`
+        length and is converted together with `context_s` of input audio on either side. The
+        context is dropped from the output except for `crossfade_s` around each seam, where
+        consecutive windows are cross-faded (`crossfade_s=0` joins them at the cut). Memory is
+        bounded by the window size, not the input duration.
+
+        `progress_callback(done_s, total_s)` is called after every window.
+        Returns the output path.
+        """
+        if target_voice_path:
+            self.set_target_voice(target_voice_path)
+        else:
+            assert self.ref_dict is not None, "Please `prepare_conditionals` first or specify `target_voice_path`"
+        assert 0 <= crossfade_s / 2 <= context_s, "The cross-fade must fit inside the context margin"
+        assert search_s < window_s, "The low-energy search region must be shorter than the window"
+
+        window, ctx, search = int(window_s * S3_SR), int(context_s * S3_SR), int(search_s * S3_SR)
+        half_xf = int(crossfade_s * S3_SR / 2)
+
+        def out_pos(p16):
+            # input position (16 kHz) -> output position (24 kHz); VC preserves timing
+            return p16 * S3GEN_SR // S3_SR
+
+        n_xf = out_pos(2 * half_xf)
+        fade_in = ((1 - np.cos(np.linspace(0, np.pi, n_xf))) / 2).astype(np.float32)
+        fade_out = 1 - fade_in
+
+        with sf.SoundFile(str(audio)) as snd, \
+                sf.SoundFile(str(out_path), "w", samplerate=self.sr, channels=1) as out, \
+                torch.inference_mode():
+            total = int(snd.frames * S3_SR / snd.samplerate)
+            pbar = tqdm(total=round(total / S3_SR, 1), desc="Converting", unit="s", dynamic_ncols=True)
+            start, tail = 0, None
+            while start < total:
+                seg_start = max(start - ctx, 0)
+                nominal_end = start + window
+                if nominal_end + search + ctx >= total:
+                    wav16 = self._read_16k(snd, seg_start, total)
+                    cut, seg_end = total, total
+                else:
+                    wav16 = self._read_16k(snd, seg_start, nominal_end + ctx)
+                    cut = find_low_energy_cut(wav16, nominal_end - search - seg_start, nominal_end - seg_start) + seg_start
+                    seg_end = cut + ctx
+                    wav16 = wav16[:seg_end - seg_start]
+                is_last = cut >= total
+
+                s3_tokens, _ = self.s3gen.tokenizer(wav16[None])
+                wav, _ = self.s3gen.inference(speech_tokens=s3_tokens, ref_dict=self.ref_dict)
+                wav = wav.squeeze(0).cpu().numpy()
+                if apply_watermark:
+                    wav = self.watermarker.apply_watermark(wav, sample_rate=self.sr)
+
+                # keep [start - half_xf, cut + half_xf) of this window's output, zero-padded if the
+                # token grid left it a few ms short
+                keep_start = start - half_xf if tail is not None else start
+                keep_end = cut if is_last else cut + half_xf
+                lo, hi = out_pos(keep_start) - out_pos(seg_start), out_pos(keep_end) - out_pos(seg_start)
+                piece = np.zeros(hi - lo, dtype=np.float32)
+                avail = wav[lo:hi]
+                piece[:len(avail)] = avail
+
+                if tail is not None:
+                    out.write(tail * fade_out + piece[:n_xf] * fade_in)
+                    piece = piece[n_xf:]
+                if is_last or n_xf == 0:
+                    # nothing to carry into a next seam (last window, or no cross-fade)
+                    out.write(piece)
+                else:
+                    out.write(piece[:-n_xf])
+                    tail = piece[-n_xf:]
+
+                pbar.update(round((cut - start) / S3_SR, 1))
+                if progress_callback is not None:
+                    progress_callback(cut / S3_SR, total / S3_SR)
+                start = cut
+            pbar.close()
+
+        return out_path
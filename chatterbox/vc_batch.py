@@ -0,0 +1,270 @@
+"""
+Batch voice conversion: re-voice a directory of recordings to one target voice.
+
+The target voice's S3Gen conditioning (`ref_dict`) is computed once and shipped to
+every worker. Inputs are sorted by duration and grouped into buckets, each bucket
+is tokenized as one padded batch, and buckets are spread across worker processes
+(one model per process, several processes per device if there is room). Outputs
+newer than both their input and the target voice are skipped.
+
+    python -m chatterbox.vc_batch /path/to/recordings target.wav --out_dir revoiced --devices cuda:0,cuda:1
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import librosa
+import soundfile as sf
+import torch
+import torchaudio as ta
+
+from .models.s3tokenizer import S3_SR
+
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".mp3", ".ogg", ".m4a")
+
+_WORKER_VC_MODEL = None
+_WORKER_WATERMARK = True
+
+
+def audio_duration(path) -> float:
+    """Duration in seconds from the file header, falling back to librosa for formats soundfile can't read."""
+    try:
+        return sf.info(str(path)).duration
+    except Exception:
+        return librosa.get_duration(path=str(path))
+
+
+def is_up_to_date(in_path: Path, out_path: Path, target_voice: Path) -> bool:
+    if not out_path.exists():
+        return False
+    out_mtime = out_path.stat().st_mtime
+    return out_mtime >= in_path.stat().st_mtime and out_mtime >= target_voice.stat().st_mtime
+
+
+def make_buckets(jobs: List[tuple], bucket_size: int, max_bucket_s: float) -> List[List[tuple]]:
+    """Group (duration, in_path, out_path) jobs of similar length; a bucket holds at most `bucket_size` files and `max_bucket_s` seconds."""
+    buckets, current, current_s = [], [], 0.0
+    for job in sorted(jobs, key=lambda j: j[0]):
+        if current and (len(current) >= bucket_size or current_s + job[0] > max_bucket_s):
+            buckets.append(current)
+            current, current_s = [], 0.0
+        current.append(job)
+        current_s += job[0]
+    if current:
+        buckets.append(current)
+    return buckets
+
+
+def compute_target_ref_dict(target_voice, device) -> dict:
+    """S3Gen conditioning for the target voice, as CPU tensors that can be sent to worker processes."""
+    from .vc import ChatterboxVC
+
+    model = ChatterboxVC.from_pretrained(device)
+    model.set_target_voice(str(target_voice))
+    ref_dict = {k: v.cpu() if torch.is_tensor(v) else v for k, v in model.ref_dict.items()}
+    del model
+    if str(device).startswith("cuda"):
+        torch.cuda.empty_cache()
+    return ref_dict
+
+
+def _partial_path(out_path) -> Path:
+    """Where an output is written before being moved into place, so a crash never leaves a truncated file that looks up to date."""
+    out_path = Path(out_path)
+    return out_path.with_name(f".{out_path.stem}.partial{out_path.suffix}")
+
+
+def _save_atomic(out_path, wav, sr):
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    partial = _partial_path(out_path)
+    try:
+        ta.save(str(partial), wav, sr)
+        os.replace(partial, out_path)
+    finally:
+        partial.unlink(missing_ok=True)
+
+
+def _init_vc_worker(device_queue, ref_dict, watermark):
+    global _WORKER_VC_MODEL, _WORKER_WATERMARK
+    from .vc import ChatterboxVC
+
+    device = device_queue.get()
+    logging.info(f"[VCWorker-{os.getpid()}] Loading model on {device}")
+    _WORKER_VC_MODEL = ChatterboxVC.from_pretrained(device)
+    _WORKER_VC_MODEL.ref_dict = {k: v.to(device) if torch.is_tensor(v) else v for k, v in ref_dict.items()}
+    _WORKER_WATERMARK = watermark
+
+
+def _convert_bucket(bucket):
+    """
+    Convert one bucket: a single padded tokenizer call, then S3Gen per item (the flow runs at batch size 1).
+    A file that fails to load or convert is reported on its own; the rest of the bucket carries on.
+    """
+    model = _WORKER_VC_MODEL
+    results, loaded = [], []
+    with torch.inference_mode():
+        for _, in_path, out_path in bucket:
+            try:
+                wav = torch.from_numpy(librosa.load(in_path, sr=S3_SR)[0]).float().to(model.device)
+                loaded.append((in_path, out_path, wav))
+            except Exception as e:
+                logging.error(f"[VCWorker-{os.getpid()}] Failed to load {in_path}: {e}", exc_info=True)
+                results.append((in_path, "error", f"load: {e}"))
+        if not loaded:
+            return results
+        try:
+            tokens, token_lens = model.s3gen.tokenizer([wav for _, _, wav in loaded])
+            token_rows = [tokens[i:i + 1, :int(token_lens[i])] for i in range(len(loaded))]
+        except Exception as e:
+            # Retry one at a time so a single bad file doesn't fail the bucket.
+            logging.warning(f"[VCWorker-{os.getpid()}] Batched tokenization failed ({e}); tokenizing files one by one")
+            token_rows = None
+        for i, (in_path, out_path, wav_in) in enumerate(loaded):
+            try:
+                if token_rows is not None:
+                    speech_tokens = token_rows[i]
+                else:
+                    tokens, token_lens = model.s3gen.tokenizer([wav_in])
+                    speech_tokens = tokens[:, :int(token_lens[0])]
+                wav, _ = model.s3gen.inference(speech_tokens=speech_tokens, ref_dict=model.ref_dict)
+                wav = wav.squeeze(0).cpu().numpy()
+                if _WORKER_WATERMARK:
+                    wav = model.watermarker.apply_watermark(wav, sample_rate=model.sr)
+                _save_atomic(out_path, torch.as_tensor(wav).unsqueeze(0), model.sr)
+                results.append((in_path, "success", None))
+            except Exception as e:
+                logging.error(f"[VCWorker-{os.getpid()}] Failed to convert {in_path}: {e}", exc_info=True)
+                results.append((in_path, "error", str(e)))
+    return results
+
+
+def _convert_long_file(job):
+    """Files above the streaming threshold go through `generate_streaming` on their own."""
+    _, in_path, out_path = job
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    partial = _partial_path(out_path)
+    try:
+        _WORKER_VC_MODEL.generate_streaming(in_path, str(partial), apply_watermark=_WORKER_WATERMARK)
+        os.replace(partial, out_path)
+        return [(in_path, "success", None)]
+    except Exception as e:
+        logging.error(f"[VCWorker-{os.getpid()}] Failed to convert {in_path}: {e}", exc_info=True)
+        return [(in_path, "error", str(e))]
+    finally:
+        partial.unlink(missing_ok=True)
+
+
+def run_vc_batch(
+    input_dir,
+    target_voice,
+    out_dir,
+    devices: Sequence[str] = ("cpu",),
+    workers_per_device: int = 1,
+    bucket_size: int = 8,
+    max_bucket_s: float = 240.0,
+    stream_above_s: float = 600.0,
+    watermark: bool = True,
+    recursive: bool = False,
+    force: bool = False,
+    ref_dict: Optional[dict] = None,
+) -> dict:
+    """
+    Convert every recording in `input_dir` to `target_voice`, mirroring the directory layout
+    under `out_dir` as .wav files. Returns counts of converted / skipped / failed files.
+    """
+    input_dir, out_dir, target_voice = Path(input_dir), Path(out_dir), Path(target_voice)
+    pattern = "**/*" if recursive else "*"
+    in_paths = sorted(p for p in input_dir.glob(pattern) if p.suffix.lower() in AUDIO_EXTENSIONS)
+
+    jobs, skipped, unreadable = [], 0, []
+    for in_path in in_paths:
+        out_path = (out_dir / in_path.relative_to(input_dir)).with_suffix(".wav")
+        if not force and is_up_to_date(in_path, out_path, target_voice):
+            skipped += 1
+            continue
+        try:
+            jobs.append((audio_duration(in_path), str(in_path), str(out_path)))
+        except Exception as e:
+            logging.error(f"Cannot read {in_path}: {e}")
+            unreadable.append((str(in_path), f"load: {e}"))
+
+    logging.info(f"{len(in_paths)} recordings, {skipped} up to date, {len(jobs)} to convert, {len(unreadable)} unreadable.")
+    summary = {"converted": 0, "skipped": skipped, "failed": unreadable}
+    if not jobs:
+        return summary
+
+    if ref_dict is None:
+        ref_dict = compute_target_ref_dict(target_voice, devices[0])
+
+    long_jobs = [j for j in jobs if j[0] > stream_above_s]
+    buckets = make_buckets([j for j in jobs if j[0] <= stream_above_s], bucket_size, max_bucket_s)
+
+    ctx = multiprocessing.get_context("spawn")
+    n_workers = len(devices) * workers_per_device
+    with ctx.Manager() as manager:
+        device_queue = manager.Queue()
+        for i in range(n_workers):
+            device_queue.put(devices[i % len(devices)])
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=ctx, initializer=_init_vc_worker, initargs=(device_queue, ref_dict, watermark)) as executor:
+            # longest work first so the pool doesn't finish on a single long file
+            futures = {executor.submit(_convert_long_file, job): [job] for job in sorted(long_jobs, reverse=True)}
+            futures.update({executor.submit(_convert_bucket, bucket): bucket for bucket in reversed(buckets)})
+            n_done = 0
+            for future in as_completed(futures):
+                try:
+                    results = future.result()
+                except Exception as e:
+                    logging.error(f"VC worker failed: {e}", exc_info=True)
+                    results = [(in_path, "error", f"worker: {e}") for _, in_path, _ in futures[future]]
+                for in_path, status, error in results:
+                    n_done += 1
+                    if status == "success":
+                        summary["converted"] += 1
+                    else:
+                        summary["failed"].append((in_path, error))
+                    logging.info(f"[{n_done}/{len(jobs)}] {status}: {in_path}")
+
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a directory of recordings to one target voice.")
+    parser.add_argument("input_dir", type=str, help="Directory of recordings to convert.")
+    parser.add_argument("target_voice", type=str, help="Reference audio of the target voice.")
+    parser.add_argument("--out_dir", type=str, required=True, help="Output directory; the input layout is mirrored as .wav files.")
+    parser.add_argument("--devices", type=str, default="cpu", help="Comma-separated devices, e.g. cuda:0,cuda:1.")
+    parser.add_argument("--workers_per_device", type=int, default=1)
+    parser.add_argument("--bucket_size", type=int, default=8, help="Max files tokenized together.")
+    parser.add_argument("--max_bucket_s", type=float, default=240.0, help="Max total seconds of audio per bucket.")
+    parser.add_argument("--stream_above_s", type=float, default=600.0, help="Files longer than this are converted window by window.")
+    parser.add_argument("--no_watermark", action="store_true", help="Skip the Perth watermark.")
+    parser.add_argument("--recursive", action="store_true", help="Also scan subdirectories.")
+    parser.add_argument("--force", action="store_true", help="Re-convert files whose outputs are up to date.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    devices = [d.strip() for d in args.devices.split(",") if d.strip()] or ["cpu"]
+    summary = run_vc_batch(
+        args.input_dir, args.target_voice, args.out_dir,
+        devices=devices,
+        workers_per_device=args.workers_per_device,
+        bucket_size=args.bucket_size,
+        max_bucket_s=args.max_bucket_s,
+        stream_above_s=args.stream_above_s,
+        watermark=not args.no_watermark,
+        recursive=args.recursive,
+        force=args.force,
+    )
+    print(f"Converted {summary['converted']}, skipped {summary['skipped']} up to date, {len(summary['failed'])} failed.")
+    for in_path, error in summary["failed"]:
+        print(f"  FAILED {in_path}: {error}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Packed voice library: precomputed conditionals for many reference voices in one
+safetensors file.
+
+Each voice is stored as plain tensors (no pickle) named `<voice_id>/t3.<field>` and
+`<voice_id>/gen.<field>`, with a JSON index in the file metadata mapping the
+reference path, mtime and size to its voice id. The file is opened with
+`safetensors.safe_open`, which memory-maps it read-only, so every worker process
+shares the same page-cache copy and a lookup is a dict hit plus a tensor read.
+
+Only the exaggeration-independent parts are stored; `emotion_adv` is created on
+load for the requested exaggeration.
+
+Build or refresh a library from a directory of reference WAVs:
+
+    python -m chatterbox.voice_library /path/to/voices --out voices.safetensors --devices cuda:0,cuda:1
+"""
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Dict, Optional
+
+import torch
+from safetensors import safe_open
+from safetensors.torch import save_file
+
+from .models.t3.modules.cond_enc import T3Cond
+
+
+T3_FIELDS = ("speaker_emb", "clap_emb", "cond_prompt_speech_tokens", "cond_prompt_speech_emb")
+INDEX_METADATA_KEY = "chatterbox_voice_index"
+FORMAT_VERSION = "1"
+AUDIO_EXTENSIONS = (".wav", ".flac", ".mp3", ".ogg")
+
+
+def voice_key(wav_fpath):
+    """(abs path, mtime_ns, size) of a reference file, the same key ChatterboxTTS uses for its in-memory cache."""
+    stat = os.stat(wav_fpath)
+    return os.path.abspath(wav_fpath), stat.st_mtime_ns, stat.st_size
+
+
+def _voice_id(abs_path: str) -> str:
+    return hashlib.md5(abs_path.encode()).hexdigest()
+
+
+def conds_to_tensors(conds) -> Dict[str, torch.Tensor]:
+    """Flatten the exaggeration-independent parts of a `Conditionals` into named CPU tensors."""
+    tensors = {}
+    for field in T3_FIELDS:
+        value = getattr(conds.t3, field, None)
+        if torch.is_tensor(value):
+            tensors[f"t3.{field}"] = value.detach().cpu().contiguous()
+    for k, v in conds.gen.items():
+        if torch.is_tensor(v):
+            tensors[f"gen.{k}"] = v.detach().cpu().contiguous()
+    return tensors
+
+
+class VoiceLibrary:
+    """Read-only, memory-mapped view of a packed voice library file."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._stack = ExitStack()
+        self._file = self._stack.enter_context(safe_open(str(self.path), framework="pt", device="cpu"))
+        metadata = self._file.metadata() or {}
+        index = json.loads(metadata.get(INDEX_METADATA_KEY, "{}"))
+        self.voices = index.get("voices", {})
+        self._by_path = {entry["path"]: voice_id for voice_id, entry in self.voices.items()}
+
+    def __len__(self):
+        return len(self.voices)
+
+    def close(self):
+        """Releases the memory map. Windows can't replace or delete the file while it is open."""
+        self._stack.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def lookup(self, wav_fpath) -> Optional[str]:
+        """Voice id for `wav_fpath` if the library holds an up-to-date entry for it, else None."""
+        try:
+            abs_path, mtime_ns, size = voice_key(wav_fpath)
+        except OSError:
+            return None
+        voice_id = self._by_path.get(abs_path)
+        if voice_id is None:
+            return None
+        entry = self.voices[voice_id]
+        if entry["mtime_ns"] != mtime_ns or entry["size"] != size:
+            return None
+        return voice_id
+
+    def get_tensors(self, voice_id) -> Dict[str, torch.Tensor]:
+        entry = self.voices[voice_id]
+        return {name: self._file.get_tensor(f"{voice_id}/{name}") for name in entry["tensors"]}
+
+    def load(self, wav_fpath, exaggeration=0.5, device="cpu"):
+        """`Conditionals` for `wav_fpath` on `device`, or None if the voice is missing or stale."""
+        from .tts import Conditionals
+
+        voice_id = self.lookup(wav_fpath)
+        if voice_id is None:
+            return None
+        tensors = {k: v.to(device) for k, v in self.get_tensors(voice_id).items()}
+        entry = self.voices[voice_id]
+
+        speaker_emb = tensors["t3.speaker_emb"]
+        t3 = T3Cond(
+            **{field: tensors.get(f"t3.{field}") for field in T3_FIELDS},
+            emotion_adv=exaggeration * torch.ones(1, 1, 1, device=device, dtype=speaker_emb.dtype),
+        )
+        gen = {k: tensors.get(f"gen.{k}") for k in entry["gen_keys"]}
+        return Conditionals(t3, gen)
+
+
+def write_library(path, voices: Dict[str, dict]):
+    """
+    Write a library file from `voices`: voice_id -> {"path", "mtime_ns", "size", "gen_keys", "tensors": {name: tensor}}.
+    The file is written next to `path` and moved into place, so readers never see a partial file.
+    """
+    path = Path(path)
+    tensors, index = {}, {}
+    for voice_id, voice in voices.items():
+        for name, tensor in voice["tensors"].items():
+            tensors[f"{voice_id}/{name}"] = tensor.contiguous()
+        index[voice_id] = {
+            "path": voice["path"],
+            "mtime_ns": voice["mtime_ns"],
+            "size": voice["size"],
+            "gen_keys": list(voice["gen_keys"]),
+            "tensors": sorted(voice["tensors"]),
+        }
+    metadata = {INDEX_METADATA_KEY: json.dumps({"format": FORMAT_VERSION, "voices": index})}
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    save_file(tensors, str(tmp_path), metadata=metadata)
+    os.replace(tmp_path, path)
+    return path
+
+
+# --- Bulk precompute ---
+
+_WORKER_TTS_MODEL = None
+
+
+def _init_precompute_worker(device_queue):
+    global _WORKER_TTS_MODEL
+    from .tts import ChatterboxTTS
+
+    device = device_queue.get()
+    logging.info(f"[VoiceLibrary-{os.getpid()}] Loading model on {device}")
+    _WORKER_TTS_MODEL = ChatterboxTTS.from_pretrained(device)
+
+
+def _voice_entry(wav_fpath, conds):
+    abs_path, mtime_ns, size = voice_key(wav_fpath)
+    return _voice_id(abs_path), {
+        "path": abs_path,
+        "mtime_ns": mtime_ns,
+        "size": size,
+        "gen_keys": list(conds.gen.keys()),
+        "tensors": conds_to_tensors(conds),
+    }
+
+
+def _precompute_voices(wav_fpaths):
+    """
+    [(wav_fpath, (voice_id, voice) or None, error or None)] for a batch of reference files, whose
+    encoders run as one batch. If the batch fails, its files are retried one at a time.
+    """
+    model = _WORKER_TTS_MODEL
+    try:
+        return [(p, _voice_entry(p, conds), None) for p, conds in zip(wav_fpaths, model.compute_conditionals_batch(wav_fpaths))]
+    except Exception as e:
+        if len(wav_fpaths) == 1:
+            return [(wav_fpaths[0], None, str(e))]
+        logging.warning(f"[VoiceLibrary-{os.getpid()}] Batch of {len(wav_fpaths)} failed ({e}); computing them one by one")
+    return [result for p in wav_fpaths for result in _precompute_voices([p])]
+
+
+def build_library(wav_dir, out_path, devices=("cpu",), workers_per_device=1, recursive=False, batch_size=8):
+    """
+    Precompute conditionals for every reference file in `wav_dir` into `out_path`, `batch_size`
+    files per encoder batch. Entries of an existing library whose source file is unchanged are kept
+    as-is; entries whose source file no longer exists are dropped.
+    """
+    wav_dir = Path(wav_dir)
+    pattern = "**/*" if recursive else "*"
+    wav_paths = sorted(p for p in wav_dir.glob(pattern) if p.suffix.lower() in AUDIO_EXTENSIONS)
+
+    voices = {}
+    if Path(out_path).exists():
+        # Copy the kept entries out and close the file before write_library replaces it.
+        with VoiceLibrary(out_path) as existing:
+            for voice_id, entry in existing.voices.items():
+                if not os.path.exists(entry["path"]):
+                    logging.info(f"Dropping {entry['path']}: the reference file no longer exists.")
+                    continue
+                tensors = {name: tensor.clone() for name, tensor in existing.get_tensors(voice_id).items()}
+                voices[voice_id] = dict(entry, tensors=tensors)
+
+    todo = []
+    for wav_path in wav_paths:
+        abs_path, mtime_ns, size = voice_key(wav_path)
+        entry = voices.get(_voice_id(abs_path))
+        if entry is None or entry["mtime_ns"] != mtime_ns or entry["size"] != size:
+            todo.append(str(wav_path))
+
+    logging.info(f"{len(wav_paths)} reference files, {len(todo)} to (re)compute.")
+    if todo:
+        ctx = multiprocessing.get_context("spawn")
+        n_workers = len(devices) * workers_per_device
+        device_queue = ctx.Manager().Queue()
+        for i in range(n_workers):
+            device_queue.put(devices[i % len(devices)])
+
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=ctx, initializer=_init_precompute_worker, initargs=(device_queue,)) as executor:
+            batches = [todo[i:i + batch_size] for i in range(0, len(todo), batch_size)]
+            futures = {executor.submit(_precompute_voices, batch): batch for batch in batches}
+            n_done = 0
+            for future in as_completed(futures):
+                try:
+                    results = future.result()
+                except Exception as e:
+                    results = [(p, None, str(e)) for p in futures[future]]
+                for wav_fpath, voice, error in results:
+                    n_done += 1
+                    if voice is None:
+                        logging.error(f"Failed to precompute conditionals for {wav_fpath}: {error}")
+                        continue
+                    voices[voice[0]] = voice[1]
+                    logging.info(f"[{n_done}/{len(todo)}] {wav_fpath}")
+
+    return write_library(out_path, voices)
+
+
+def main():
+    from .tts import VOICE_LIBRARY_PATH
+
+    parser = argparse.ArgumentParser(description="Precompute a packed Chatterbox voice library from a directory of reference audio.")
+    parser.add_argument("wav_dir", type=str, help="Directory of reference audio files.")
+    parser.add_argument("--out", type=str, default=str(VOICE_LIBRARY_PATH),
+                        help="Library file to create or update. Default: the location ChatterboxTTS opens automatically.")
+    parser.add_argument("--devices", type=str, default="cpu", help="Comma-separated devices, e.g. cuda:0,cuda:1.")
+    parser.add_argument("--workers_per_device", type=int, default=1)
+    parser.add_argument("--recursive", action="store_true", help="Also scan subdirectories.")
+    parser.add_argument("--batch_size", type=int, default=8, help="Reference files encoded together.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    devices = [d.strip() for d in args.devices.split(",") if d.strip()] or ["cpu"]
+    out_path = build_library(args.wav_dir, args.out, devices=devices, workers_per_device=args.workers_per_device, recursive=args.recursive, batch_size=args.batch_size)
+    with VoiceLibrary(out_path) as library:
+        print(f"Voice library written to {out_path} ({len(library)} voices)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# core/cost_model.py
+"""
+Predicted wall time per chunk, for scheduling and the run ETA.
+
+A chunk costs expected_attempts * (overhead + text_tokens / tokens_per_second) on a
+device. Overhead and throughput are fitted per device by least squares over recent
+chunks (seconds per attempt against text tokens), and expected attempts is the
+historical mean, so it follows the retry rate. Until a device has enough history,
+priors by device type are used. Every run records its chunks and refits, and the
+model persists next to the CPU plan.
+"""
+import json
+import logging
+import os
+from pathlib import Path
+
+COST_MODEL_PATH = Path(os.getenv("XDG_CACHE_HOME", Path.home() / ".cache")) / "chatterbox_pro" / "cost_model.json"
+
+# Per device type: seconds of fixed cost per attempt, and text tokens generated per second.
+PRIORS = {"cuda": (1.0, 40.0), "cpu": (2.0, 7.0)}
+PRIOR_ATTEMPTS = 1.2
+MIN_RECORDS = 8
+MAX_RECORDS = 2000
+
+
+def text_tokens(text):
+    """Text tokens T3 sees for `text`. The English tokenizer is close to one token per character, spaces included."""
+    return max(len(text.strip()), 1)
+
+
+def _device_type(device):
+    return "cuda" if "cuda" in device else "cpu"
+
+
+def _fit_line(points):
+    """Least-squares (intercept, slope) of [(x, y)], or None when x has no spread."""
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if var_x <= 0:
+        return None
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+    return mean_y - slope * mean_x, slope
+
+
+class ChunkCostModel:
+    def __init__(self, records=None):
+        self.records = list(records or [])[-MAX_RECORDS:]
+        self.devices = {}
+        self.expected_attempts = PRIOR_ATTEMPTS
+        self.fit()
+
+    @classmethod
+    def load(cls, path=COST_MODEL_PATH):
+        try:
+            return cls(json.loads(Path(path).read_text()).get("records"))
+        except (OSError, ValueError, AttributeError):
+            return cls()
+
+    def save(self, path=COST_MODEL_PATH):
+        try:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            Path(path).write_text(json.dumps({"devices": self.devices, "expected_attempts": self.expected_attempts, "records": self.records}))
+        except OSError as e:
+            logging.warning(f"Could not save the chunk cost model to {path}: {e}")
+
+    def record(self, device, text, attempts, wall_s):
+        """Adds one finished chunk; call `fit()` to use it."""
+        if attempts and wall_s and wall_s > 0:
+            self.records.append({"device": device, "tokens": text_tokens(text), "attempts": int(attempts), "wall_s": round(float(wall_s), 3)})
+            del self.records[:-MAX_RECORDS]
+
+    def fit(self):
+        """Refits per-device (overhead, tokens/s) and the expected attempts per chunk from the records."""
+        if self.records:
+            self.expected_attempts = max(1.0, sum(r["attempts"] for r in self.records) / len(self.records))
+        by_device = {}
+        for r in self.records:
+            by_device.setdefault(r["device"], []).append((r["tokens"], r["wall_s"] / r["attempts"]))
+        self.devices = {}
+        for device, points in by_device.items():
+            if len(points) < MIN_RECORDS:
+                continue
+            overhead, _ = PRIORS[_device_type(device)]
+            line = _fit_line(points)
+            if line is not None and line[0] >= 0 and line[1] > 0:
+                overhead, seconds_per_token = line
+            else:
+                # Too little spread in chunk length for a line: keep the prior overhead, fit throughput only.
+                seconds_per_token = max(sum(y - overhead for _, y in points), 1e-3) / sum(x for x, _ in points)
+            self.devices[device] = (round(overhead, 4), round(1.0 / seconds_per_token, 4))
+        return self
+
+    def predict(self, text, device):
+        """Expected wall seconds for a chunk of `text` on `device`, retries included."""
+        overhead, tokens_per_s = self.devices.get(device) or PRIORS[_device_type(device)]
+        return self.expected_attempts * (overhead + text_tokens(text) / tokens_per_s)
+
+    def describe(self):
+        fitted = ", ".join(f"{d}: {o:.1f}s + {t:.0f} tok/s" for d, (o, t) in self.devices.items()) or "priors only"
+        return f"{fitted}; {self.expected_attempts:.2f} attempts/chunk over {len(self.records)} chunks"
+
+
+def lpt_assign(costs, workers):
+    """
+    Longest-processing-time-first: takes each task, costliest first, onto the worker that would
+    finish it earliest. `costs` maps task -> {device: predicted seconds}; `workers` lists devices,
+    one entry per worker. Returns [(task, device)] in submission order, and the predicted makespan.
+    """
+    loads = [0.0] * len(workers)
+    order = sorted(costs, key=lambda task: min(costs[task].values()), reverse=True)
+    assigned = []
+    for task in order:
+        slot = min(range(len(workers)), key=lambda i: loads[i] + costs[task][workers[i]])
+        loads[slot] += costs[task][workers[slot]]
+        assigned.append((task, workers[slot]))
+    return assigned, max(loads, default=0.0)
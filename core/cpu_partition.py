@@ -0,0 +1,220 @@
+# core/cpu_partition.py
+"""
+CPU core partitioning for running several TTS workers on one CPU host.
+
+Each CPU worker gets a disjoint set of cores (kept inside one NUMA node when the
+split allows it), pins itself to them, and sizes torch's intra-op and inter-op
+thread pools to match, so N workers share the machine instead of oversubscribing it.
+
+Find the best workers x threads split for this host with:
+
+    python -m core.cpu_partition --calibrate
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+CPU_PLAN_PATH = Path(os.getenv("XDG_CACHE_HOME", Path.home() / ".cache")) / "chatterbox_pro" / "cpu_plan.json"
+
+
+@dataclass
+class CpuAssignment:
+    """What one CPU worker applies to itself at start-up."""
+    cores: list
+    intra_op_threads: int
+    inter_op_threads: int = 1
+
+
+def available_cores():
+    """Cores this process may run on (respects taskset / cgroup CPU sets on Linux)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _parse_cpulist(text):
+    cores = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-")
+            cores.extend(range(int(lo), int(hi) + 1))
+        else:
+            cores.append(int(part))
+    return cores
+
+
+def numa_nodes():
+    """Available cores grouped by NUMA node; a single group when the topology isn't exposed (non-Linux)."""
+    allowed = set(available_cores())
+    nodes = []
+    for node_dir in sorted(Path("/sys/devices/system/node").glob("node[0-9]*"), key=lambda p: int(p.name[4:])):
+        try:
+            cores = [c for c in _parse_cpulist((node_dir / "cpulist").read_text()) if c in allowed]
+        except OSError:
+            continue
+        if cores:
+            nodes.append(cores)
+    return nodes or [sorted(allowed)]
+
+
+def _split_evenly(cores, n_parts):
+    """`cores` cut into `n_parts` contiguous runs whose sizes differ by at most one."""
+    size, extra = divmod(len(cores), n_parts)
+    parts, start = [], 0
+    for i in range(n_parts):
+        end = start + size + (1 if i < extra else 0)
+        parts.append(cores[start:end])
+        start = end
+    return parts
+
+
+def partition_cores(n_workers, nodes=None):
+    """
+    Split the available cores into `n_workers` disjoint sets that use every core and
+    differ in size by at most one within a node. Workers are spread over NUMA nodes in
+    proportion to their core counts and never straddle a node unless there are fewer
+    workers than nodes.
+    """
+    nodes = nodes or numa_nodes()
+    n_cores = sum(len(n) for n in nodes)
+    n_workers = max(1, min(n_workers, n_cores))
+
+    if n_workers < len(nodes):
+        return _split_evenly([c for node in nodes for c in node], n_workers)
+
+    # workers per node, proportional to node size, at least one each
+    shares = [max(1, round(n_workers * len(node) / n_cores)) for node in nodes]
+    while sum(shares) > n_workers:
+        shares[shares.index(max(shares))] -= 1
+    while sum(shares) < n_workers:
+        shares[shares.index(min(shares))] += 1
+
+    core_sets = []
+    for node, share in zip(nodes, shares):
+        core_sets.extend(_split_evenly(node, share))
+    return core_sets
+
+
+def plan_cpu_workers(n_workers, inter_op_threads=1):
+    """One CpuAssignment per CPU worker, with intra-op threads equal to its core count."""
+    return [CpuAssignment(cores, len(cores), inter_op_threads) for cores in partition_cores(n_workers)]
+
+
+def apply_cpu_assignment(assignment: CpuAssignment):
+    """Pins the calling process to its cores and sizes torch's thread pools. Call before any torch work."""
+    import torch
+
+    if hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, assignment.cores)
+        except OSError as e:
+            logging.warning(f"[Worker-{os.getpid()}] Could not pin to cores {assignment.cores}: {e}")
+    os.environ["OMP_NUM_THREADS"] = str(assignment.intra_op_threads)
+    torch.set_num_threads(assignment.intra_op_threads)
+    try:
+        torch.set_num_interop_threads(assignment.inter_op_threads)
+    except RuntimeError:
+        # Only settable once, before inter-op parallel work has started.
+        pass
+
+
+def load_cpu_plan():
+    """The calibrated {"workers": N, "inter_op_threads": M} for this host, or None."""
+    try:
+        return json.loads(CPU_PLAN_PATH.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def default_cpu_workers():
+    plan = load_cpu_plan()
+    return int(plan["workers"]) if plan else 1
+
+
+# --- Calibration ---
+
+def _calibration_workload(n_tokens):
+    """Decoder-like workload: per-token batch-2 (CFG) passes through a stack of MLP blocks sized like T3's Llama."""
+    import torch
+
+    torch.manual_seed(0)
+    layers = [torch.nn.Sequential(torch.nn.Linear(1024, 4096), torch.nn.SiLU(), torch.nn.Linear(4096, 1024)) for _ in range(8)]
+    x = torch.randn(2, 1, 1024)
+    with torch.inference_mode():
+        for _ in range(n_tokens):
+            for layer in layers:
+                x = x + layer(x) * 1e-3
+
+
+def _calibration_worker(assignment, n_tokens, barrier, results):
+    apply_cpu_assignment(assignment)
+    _calibration_workload(2)  # warm-up
+    barrier.wait()
+    start = time.perf_counter()
+    _calibration_workload(n_tokens)
+    results.put(time.perf_counter() - start)
+
+
+def measure_split(n_workers, n_tokens=200, inter_op_threads=1):
+    """Aggregate tokens/sec with `n_workers` pinned workers running the calibration workload concurrently."""
+    ctx = multiprocessing.get_context("spawn")
+    assignments = plan_cpu_workers(n_workers, inter_op_threads)
+    barrier, results = ctx.Barrier(len(assignments)), ctx.Queue()
+    procs = [ctx.Process(target=_calibration_worker, args=(a, n_tokens, barrier, results)) for a in assignments]
+    for p in procs:
+        p.start()
+    elapsed = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return len(assignments) * n_tokens / max(elapsed)
+
+
+def calibrate(max_workers=None, n_tokens=200):
+    """Tries worker counts from 1 up to one worker per 2 cores and returns [(workers, threads, tokens/sec)], best first."""
+    n_cores = len(available_cores())
+    max_workers = max_workers or max(1, n_cores // 2)
+    candidates, n = [], 1
+    while n <= max_workers:
+        candidates.append(n)
+        n *= 2
+    results = []
+    for n_workers in candidates:
+        throughput = measure_split(n_workers, n_tokens)
+        threads = n_cores // n_workers
+        logging.info(f"{n_workers} workers x {threads} threads: {throughput:.1f} tokens/s")
+        results.append((n_workers, threads, throughput))
+    return sorted(results, key=lambda r: r[2], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU worker partitioning for Chatterbox Pro.")
+    parser.add_argument("--calibrate", action="store_true", help="Benchmark worker x thread splits and save the best one.")
+    parser.add_argument("--max_workers", type=int, default=None)
+    parser.add_argument("--tokens", type=int, default=200, help="Decode steps per worker in each benchmark.")
+    parser.add_argument("--workers", type=int, default=None, help="Show the core plan for this many workers.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    print(f"{len(available_cores())} cores in {len(numa_nodes())} NUMA node(s)")
+    if args.workers:
+        for i, a in enumerate(plan_cpu_workers(args.workers)):
+            print(f"  worker {i}: {a.intra_op_threads} threads on cores {a.cores}")
+    if args.calibrate:
+        results = calibrate(args.max_workers, args.tokens)
+        for n_workers, threads, throughput in results:
+            print(f"  {n_workers:3d} workers x {threads:3d} threads: {throughput:8.1f} tokens/s")
+        best_workers = results[0][0]
+        CPU_PLAN_PATH.parent.mkdir(parents=True, exist_ok=True)
+        CPU_PLAN_PATH.write_text(json.dumps({"workers": best_workers, "inter_op_threads": 1, "results": results}, indent=2))
+        print(f"Best: {best_workers} CPU workers. Saved to {CPU_PLAN_PATH}; the app uses it as the default CPU worker count.")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,15 @@ import logging
 import random
 from pathlib import Path
 import shutil
-from concurrent.futures import ProcessPoolExecutor, as_completed
-import multiprocessing
+from collections import Counter
+from concurrent.futures.process import BrokenProcessPool
 from tkinter import messagebox
 
-from workers.tts_worker import worker_process_chunk
+from core.cost_model import ChunkCostModel, lpt_assign
+from workers.tts_worker import ChunkRace, worker_process_chunk
+from workers.asr_scoring import DEFAULT_ASR_THRESHOLD
+from workers.retry_policy import DEFAULT_RETRY_LADDER
+from workers.screening import DEFAULT_SCREENING
 from utils.text_processor import punc_norm
 
 class GenerationOrchestrator:
@@ -18,6 +22,7 @@ class GenerationOrchestrator:
     def run(self, indices_to_process=None):
         app = self.app
         num_runs = app.get_validated_int(app.num_full_outputs_str, 1) if not indices_to_process else 1
+        cost_model = ChunkCostModel.load()
 
         for run_idx in range(num_runs):
             run_temp_dir = Path(app.OUTPUTS_DIR) / app.session_name.get() / f"run_{run_idx+1}_temp"
@@ -44,21 +49,29 @@ class GenerationOrchestrator:
                     if not indices_to_process: continue
                     else: break
 
-                devices = [s.strip() for s in app.target_gpus_str.get().split(',') if s.strip()] or ["cpu"]
+                devices = app.get_target_devices()
+                screening = dict(DEFAULT_SCREENING, min_speaker_similarity=app.get_validated_float(app.screen_min_voice_sim_str, 0.6)) if app.screening_enabled.get() else None
+                retry_ladder = DEFAULT_RETRY_LADDER if app.adaptive_retries_enabled.get() else None
                 
+                texts = {i: punc_norm(app.sentences[i]['original_sentence']) for i in process_list}
+                costs = {i: {device: cost_model.predict(texts[i], device) for device in set(devices)} for i in process_list}
                 generation_order = app.generation_order.get()
                 if generation_order == "Fastest First":
-                    chunks_to_process_sorted = sorted(process_list, key=lambda i: len(app.sentences[i]['original_sentence']), reverse=True)
+                    # Longest predicted chunks first, each onto the worker that would finish it soonest.
+                    assignment, makespan = lpt_assign(costs, devices)
+                    logging.info(f"Predicted run time {makespan / 60:.1f} min on {len(devices)} worker(s) ({cost_model.describe()})")
                 else: # "In Order"
-                    chunks_to_process_sorted = sorted(process_list, key=lambda i: int(app.sentences[i]['sentence_number']))
+                    in_order = sorted(process_list, key=lambda i: int(app.sentences[i]['sentence_number']))
+                    assignment = [(original_idx, devices[i % len(devices)]) for i, original_idx in enumerate(in_order)]
+                predicted = {original_idx: costs[original_idx][device] for original_idx, device in assignment}
                 
                 tasks = []
-                for i, original_idx in enumerate(chunks_to_process_sorted):
+                for i, (original_idx, device) in enumerate(assignment):
                     sentence_data = app.sentences[original_idx]
                     task = (
                         i, original_idx, int(sentence_data['sentence_number']),
-                        punc_norm(sentence_data['original_sentence']),
-                        devices[i % len(devices)], 
+                        texts[original_idx],
+                        device, 
                         current_run_master_seed, # ACX FIX: Pass the run's master seed to all chunks
                         app.ref_audio_path.get(), app.exaggeration.get(), app.temperature.get(),
                         app.cfg_weight.get(), app.disable_watermark.get(),
@@ -66,49 +79,93 @@ class GenerationOrchestrator:
                         app.get_validated_int(app.max_attempts_str, 1),
                         not app.asr_validation_enabled.get(), app.session_name.get(),
                         run_idx, app.OUTPUTS_DIR, sentence_data['uuid'],
-                        app.get_validated_float(app.asr_threshold_str, 0.85)
+                        app.get_validated_float(app.asr_threshold_str, DEFAULT_ASR_THRESHOLD),
+                        screening, retry_ladder,
+                        0  # racer: the original copy (see ChunkRace)
                     )
                     tasks.append(task)
 
-                app.after(0, app.update_progress_display, 0, 0, len(tasks))
-                completed_count = 0
+                remaining = dict(predicted)
+                predicted_done, actual_done = 0.0, 0.0
+
+                def eta():
+                    # Remaining predicted work spread over the workers, scaled by how this run compares with its predictions.
+                    if not remaining:
+                        return 0.0
+                    scale = min(max(actual_done / predicted_done, 0.25), 4.0) if predicted_done else 1.0
+                    return scale * max(sum(remaining.values()) / len(devices), max(remaining.values()))
 
-                ctx = multiprocessing.get_context('spawn')
-                with ProcessPoolExecutor(max_workers=len(devices), mp_context=ctx) as executor:
-                    futures = {executor.submit(worker_process_chunk, task): task[1] for task in tasks}
-                    for future in as_completed(futures):
-                        if app.stop_flag.is_set():
-                            for f in futures.keys(): f.cancel()
-                            break
-                        try:
-                            result = future.result()
-                            if result and 'original_index' in result:
-                                original_idx = result['original_index']
-                                
-                                app.sentences[original_idx].pop('similarity_ratio', None)
-                                app.sentences[original_idx].pop('generation_seed', None)
-
-                                status = result.get('status')
-                                app.sentences[original_idx]['generation_seed'] = result.get('seed')
-                                app.sentences[original_idx]['similarity_ratio'] = result.get('similarity_ratio')
-
-                                if status == 'success':
-                                    app.sentences[original_idx]['tts_generated'] = 'yes'
-                                    app.sentences[original_idx]['marked'] = False
-                                else:
-                                    app.sentences[original_idx]['tts_generated'] = 'failed'
-                                    app.sentences[original_idx]['marked'] = True
-                                    if status == 'failed_placeholder':
-                                        logging.warning(f"Chunk {app.sentences[original_idx]['sentence_number']} failed validation. A placeholder audio was saved. Marked for regeneration.")
-                                    else: 
-                                        logging.error(f"Chunk {app.sentences[original_idx]['sentence_number']} had a hard error during generation and was marked.")
-                                        
-                                app.after(0, app.playlist_frame.update_item, original_idx)
-                        except Exception as e:
-                            logging.error(f"A worker process for index {futures[future]} failed: {e}", exc_info=True)
-                        finally:
-                            completed_count += 1
-                            app.after(0, app.update_progress_display, completed_count / len(tasks), completed_count, len(tasks))
+                app.after(0, app.update_progress_display, 0, 0, len(tasks), eta())
+                completed_count = 0
+                stage_totals = Counter()
+                escalations = Counter()
+
+                # Workers persist across runs and are pinned to a device (see core/worker_pool.py). Each task
+                # is queued on the device it was stamped with; idle devices steal from busy ones. Chunks
+                # already running when the user stops are left to finish and their results are ignored. Once the
+                # queue is empty, idle workers race extra seeds for the chunks still in flight.
+                if not app.worker_pool.is_warm():
+                    logging.info(app.worker_pool.status_text() + " - tasks will start once models are loaded.")
+                for future, task in app.worker_pool.run(worker_process_chunk, [(task[4], task) for task in tasks], devices, stop_flag=app.stop_flag, asr_devices=app.get_asr_devices(), asr_backend=app.get_asr_backend(), race=ChunkRace()):
+                    if app.stop_flag.is_set():
+                        break
+                    try:
+                        result = future.result()
+                        if result and 'original_index' in result:
+                            original_idx = result['original_index']
+                            stage_totals.update(result.get('stage_timings', {}))
+                            wall_s = result.get('stage_timings', {}).get('wall')
+                            if wall_s and original_idx in remaining:
+                                predicted_done += remaining[original_idx]
+                                actual_done += wall_s
+                            if result.get('status') in ('success', 'failed_placeholder'):
+                                cost_model.record(result.get('device') or task[4], task[3], result.get('attempts'), wall_s)
+                            
+                            app.sentences[original_idx].pop('similarity_ratio', None)
+                            app.sentences[original_idx].pop('generation_seed', None)
+                            app.sentences[original_idx].pop('escalation', None)
+
+                            status = result.get('status')
+                            if result.get('racer'):
+                                logging.info(f"Chunk {app.sentences[original_idx]['sentence_number']} was won by racing copy {result['racer']} (seed {result.get('seed')}).")
+                            app.sentences[original_idx]['generation_seed'] = result.get('seed')
+                            app.sentences[original_idx]['similarity_ratio'] = result.get('similarity_ratio')
+
+                            if status == 'success':
+                                if result.get('escalation'):
+                                    app.sentences[original_idx]['escalation'] = result['escalation']
+                                    escalations[result['escalation']] += 1
+                                app.sentences[original_idx]['tts_generated'] = 'yes'
+                                app.sentences[original_idx]['marked'] = False
+                            else:
+                                app.sentences[original_idx]['tts_generated'] = 'failed'
+                                app.sentences[original_idx]['marked'] = True
+                                if status == 'failed_placeholder':
+                                    logging.warning(f"Chunk {app.sentences[original_idx]['sentence_number']} failed validation. A placeholder audio was saved. Marked for regeneration.")
+                                else: 
+                                    logging.error(f"Chunk {app.sentences[original_idx]['sentence_number']} had a hard error during generation and was marked.")
+                                    
+                            app.after(0, app.playlist_frame.update_item, original_idx)
+                    except BrokenProcessPool as e:
+                        logging.error(f"A worker process died while handling index {task[1]}: {e}")
+                        app.worker_pool.mark_broken()
+                    except Exception as e:
+                        logging.error(f"A worker process for index {task[1]} failed: {e}", exc_info=True)
+                    finally:
+                        completed_count += 1
+                        remaining.pop(task[1], None)
+                        app.after(0, app.update_progress_display, completed_count / len(tasks), completed_count, len(tasks), eta())
+
+                if stage_totals:
+                    # Worker stages overlap, so throughput is bounded by the busiest stage rather than the wall total.
+                    busiest = max((k for k in stage_totals if k != 'wall'), key=stage_totals.get, default=None)
+                    logging.info(f"Run {run_idx+1} stage time across workers: " + ", ".join(f"{k}={v:.1f}s" for k, v in stage_totals.items()) + (f" (busiest: {busiest})" if busiest else ""))
+
+                cost_model.fit().save()
+                logging.info(f"Chunk cost model refit: {cost_model.describe()}")
+
+                if retry_ladder and escalations:
+                    logging.info(f"Run {run_idx+1} chunks passed per retry rung: " + ", ".join(f"{r['name']}={escalations[r['name']]}" for r in retry_ladder))
 
                 if not app.stop_flag.is_set() and not indices_to_process and app.auto_assemble_after_run.get():
                     logging.info(f"Auto-assembly triggered for run {run_idx+1}.")
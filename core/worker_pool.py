@@ -0,0 +1,312 @@
+# core/worker_pool.py
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+from core.cpu_partition import plan_cpu_workers
+from workers.asr_service import ASRService
+from workers.tts_worker import init_worker, worker_ping
+
+
+class WorkerPool:
+    """
+    Long-lived TTS worker processes owned by the app.
+
+    There is one executor per device, and its workers are bound to that device by the
+    pool initializer, which also loads their models; listing a device twice
+    ("cuda:0,cuda:0") gives it two workers. Workers survive between runs and
+    regenerations and report 'loading' / 'ready' / 'error' on a status queue, which
+    `health()` summarizes. The pool is rebuilt when the device list changes or a
+    worker process dies.
+
+    `run()` keeps a queue of pending tasks per device and only hands a device as many
+    tasks as it has workers; a device whose queue runs dry steals from the back of the
+    longest other queue.
+
+    CPU workers each get a disjoint, NUMA-aware set of cores and a matching torch
+    thread count (see core.cpu_partition), so "cpu,cpu,cpu,cpu" runs four workers
+    side by side instead of four oversubscribed ones.
+
+    Whisper validation runs in a separate ASRService owned by the pool, with its own
+    device list (`asr_devices`), so ASR capacity is sized independently of the TTS
+    workers and no TTS worker holds a Whisper copy. `asr_backend` is a (backend name,
+    model size, precision) triple from workers/asr_backends.py.
+
+    Tail racing: once every queue is empty, `run()` can hand idle workers extra copies
+    of the tasks still in flight (see `run`). Losing copies are told to stop through a
+    shared race board, a manager dict the workers receive at spawn.
+    """
+    MAX_RACERS = 2
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executors = {}
+        self._capacity = {}
+        self._devices = ()
+        self._asr_devices = ("cpu",)
+        self._asr_backend = ("whisper", "base.en", "auto")
+        self._asr_service = None
+        self._manager = None
+        self._race_board = None
+        self._status_queue = None
+        self._workers = {}
+        self._broken = False
+        self._started_at = None
+
+    def start(self, devices, asr_devices=None, asr_backend=None):
+        """
+        Starts (or keeps) one executor per device, with one worker per occurrence in `devices`,
+        plus the ASR service on `asr_devices` running `asr_backend` (default: what it already uses).
+        """
+        devices = tuple(devices) or ("cpu",)
+        asr_devices = tuple(asr_devices or self._asr_devices) or ("cpu",)
+        asr_backend = tuple(asr_backend or self._asr_backend)
+        with self._lock:
+            if (self._executors and not self._broken and devices == self._devices and asr_devices == self._asr_devices
+                    and asr_backend == self._asr_backend and self._asr_service.is_alive()):
+                return self._executors
+            self._shutdown_locked()
+
+            ctx = multiprocessing.get_context('spawn')
+            self._status_queue = ctx.Queue()
+            self._manager = ctx.Manager()
+            self._race_board = self._manager.dict()
+            self._asr_service = ASRService(asr_devices, backend=asr_backend[0], model_name=asr_backend[1], precision=asr_backend[2])
+            self._asr_service.start(len(devices), ctx=ctx, status_queue=self._status_queue)
+            self._asr_devices, self._asr_backend = asr_devices, asr_backend
+            self._capacity = dict(Counter(devices))
+            for device, n_workers in self._capacity.items():
+                device_queue = ctx.Queue()
+                if device == "cpu":
+                    for assignment in plan_cpu_workers(n_workers):
+                        device_queue.put((device, assignment))
+                else:
+                    for _ in range(n_workers):
+                        device_queue.put(device)
+                self._executors[device] = ProcessPoolExecutor(max_workers=n_workers, mp_context=ctx, initializer=init_worker, initargs=(device_queue, self._status_queue, self._asr_service.client_args(), self._race_board))
+                # Workers are spawned on demand; one ping per worker brings them all up now.
+                for _ in range(n_workers):
+                    self._executors[device].submit(worker_ping)
+            self._devices, self._workers, self._broken = devices, {}, False
+            self._started_at = time.time()
+            logging.info(f"Starting persistent worker pool: {', '.join(f'{d} x{n}' for d, n in self._capacity.items())}")
+            return self._executors
+
+    def submit(self, fn, *args, device=None, devices=None, asr_devices=None, asr_backend=None):
+        """Submits a task to `device`'s workers (default: the first device), (re)starting the pool if needed."""
+        executors = self.start(devices or self._devices, asr_devices, asr_backend)
+        device = device if device in executors else next(iter(executors))
+        try:
+            return executors[device].submit(fn, *args)
+        except BrokenProcessPool:
+            self.mark_broken()
+            executors = self.start(devices or self._devices, asr_devices, asr_backend)
+            return executors[device].submit(fn, *args)
+
+    def run(self, fn, tasks, devices, stop_flag=None, asr_devices=None, asr_backend=None, race=None):
+        """
+        Runs `fn(args)` for each (preferred_device, args) in `tasks` on device-pinned workers.
+        Yields (future, args) as tasks finish. Tasks still queued when `stop_flag` is set
+        (or the caller stops iterating) are never submitted.
+
+        With `race` (e.g. workers.tts_worker.ChunkRace), a worker with nothing left to
+        take starts `race.variant(args, n)`, the nth extra copy of the in-flight task with
+        the fewest copies (oldest first), up to MAX_RACERS each. A task is yielded once,
+        with the future of its first copy whose result `race.settles()`, or of the best one
+        by `race.score()` when none does. The other copies are then cancelled on the race
+        board, and `race.resolve()` runs once all of them have stopped.
+        """
+        executors = self.start(devices, asr_devices, asr_backend)
+        queues = {device: deque() for device in executors}
+        for device, args in tasks:
+            queues[device if device in queues else next(iter(queues))].append(args)
+        in_flight, dead = {}, set()
+        races = {}
+
+        def next_race():
+            if race is None or (stop_flag is not None and stop_flag.is_set()):
+                return None
+            open_races = [key for key, group in races.items() if group["winner"] is None and group["racers"] < self.MAX_RACERS]
+            if not open_races:
+                return None
+            key = min(open_races, key=lambda k: (races[k]["racers"], races[k]["started"]))
+            group = races[key]
+            variant = race.variant(group["args"], group["racers"] + 1)
+            if variant is None:
+                group["racers"] = self.MAX_RACERS  # not worth racing
+                return next_race()
+            group["racers"] += 1
+            return key, variant
+
+        def fill(device):
+            while device not in dead and sum(1 for d, _, _ in in_flight.values() if d == device) < self._capacity[device]:
+                key = None
+                if queues[device]:
+                    args = queues[device].popleft()
+                else:
+                    victim = max(queues, key=lambda d: len(queues[d]))  # includes dead devices' leftovers
+                    if queues[victim]:
+                        args = queues[victim].pop()
+                        logging.debug(f"{device} stole a task from {victim}")
+                    else:
+                        picked = next_race()
+                        if picked is None:
+                            return
+                        key, args = picked
+                        logging.info(f"{device} is idle; racing copy {races[key]['racers']} of {key}")
+                try:
+                    future = executors[device].submit(fn, args)
+                except BrokenProcessPool:
+                    # Leave the task for a healthy device; the pool is rebuilt on the next run.
+                    logging.error(f"Workers on {device} died; no more tasks will be sent to them this run.")
+                    if key is None:
+                        queues[device].appendleft(args)
+                    self.mark_broken()
+                    dead.add(device)
+                    return
+                if race is not None:
+                    if key is None:
+                        key = race.key(args)
+                        races[key] = {"args": args, "futures": set(), "racers": 0, "results": [], "winner": None, "started": time.monotonic()}
+                    races[key]["futures"].add(future)
+                in_flight[future] = (device, args, key)
+
+        def result_of(future):
+            if future is None or future.cancelled() or future.exception() is not None:
+                return None
+            return future.result()
+
+        def finish(key):
+            """Cancels what is left of a decided race and resolves it once every copy has stopped."""
+            group = races.pop(key)
+            self._post_race(key, True)
+            winner_future = group["winner"]
+            resolve_lock = threading.Lock()
+
+            def resolve(_=None):
+                with resolve_lock:
+                    if group.get("resolved") or any(not f.done() for f in group["futures"]):
+                        return
+                    group["resolved"] = True
+                losers = [result_of(f) for f in group["futures"] if f is not winner_future]
+                try:
+                    race.resolve(group["args"], result_of(winner_future), losers)
+                except Exception as e:
+                    logging.error(f"Failed to tidy up the race for {key}: {e}")
+                self._post_race(key, None)
+
+            pending = [f for f in group["futures"] if not f.done()]
+            for f in pending:
+                f.add_done_callback(resolve)
+            if not pending:
+                resolve()
+
+        try:
+            for device in executors:
+                fill(device)
+            # Copies of already decided tasks don't hold the run open; they stop on their own.
+            while in_flight and (race is None or any(queues.values()) or any(key in races for _, _, key in in_flight.values())):
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    device, args, key = in_flight.pop(future)
+                    if race is None:
+                        yield future, args
+                    elif key in races:
+                        group = races[key]
+                        group["results"].append(future)
+                        settled = race.settles(result_of(future))
+                        if settled or not any(f in in_flight for f in group["futures"]):
+                            group["winner"] = future if settled else max(group["results"], key=lambda f: race.score(result_of(f)))
+                            try:
+                                race.claim(group["args"], result_of(group["winner"]))
+                            except Exception as e:
+                                logging.error(f"Failed to place the winning copy of {key}: {e}")
+                            finish(key)
+                            yield group["winner"], group["args"]
+                    if stop_flag is None or not stop_flag.is_set():
+                        fill(device)
+        finally:
+            # Stopped early: nothing is yielded for undecided tasks, so every copy is cancelled.
+            for key in list(races):
+                finish(key)
+
+    def _post_race(self, key, cancelled):
+        """Flags `key` on the race board (True = copies should stop), or clears it with None."""
+        try:
+            if cancelled is None:
+                self._race_board.pop(key, None)
+            else:
+                self._race_board[key] = cancelled
+        except Exception:
+            pass  # the board went away with the pool; nothing is left to cancel
+
+    def mark_broken(self):
+        """Called when a worker process died; the next `start`/`submit` rebuilds the pool."""
+        with self._lock:
+            self._broken = True
+
+    def _drain_status(self):
+        if self._status_queue is None:
+            return
+        while True:
+            try:
+                pid, device, state, error = self._status_queue.get_nowait()
+            except (queue.Empty, OSError, ValueError):
+                return
+            self._workers[pid] = {"device": device, "state": state, "error": error, "since": time.time()}
+
+    def health(self):
+        """Snapshot of the pool: running/broken, devices, and per-worker load state."""
+        with self._lock:
+            self._drain_status()
+            workers = {pid: w for pid, w in self._workers.items() if not w["device"].startswith("asr:")}
+            asr_workers = {pid: w for pid, w in self._workers.items() if w["device"].startswith("asr:")}
+            return {
+                "running": bool(self._executors) and not self._broken,
+                "broken": self._broken,
+                "devices": list(self._devices),
+                "workers": workers,
+                "warm": sum(1 for w in workers.values() if w["state"] == "ready"),
+                "asr_devices": list(self._asr_devices),
+                "asr_workers": asr_workers,
+                "asr_warm": sum(1 for w in asr_workers.values() if w["state"] == "ready"),
+                "errors": [w["error"] for w in self._workers.values() if w["state"] == "error"],
+                "uptime_s": time.time() - self._started_at if self._started_at else 0.0,
+            }
+
+    def is_warm(self):
+        health = self.health()
+        return health["running"] and health["warm"] >= len(health["devices"]) and health["asr_warm"] >= len(health["asr_devices"])
+
+    def status_text(self):
+        health = self.health()
+        if health["broken"]:
+            return "Workers: restart pending"
+        if not health["running"]:
+            return "Workers: not started"
+        if health["errors"]:
+            return f"Workers: {len(health['errors'])} failed to load"
+        return (f"Workers: {health['warm']}/{len(health['devices'])} warm ({', '.join(health['devices'])}), "
+                f"ASR {':'.join(self._asr_backend)}: {health['asr_warm']}/{len(health['asr_devices'])} ({', '.join(health['asr_devices'])})")
+
+    def _shutdown_locked(self):
+        if self._executors:
+            logging.info("Shutting down worker pool.")
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        if self._asr_service is not None:
+            self._asr_service.shutdown()
+            self._asr_service = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager, self._race_board = None, None
+        self._executors, self._capacity, self._status_queue, self._workers = {}, {}, None, {}
+
+    def shutdown(self):
+        with self._lock:
+            self._shutdown_locked()
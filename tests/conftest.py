@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The app runs from the repository root (chatter_pro.py); tests import its packages the same way.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
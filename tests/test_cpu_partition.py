@@ -0,0 +1,38 @@
+import pytest
+
+from core.cpu_partition import partition_cores
+
+
+def _check(core_sets, nodes, n_workers):
+    assert len(core_sets) == n_workers
+    flat = [c for cores in core_sets for c in cores]
+    assert sorted(flat) == sorted(c for node in nodes for c in node)  # disjoint and nothing left over
+
+
+def test_remainder_cores_are_spread_within_each_node():
+    nodes = [list(range(8)), list(range(8, 16))]
+    core_sets = partition_cores(3, nodes)
+    _check(core_sets, nodes, 3)
+    for cores in core_sets:
+        assert any(set(cores) <= set(node) for node in nodes)
+
+
+@pytest.mark.parametrize("n_workers", [3, 5, 7])
+def test_uneven_single_node_split_differs_by_at_most_one(n_workers):
+    nodes = [list(range(16))]
+    core_sets = partition_cores(n_workers, nodes)
+    _check(core_sets, nodes, n_workers)
+    sizes = [len(cores) for cores in core_sets]
+    assert max(sizes) - min(sizes) <= 1
+
+
+def test_fewer_workers_than_nodes_uses_every_core():
+    nodes = [list(range(4)), list(range(4, 10)), list(range(10, 13))]
+    core_sets = partition_cores(2, nodes)
+    _check(core_sets, nodes, 2)
+    assert [len(cores) for cores in core_sets] == [7, 6]
+
+
+def test_more_workers_than_cores_gives_one_core_each():
+    nodes = [[0, 1], [2, 3]]
+    assert partition_cores(9, nodes) == [[0], [1], [2], [3]]
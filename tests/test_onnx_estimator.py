@@ -0,0 +1,65 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+
+from chatterbox.models.s3gen.decoder import ConditionalDecoder
+from chatterbox.models.s3gen.onnx_estimator import (
+    OnnxEstimator,
+    check_estimator_parity,
+    estimator_fingerprint,
+    export_estimator_onnx,
+    load_onnx_estimator,
+)
+
+ATOL = 1e-3
+
+
+def _small_estimator(seed=0):
+    """Same architecture as S3Gen's estimator, scaled down so export and parity run in seconds."""
+    torch.manual_seed(seed)
+    return ConditionalDecoder(
+        in_channels=320,
+        out_channels=80,
+        causal=True,
+        channels=[64],
+        dropout=0.0,
+        attention_head_dim=32,
+        n_blocks=1,
+        num_mid_blocks=2,
+        num_heads=2,
+        act_fn='gelu',
+    ).eval()
+
+
+def test_onnx_matches_torch_across_lengths(tmp_path):
+    estimator = _small_estimator()
+    onnx_path = export_estimator_onnx(estimator, tmp_path / "estimator.onnx", n_frames=64)
+    diffs = check_estimator_parity(estimator, OnnxEstimator(onnx_path), lengths=(17, 50, 173), atol=ATOL)
+    assert max(diffs.values()) <= ATOL
+
+
+def test_cache_is_keyed_on_weights(tmp_path, monkeypatch):
+    monkeypatch.setattr("chatterbox.models.s3gen.onnx_estimator.ONNX_CACHE_DIR", tmp_path)
+    first, second = _small_estimator(seed=0), _small_estimator(seed=1)
+    assert estimator_fingerprint(first) != estimator_fingerprint(second)
+
+    onnx_first = load_onnx_estimator(first)
+    onnx_second = load_onnx_estimator(second)
+    assert onnx_first.onnx_path != onnx_second.onnx_path
+    check_estimator_parity(second, onnx_second, lengths=(50,), atol=ATOL)
+
+
+def test_explicit_path_is_reexported_when_weights_change(tmp_path):
+    onnx_path = tmp_path / "estimator.onnx"
+    load_onnx_estimator(_small_estimator(seed=0), onnx_path)
+    changed = _small_estimator(seed=1)
+    reloaded = load_onnx_estimator(changed, onnx_path)
+    check_estimator_parity(changed, reloaded, lengths=(50,), atol=ATOL)
+
+
+def test_export_leaves_no_partial_files(tmp_path):
+    onnx_path = tmp_path / "estimator.onnx"
+    load_onnx_estimator(_small_estimator(), onnx_path)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["estimator.onnx", "estimator.onnx.sha256"]
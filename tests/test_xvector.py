@@ -0,0 +1,20 @@
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("torchaudio")
+
+from chatterbox.models.s3gen.xvector import CAMPPlus
+
+ATOL = 1e-4
+
+
+def test_batched_xvectors_match_one_at_a_time():
+    torch.manual_seed(0)
+    model = CAMPPlus(memory_efficient=False).eval()
+    # lengths that don't share a frame-shift boundary, so padding and masks both matter
+    audio = [torch.randn(n) * 0.1 for n in (16000, 23457, 41003)]
+    with torch.inference_mode():
+        batched = model.inference_batch(audio)
+        single = torch.cat([model.inference([au]) for au in audio])
+    assert batched.shape == single.shape
+    assert torch.allclose(batched, single, atol=ATOL)
@@ -23,7 +23,10 @@ from ui.tabs.finalize_tab import FinalizeTab
 from ui.tabs.advanced_tab import AdvancedTab
 
 from core.orchestrator import GenerationOrchestrator
+from core.worker_pool import WorkerPool
+from core.cpu_partition import default_cpu_workers
 from core.audio_manager import AudioManager
+from workers.asr_scoring import DEFAULT_ASR_THRESHOLD
 from utils.text_processor import TextPreprocessor
 
 try: from bs4 import BeautifulSoup
@@ -61,6 +64,7 @@ class ChatterboxProGUI(ctk.CTk):
             logging.warning("assets/icon.ico not found.")
 
         self.orchestrator = GenerationOrchestrator(self)
+        self.worker_pool = WorkerPool()
         self.audio_manager = AudioManager(self)
         self.text_processor = TextPreprocessor()
         self.OUTPUTS_DIR = "Outputs_Pro"
@@ -81,12 +85,20 @@ class ChatterboxProGUI(ctk.CTk):
         self.speed = ctk.DoubleVar(value=1.0)
         self.items_per_page_str = ctk.StringVar(value="15")
         self.target_gpus_str = ctk.StringVar(value=",".join([f"cuda:{i}" for i in range(torch.cuda.device_count())]) if torch.cuda.is_available() else "cpu")
+        self.cpu_workers_str = ctk.StringVar(value=str(default_cpu_workers()))
+        self.asr_devices_str = ctk.StringVar(value="cuda:0" if torch.cuda.is_available() else "cpu")
+        self.asr_backend_str = ctk.StringVar(value="whisper")
+        self.asr_model_str = ctk.StringVar(value="base.en")
+        self.asr_precision_str = ctk.StringVar(value="auto")
         self.num_full_outputs_str = ctk.StringVar(value="1")
         self.master_seed_str = ctk.StringVar(value="0")
         self.num_candidates_str = ctk.StringVar(value="1")
         self.max_attempts_str = ctk.StringVar(value="3")
         self.asr_validation_enabled = ctk.BooleanVar(value=True)
-        self.asr_threshold_str = ctk.StringVar(value="0.85")
+        self.asr_threshold_str = ctk.StringVar(value=f"{DEFAULT_ASR_THRESHOLD:.2f}")
+        self.screening_enabled = ctk.BooleanVar(value=True)
+        self.screen_min_voice_sim_str = ctk.StringVar(value="0.6")
+        self.adaptive_retries_enabled = ctk.BooleanVar(value=True)
         self.disable_watermark = ctk.BooleanVar(value=True)
         self.generation_order = ctk.StringVar(value="Fastest First")
         self.chunking_enabled = ctk.BooleanVar(value=True)
@@ -113,6 +125,42 @@ class ChatterboxProGUI(ctk.CTk):
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
         self.after(100, self.show_dependency_warnings)
         self.populate_template_dropdown()
+        self.after(500, self.warm_up_worker_pool)
+        self.after(2000, self.refresh_worker_status)
+
+    def get_target_devices(self):
+        """Target devices with "cpu" expanded to one entry per CPU worker (each gets its own cores)."""
+        devices = [s.strip() for s in self.target_gpus_str.get().split(',') if s.strip()] or ["cpu"]
+        n_cpu_workers = max(1, self.get_validated_int(self.cpu_workers_str, 1))
+        expanded = []
+        for device in devices:
+            if device == "cpu":
+                if "cpu" not in expanded:
+                    expanded.extend(["cpu"] * n_cpu_workers)
+            else:
+                expanded.append(device)
+        return expanded
+
+    def get_asr_devices(self):
+        """Devices for the shared ASR service; one Whisper process per entry."""
+        return [s.strip() for s in self.asr_devices_str.get().split(',') if s.strip()] or ["cpu"]
+
+    def get_asr_backend(self):
+        """(backend, model size, precision) for the ASR service."""
+        return self.asr_backend_str.get() or "whisper", self.asr_model_str.get() or "base.en", self.asr_precision_str.get() or "auto"
+
+    def warm_up_worker_pool(self):
+        """Spawns the persistent TTS workers so their models load before the first generation."""
+        devices = self.get_target_devices()
+        try:
+            self.worker_pool.start(devices, self.get_asr_devices(), self.get_asr_backend())
+        except Exception as e:
+            logging.error(f"Failed to start worker pool: {e}", exc_info=True)
+
+    def refresh_worker_status(self):
+        if hasattr(self, 'worker_status_label'):
+            self.worker_status_label.configure(text=self.worker_pool.status_text())
+        self.after(2000, self.refresh_worker_status)
 
     def show_dependency_warnings(self):
         warnings = []
@@ -165,6 +213,7 @@ class ChatterboxProGUI(ctk.CTk):
             self.after(200, self._check_shutdown)
         else:
             logging.info("Background processes finished. Exiting application.")
+            self.worker_pool.shutdown()
             self.destroy()
 
     def reinit_audio_player(self):
@@ -364,9 +413,14 @@ class ChatterboxProGUI(ctk.CTk):
             
         ctk.CTkButton(editor, text="Confirm and Process Sentences", command=on_confirm).pack(pady=10)
 
-    def update_progress_display(self, progress, completed, total):
+    def update_progress_display(self, progress, completed, total, eta_s=None):
         self.progress_bar.set(progress)
-        self.progress_label.configure(text=f"{completed}/{total} ({progress:.2%})")
+        text = f"{completed}/{total} ({progress:.2%})"
+        if eta_s is not None and completed < total:
+            minutes, seconds = divmod(int(eta_s), 60)
+            hours, minutes = divmod(minutes, 60)
+            text += f" - ETA {hours}h {minutes:02d}m" if hours else f" - ETA {minutes}m {seconds:02d}s"
+        self.progress_label.configure(text=text)
 
     def play_selected_sentence(self, index=None):
         indices = [index] if index is not None else self.playlist_frame.get_selected_indices()
@@ -768,10 +822,12 @@ class ChatterboxProGUI(ctk.CTk):
             "ref_audio_path": self.ref_audio_path.get(), "exaggeration": self.exaggeration.get(),
             "cfg_weight": self.cfg_weight.get(), "temperature": self.temperature.get(),
             "speed": self.speed.get(), "items_per_page_str": self.items_per_page_str.get(),
-            "target_gpus_str": self.target_gpus_str.get(), "num_full_outputs_str": self.num_full_outputs_str.get(),
+            "target_gpus_str": self.target_gpus_str.get(), "cpu_workers_str": self.cpu_workers_str.get(), "asr_devices_str": self.asr_devices_str.get(), "asr_backend_str": self.asr_backend_str.get(), "asr_model_str": self.asr_model_str.get(), "asr_precision_str": self.asr_precision_str.get(), "num_full_outputs_str": self.num_full_outputs_str.get(),
             "master_seed_str": self.master_seed_str.get(), "num_candidates_str": self.num_candidates_str.get(),
             "max_attempts_str": self.max_attempts_str.get(), "asr_validation_enabled": self.asr_validation_enabled.get(),
             "asr_threshold_str": self.asr_threshold_str.get(),
+            "screening_enabled": self.screening_enabled.get(), "screen_min_voice_sim_str": self.screen_min_voice_sim_str.get(),
+            "adaptive_retries_enabled": self.adaptive_retries_enabled.get(),
             "disable_watermark": self.disable_watermark.get(), "generation_order": self.generation_order.get(),
             "chunking_enabled": self.chunking_enabled.get(), "max_chunk_chars_str": self.max_chunk_chars_str.get(),
             "silence_duration_str": self.silence_duration_str.get(), "norm_enabled": self.norm_enabled.get(),
@@ -790,10 +846,12 @@ class ChatterboxProGUI(ctk.CTk):
             'ref_audio_path': self.ref_audio_path, 'exaggeration': self.exaggeration,
             'cfg_weight': self.cfg_weight, 'temperature': self.temperature, 'speed': self.speed,
             'items_per_page_str': self.items_per_page_str,
-            'target_gpus_str': self.target_gpus_str, 'num_full_outputs_str': self.num_full_outputs_str,
+            'target_gpus_str': self.target_gpus_str, 'cpu_workers_str': self.cpu_workers_str, 'asr_devices_str': self.asr_devices_str, 'asr_backend_str': self.asr_backend_str, 'asr_model_str': self.asr_model_str, 'asr_precision_str': self.asr_precision_str, 'num_full_outputs_str': self.num_full_outputs_str,
             'master_seed_str': self.master_seed_str, 'num_candidates_str': self.num_candidates_str,
             'max_attempts_str': self.max_attempts_str, 'asr_validation_enabled': self.asr_validation_enabled,
             'asr_threshold_str': self.asr_threshold_str,
+            'screening_enabled': self.screening_enabled, 'screen_min_voice_sim_str': self.screen_min_voice_sim_str,
+            'adaptive_retries_enabled': self.adaptive_retries_enabled,
             'disable_watermark': self.disable_watermark, 'generation_order': self.generation_order,
             'chunking_enabled': self.chunking_enabled, 'max_chunk_chars_str': self.max_chunk_chars_str,
             'silence_duration_str': self.silence_duration_str, 'norm_enabled': self.norm_enabled,
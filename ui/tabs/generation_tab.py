@@ -3,6 +3,9 @@ import customtkinter as ctk
 from tkinter import filedialog
 from CTkToolTip import CTkToolTip
 
+from workers.asr_backends import ASR_PRECISIONS, USER_ASR_BACKENDS, WHISPER_MODEL_SIZES
+from workers.asr_scoring import DEFAULT_ASR_THRESHOLD
+
 class GenerationTab(ctk.CTkFrame):
     def __init__(self, master, app_instance):
         super().__init__(master, fg_color="transparent")
@@ -42,7 +45,7 @@ class GenerationTab(ctk.CTkFrame):
         ctk.CTkLabel(self, text="Generation Order:", text_color=self.text_color).grid(row=row, column=0, padx=10, pady=5, sticky="w")
         order_menu = ctk.CTkOptionMenu(self, variable=self.app.generation_order, values=["Fastest First", "In Order"], text_color="black")
         order_menu.grid(row=row, column=1, columnspan=3, padx=10, pady=5, sticky="ew")
-        CTkToolTip(order_menu, message="'Fastest First' prioritizes long chunks for efficient GPU use.\n'In Order' generates sequentially so you can listen sooner.", delay=0.2)
+        CTkToolTip(order_menu, message="'Fastest First' starts the chunks predicted to take longest first and balances them across devices.\n'In Order' generates sequentially so you can listen sooner.", delay=0.2)
         row += 1
 
         # --- Items Per Page Controls ---
@@ -69,13 +72,33 @@ class GenerationTab(ctk.CTkFrame):
         ctk.CTkFrame(self, fg_color="transparent", height=10).grid(row=row, column=0); row+=1
 
         add_entry("Target Devices:", self.app.target_gpus_str, "Comma-separated list of devices (e.g., cuda:0,cuda:1,cpu).")
+        add_entry("CPU Workers:", self.app.cpu_workers_str, "Workers sharing the CPU when 'cpu' is a target device; each is pinned to its own cores.", "Run python -m core.cpu_partition --calibrate to find the best value.")
+        add_entry("ASR Devices:", self.app.asr_devices_str, "Devices for the shared Whisper validation service, used by all workers. Repeat a device for more ASR processes (e.g., cuda:0,cuda:0).")
+        ctk.CTkLabel(self, text="ASR Backend:", text_color=self.text_color).grid(row=row, column=0, padx=10, pady=5, sticky="w")
+        asr_backend_menu = ctk.CTkOptionMenu(self, variable=self.app.asr_backend_str, values=list(USER_ASR_BACKENDS), text_color="black")
+        asr_backend_menu.grid(row=row, column=1, padx=10, pady=5, sticky="ew")
+        asr_model_menu = ctk.CTkOptionMenu(self, variable=self.app.asr_model_str, values=list(WHISPER_MODEL_SIZES), text_color="black")
+        asr_model_menu.grid(row=row, column=2, columnspan=2, padx=10, pady=5, sticky="ew")
+        CTkToolTip(asr_backend_menu, message="'whisper' runs on the ASR devices.\n'whisper-int8' is a quantized CPU engine for machines without a spare GPU.", delay=0.2)
+        CTkToolTip(asr_model_menu, message="Whisper model size. Larger is more accurate but slower to validate.", delay=0.2)
+        row += 1
+        ctk.CTkLabel(self, text="ASR Precision:", text_color=self.text_color).grid(row=row, column=0, padx=10, pady=5, sticky="w")
+        asr_precision_menu = ctk.CTkOptionMenu(self, variable=self.app.asr_precision_str, values=list(ASR_PRECISIONS), text_color="black")
+        asr_precision_menu.grid(row=row, column=1, padx=10, pady=5, sticky="ew")
+        CTkToolTip(asr_precision_menu, message="'auto' is fp16 on GPU and fp32 on CPU.\n'fp16' needs a GPU ASR device; 'fp32' is slower but exact.\n'int8' switches Whisper to the quantized CPU engine.", delay=0.2)
+        row += 1
         add_entry("# of Full Outputs:", self.app.num_full_outputs_str, "How many complete audiobooks to generate (each with a different master seed if seed=0).")
         add_entry("Master Seed (0=random):", self.app.master_seed_str, "Set a seed for reproducible results. Set to 0 for random.")
         add_entry("Candidates per Chunk:", self.app.num_candidates_str, "Number of audio options to generate for each text chunk before picking the best one.")
         add_entry("ASR Max Retries:", self.app.max_attempts_str, "If ASR fails, how many times to retry generating a candidate.")
-        add_entry("ASR Acceptance Threshold:", self.app.asr_threshold_str, "Similarity score (0.0 to 1.0) required for ASR validation to pass.", "(Rec: 0.85)")
+        add_entry("ASR Acceptance Threshold:", self.app.asr_threshold_str, "Word-level similarity (0.0 to 1.0) between the text and its transcript required for ASR validation to pass.\nEach wrong, missing or extra word lowers it; two wrong words in ten score 0.80.", f"(Rec: {DEFAULT_ASR_THRESHOLD:.2f})")
+        add_entry("Screen Min Voice Similarity:", self.app.screen_min_voice_sim_str, "Candidates whose voice matches the reference less than this (0.0 to 1.0) are rejected before ASR.", "(Rec: 0.6)")
         
         ctk.CTkSwitch(self, text="Bypass ASR Validation", variable=self.app.asr_validation_enabled, onvalue=False, offvalue=True, text_color=self.text_color).grid(row=row, columnspan=3, pady=5, sticky="w", padx=10); row += 1
+        ctk.CTkSwitch(self, text="Screen Candidates Before ASR", variable=self.app.screening_enabled, text_color=self.text_color).grid(row=row, columnspan=3, pady=5, sticky="w", padx=10); row += 1
+        adaptive_switch = ctk.CTkSwitch(self, text="Escalate Retries", variable=self.app.adaptive_retries_enabled, text_color=self.text_color)
+        adaptive_switch.grid(row=row, columnspan=3, pady=5, sticky="w", padx=10); row += 1
+        CTkToolTip(adaptive_switch, message="Each retry of a failed chunk goes one step further: lower temperature, then a higher CFG weight,\nthen generating the chunk sentence by sentence. Needs ASR Max Retries of 4 to reach the split.", delay=0.2)
         ctk.CTkSwitch(self, text="Disable Perth Watermark", variable=self.app.disable_watermark, text_color=self.text_color).grid(row=row, columnspan=3, pady=5, sticky="w", padx=10); row += 1
 
         ctk.CTkButton(self, text="Save as Template...", command=self.app.save_generation_template, text_color="black").grid(row=row, column=0, columnspan=4, padx=10, pady=(20, 10), sticky="ew")
\ No newline at end of file
@@ -77,4 +77,5 @@ class SetupTab(ctk.CTkFrame):
         sys_check_frame = ctk.CTkFrame(self, fg_color=self.app.colors["tab_bg"]); sys_check_frame.pack(fill="x", padx=10, pady=(20, 5), ipady=5)
         ctk.CTkLabel(sys_check_frame, text="System Check", font=ctk.CTkFont(weight="bold"), text_color=self.app.text_color).pack()
         ctk.CTkLabel(sys_check_frame, text=f"FFmpeg: {'Found' if self.app.deps.ffmpeg_ok else 'Not Found'}", text_color="green" if self.app.deps.ffmpeg_ok else "#A40000").pack(anchor="w", padx=10)
-        ctk.CTkLabel(sys_check_frame, text=f"auto-editor: {'Found' if self.app.deps.auto_editor_ok else 'Not Found'}", text_color="green" if self.app.deps.auto_editor_ok else "#A40000").pack(anchor="w", padx=10)
\ No newline at end of file
+        ctk.CTkLabel(sys_check_frame, text=f"auto-editor: {'Found' if self.app.deps.auto_editor_ok else 'Not Found'}", text_color="green" if self.app.deps.auto_editor_ok else "#A40000").pack(anchor="w", padx=10)
+        self.app.worker_status_label = ctk.CTkLabel(sys_check_frame, text="Workers: not started", text_color=self.app.text_color); self.app.worker_status_label.pack(anchor="w", padx=10)
\ No newline at end of file
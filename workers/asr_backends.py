@@ -0,0 +1,165 @@
+# workers/asr_backends.py
+"""
+ASR engines used for candidate validation.
+
+Every backend turns a batch of (audio_16k, reference_text, threshold) requests into
+(text, similarity, early_decision) results, so the ASR service and in-process
+validation don't care which engine runs. Pick one with `create_backend(name, model_size,
+device, precision)`; names are the keys of `ASR_BACKENDS`.
+
+Precision policy: "auto" means fp16 on CUDA and fp32 on CPU; "fp16" and "fp32" force
+one or the other (fp16 falls back to fp32 on the CPU, where Whisper can't use it);
+"int8" selects the int8 backend, which always runs on the CPU.
+"""
+import logging
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+import whisper
+from whisper.audio import N_SAMPLES
+
+from workers.asr_scoring import word_similarity
+from workers.incremental_asr import IncrementalValidator, greedy_decode_with_early_exit
+
+WHISPER_MODEL_SIZES = ("tiny.en", "base.en", "small.en", "medium.en")
+WHISPER_DOWNLOAD_ROOT = str(Path.home() / ".cache" / "whisper")
+ASR_PRECISIONS = ("auto", "fp16", "fp32", "int8")
+
+
+def get_similarity_ratio(text1, text2):
+    return word_similarity(text1, text2)
+
+
+class ASRBackend:
+    """Base class: `load()` once, then `transcribe_batch()` as often as needed."""
+    name = None
+    precisions = ("auto", "fp16", "fp32")
+
+    def __init__(self, model_size="base.en", device="cpu", precision="auto"):
+        if precision not in self.precisions:
+            raise ValueError(f"ASR backend '{self.name}' supports precisions {self.precisions}, not '{precision}'")
+        self.model_size = model_size
+        self.device = torch.device(device if "cuda" in device and torch.cuda.is_available() else "cpu")
+        if precision == "fp16" and self.device.type != "cuda":
+            logging.warning(f"[ASR-{os.getpid()}] fp16 ASR needs a GPU; running {self.name} in fp32 on the CPU.")
+            precision = "fp32"
+        self.precision = precision
+
+    @property
+    def fp16(self):
+        return self.device.type == "cuda" and self.precision in ("auto", "fp16")
+
+    def load(self):
+        return self
+
+    def transcribe_batch(self, requests):
+        """[(audio_16k float32 array, reference_text, threshold or None)] -> [(text, similarity, early_decision)]."""
+        raise NotImplementedError
+
+    def describe(self):
+        return f"{self.name}:{self.model_size}@{self.device.type}"
+
+
+class WhisperBackend(ASRBackend):
+    """openai-whisper, batched greedy decoding with early exit (see workers/incremental_asr.py)."""
+    name = "whisper"
+
+    def load(self):
+        self.model = self._load_model()
+        return self
+
+    def _load_model(self):
+        return whisper.load_model(self.model_size, device=self.device, download_root=WHISPER_DOWNLOAD_ROOT)
+
+    def transcribe_batch(self, requests):
+        results = [None] * len(requests)
+        short = [i for i, (audio, _, _) in enumerate(requests) if len(audio) <= N_SAMPLES]
+        if short:
+            with torch.inference_mode():
+                mels = torch.stack([
+                    whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(requests[i][0])).to(self.device), n_mels=self.model.dims.n_mels)
+                    for i in short
+                ])
+                if self.fp16:
+                    mels = mels.half()
+            validators = [IncrementalValidator(requests[i][1], requests[i][2]) if requests[i][2] is not None else None for i in short]
+            for i, (text, decision) in zip(short, greedy_decode_with_early_exit(self.model, mels, validators)):
+                # An early reject's similarity is measured on the partial transcript, not the bound that rejected it.
+                results[i] = (text, get_similarity_ratio(requests[i][1], text), decision[0] if decision else None)
+        # Rare: candidates over 30 s need Whisper's own windowing.
+        for i, (audio, reference, _) in enumerate(requests):
+            if results[i] is None:
+                text = self.model.transcribe(audio, fp16=self.fp16, temperature=0.0)['text']
+                results[i] = (text, get_similarity_ratio(reference, text), None)
+        return results
+
+
+class WhisperInt8Backend(WhisperBackend):
+    """
+    Whisper with int8 dynamically quantized Linear layers, on the CPU. Costs a little accuracy
+    for roughly 2-3x faster decoding and a quarter of the weight memory, so a larger model size
+    becomes affordable on machines without a spare GPU.
+    """
+    name = "whisper-int8"
+    precisions = ASR_PRECISIONS
+
+    def __init__(self, model_size="base.en", device="cpu", precision="auto"):
+        if "cuda" in device:
+            logging.warning(f"[ASR-{os.getpid()}] The int8 ASR backend runs on the CPU; ignoring device {device}.")
+        if precision not in ("auto", "int8"):
+            logging.warning(f"[ASR-{os.getpid()}] The int8 ASR backend always runs in int8; ignoring precision {precision}.")
+        super().__init__(model_size, "cpu", "auto")
+        self.precision = "int8"
+
+    def _load_model(self):
+        model = whisper.load_model(self.model_size, device="cpu", download_root=WHISPER_DOWNLOAD_ROOT)
+        # Whisper's Linear subclass casts its weight per call, which dynamic quantization doesn't
+        # recognize; swap in plain nn.Linear first.
+        for parent in list(model.modules()):
+            for child_name, child in parent.named_children():
+                if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+                    plain = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+                    plain.load_state_dict(child.state_dict())
+                    setattr(parent, child_name, plain)
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8).eval()
+
+
+class StubBackend(ASRBackend):
+    """
+    Deterministic stand-in with no model: transcribes audible input as the reference text
+    (silent input as ""), optionally taking `seconds_per_audio_second` per request to mimic
+    a real engine's cost. For tests and pipeline benchmarks.
+    """
+    name = "stub"
+    precisions = ASR_PRECISIONS
+
+    def __init__(self, model_size="base.en", device="cpu", precision="auto", seconds_per_audio_second=0.0):
+        super().__init__(model_size, device, precision)
+        self.seconds_per_audio_second = seconds_per_audio_second
+
+    def transcribe_batch(self, requests):
+        results = []
+        for audio, reference, _ in requests:
+            if self.seconds_per_audio_second:
+                time.sleep(len(audio) / 16000 * self.seconds_per_audio_second)
+            text = reference if np.abs(audio).max(initial=0.0) > 1e-3 else ""
+            results.append((text, get_similarity_ratio(reference, text), None))
+        return results
+
+
+ASR_BACKENDS = {backend.name: backend for backend in (WhisperBackend, WhisperInt8Backend, StubBackend)}
+# What the UI offers; the stub is for tests and benchmarks, not for validating real runs.
+USER_ASR_BACKENDS = tuple(name for name in ASR_BACKENDS if name != StubBackend.name)
+
+
+def create_backend(name="whisper", model_size="base.en", device="cpu", precision="auto", **kwargs):
+    try:
+        backend_cls = ASR_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown ASR backend '{name}'. Choose from: {', '.join(ASR_BACKENDS)}")
+    if precision == "int8" and backend_cls is WhisperBackend:
+        backend_cls = WhisperInt8Backend
+    return backend_cls(model_size, device, precision, **kwargs)
@@ -0,0 +1,155 @@
+# workers/asr_scoring.py
+"""
+Scoring an ASR transcript against the text a candidate was meant to say.
+
+Both sides go through the same normalization, so that different spellings of the
+same speech compare equal. Digits, ordinals, decimals, currency, percentages and
+common abbreviations are spelled out ("$42.50" -> "forty two dollars fifty cents",
+"21st" -> "twenty first", "Dr." -> "doctor"), then everything is lowercased and split
+into words. Whisper writing "42" for a spoken "forty-two" is no longer a miss.
+
+Similarity is word-level: 1 - indel_distance / (len_a + len_b), which equals
+2 * LCS / (len_a + len_b). The LCS is computed bit-parallel, one big-int update per
+transcript word, and workers/incremental_asr.py bounds the same quantity while
+decoding.
+"""
+import difflib
+import re
+
+# Default pass mark for word_similarity. A wrong word costs all of its characters here, where the
+# old character-level ratio gave near-misses partial credit, so the same transcript scores lower:
+# two substituted words in ten score 0.80. That matches what 0.85 let through on characters.
+DEFAULT_ASR_THRESHOLD = 0.80
+
+_ONES = ["zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+         "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen", "seventeen", "eighteen", "nineteen"]
+_TENS = ["", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
+_SCALES = [(10**12, "trillion"), (10**9, "billion"), (10**6, "million"), (1000, "thousand")]
+_ORDINAL_EXCEPTIONS = {"one": "first", "two": "second", "three": "third", "five": "fifth",
+                       "eight": "eighth", "nine": "ninth", "twelve": "twelfth"}
+_CURRENCIES = {"$": ("dollar", "dollars", "cent", "cents"), "£": ("pound", "pounds", "penny", "pence"),
+               "€": ("euro", "euros", "cent", "cents")}
+ABBREVIATIONS = {
+    "mr": "mister", "mrs": "missus", "ms": "miss", "dr": "doctor", "prof": "professor", "jr": "junior",
+    "sr": "senior", "st": "saint", "mt": "mount", "vs": "versus", "etc": "et cetera", "approx": "approximately",
+    "dept": "department", "govt": "government", "ok": "okay", "lbs": "pounds", "km": "kilometers",
+}
+
+_CURRENCY_RE = re.compile(r"([$£€])\s?(\d[\d,]*)(?:\.(\d{1,2}))?")
+_ORDINAL_RE = re.compile(r"\b(\d[\d,]*)(st|nd|rd|th)\b")
+_DECIMAL_RE = re.compile(r"\b(\d[\d,]*)\.(\d+)\b")
+_NUMBER_RE = re.compile(r"\b\d[\d,]*\b")
+_ABBREV_RE = re.compile(r"\b(" + "|".join(ABBREVIATIONS) + r")\b\.?")
+
+
+def number_to_words(n):
+    """Cardinal English words for a non-negative integer, without 'and' ("one hundred twenty three")."""
+    if n < 20:
+        return _ONES[n]
+    if n < 100:
+        return _TENS[n // 10] + ("" if n % 10 == 0 else " " + _ONES[n % 10])
+    if n < 1000:
+        return _ONES[n // 100] + " hundred" + ("" if n % 100 == 0 else " " + number_to_words(n % 100))
+    for scale, name in _SCALES:
+        if n >= scale:
+            rest = n % scale
+            return number_to_words(n // scale) + " " + name + ("" if rest == 0 else " " + number_to_words(rest))
+    return str(n)
+
+
+def _integer_words(digits):
+    n = int(digits.replace(",", ""))
+    # Four-digit numbers in this range are almost always years, spoken in pairs: "nineteen ninety nine".
+    if "," not in digits and 1100 <= n <= 1999 and n % 100 != 0:
+        return number_to_words(n // 100) + " " + (number_to_words(n % 100) if n % 100 >= 10 else "oh " + _ONES[n % 100])
+    return number_to_words(n)
+
+
+def ordinal_words(n):
+    words = number_to_words(n).split()
+    last = words[-1]
+    if last in _ORDINAL_EXCEPTIONS:
+        words[-1] = _ORDINAL_EXCEPTIONS[last]
+    elif last.endswith("y"):
+        words[-1] = last[:-1] + "ieth"
+    else:
+        words[-1] = last + "th"
+    return " ".join(words)
+
+
+def _currency_words(match):
+    symbol, whole, cents = match.groups()
+    one, many, sub_one, sub_many = _CURRENCIES[symbol]
+    amount = int(whole.replace(",", ""))
+    words = f"{number_to_words(amount)} {one if amount == 1 else many}"
+    if cents and int(cents.ljust(2, "0")):
+        c = int(cents.ljust(2, "0"))
+        words += f" {number_to_words(c)} {sub_one if c == 1 else sub_many}"
+    return f" {words} "
+
+
+def normalize_words(text):
+    """Lowercased words with numbers, ordinals, currency, percentages and abbreviations spelled out."""
+    text = text.lower().replace("&", " and ").replace("%", " percent ")
+    text = re.sub(r"['’]", "", text)
+    text = _CURRENCY_RE.sub(_currency_words, text)
+    text = _ORDINAL_RE.sub(lambda m: f" {ordinal_words(int(m.group(1).replace(',', '')))} ", text)
+    text = _DECIMAL_RE.sub(lambda m: f" {_integer_words(m.group(1))} point {' '.join(_ONES[int(d)] for d in m.group(2))} ", text)
+    text = _NUMBER_RE.sub(lambda m: f" {_integer_words(m.group(0))} ", text)
+    text = _ABBREV_RE.sub(lambda m: f" {ABBREVIATIONS[m.group(1)]} ", text)
+    return re.findall(r"[a-z0-9]+", text)
+
+
+def _symbol_masks(a):
+    masks = {}
+    for i, symbol in enumerate(a):
+        masks[symbol] = masks.get(symbol, 0) | (1 << i)
+    return masks
+
+
+def lcs_bits(a, b, masks=None, v=None):
+    """
+    Bit-parallel LCS (Hyyro) of sequences `a` and `b`: one bit per element of `a`, and the zero bits
+    among the low j bits of the result count LCS(a[:j], b). Pass the previous `v` to extend `b`.
+    """
+    masks = masks if masks is not None else _symbol_masks(a)
+    full = (1 << len(a)) - 1
+    v = full if v is None else v
+    for symbol in b:
+        u = v & masks.get(symbol, 0)
+        v = ((v + u) | (v - u)) & full
+    return v
+
+
+def lcs_length(a, b):
+    return len(a) - bin(lcs_bits(a, b)).count("1")
+
+
+def word_similarity(expected, transcript):
+    """1 - word indel distance / total words, i.e. 2 * LCS / (len_a + len_b); 0.0 when either side is empty."""
+    a, b = normalize_words(expected), normalize_words(transcript)
+    if not a or not b:
+        return 0.0
+    return 2.0 * lcs_length(a, b) / (len(a) + len(b))
+
+
+def mismatched_words(expected, transcript):
+    """[(kind, expected_words, heard_words)] where kind is 'replaced', 'missing' or 'extra'."""
+    a, b = normalize_words(expected), normalize_words(transcript)
+    kinds = {"replace": "replaced", "delete": "missing", "insert": "extra"}
+    return [(kinds[tag], a[i1:i2], b[j1:j2])
+            for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes() if tag != "equal"]
+
+
+def format_mismatches(mismatches, limit=8):
+    parts = []
+    for kind, want, heard in mismatches[:limit]:
+        if kind == "replaced":
+            parts.append(f"'{' '.join(want)}'->'{' '.join(heard)}'")
+        elif kind == "missing":
+            parts.append(f"missing '{' '.join(want)}'")
+        else:
+            parts.append(f"extra '{' '.join(heard)}'")
+    if len(mismatches) > limit:
+        parts.append(f"... {len(mismatches) - limit} more")
+    return ", ".join(parts)
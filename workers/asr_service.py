@@ -0,0 +1,193 @@
+# workers/asr_service.py
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+from whisper.audio import SAMPLE_RATE as ASR_SR
+
+from workers.asr_backends import create_backend
+
+ASR_BACKEND = "whisper"
+ASR_MODEL_NAME = "base.en"
+ASR_PRECISION = "auto"
+ASR_TIMEOUT_S = 300.0
+
+
+def _collect_batch(request_queue, max_batch, max_wait_s):
+    """Blocks for one request, then gathers more for up to `max_wait_s`. A None in the queue means shut down."""
+    first = request_queue.get()
+    if first is None:
+        return None
+    batch, deadline = [first], time.monotonic() + max_wait_s
+    while len(batch) < max_batch:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            request = request_queue.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if request is None:
+            request_queue.put(None)  # finish this batch, stop on the next get
+            break
+        batch.append(request)
+    return batch
+
+
+def _asr_service_main(device_str, backend_name, model_name, precision, request_queue, response_queues, status_queue, max_batch, max_wait_s):
+    """ASR process: transcribes batches of candidates with its backend and replies to each requesting TTS worker."""
+    pid = os.getpid()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    status_queue.put((pid, f"asr:{device_str}", "loading", None))
+    try:
+        backend = create_backend(backend_name, model_name, device_str, precision).load()
+    except Exception as e:
+        logging.critical(f"[ASR-{pid}] Failed to load ASR backend {backend_name}:{model_name} ({precision}) on {device_str}: {e}", exc_info=True)
+        status_queue.put((pid, f"asr:{device_str}", "error", str(e)))
+        return
+    status_queue.put((pid, f"asr:{device_str}", "ready", None))
+    logging.info(f"[ASR-{pid}] {backend.describe()} ready")
+
+    while True:
+        batch = _collect_batch(request_queue, max_batch, max_wait_s)
+        if batch is None:
+            return
+        try:
+            results = backend.transcribe_batch([(audio, reference, threshold) for _, _, audio, reference, threshold in batch])
+            replies = [(text, ratio, early, None) for text, ratio, early in results]
+        except Exception as e:
+            logging.error(f"[ASR-{pid}] Batch of {len(batch)} failed: {e}", exc_info=True)
+            replies = [(None, 0.0, None, str(e))] * len(batch)
+        for (slot, request_id, _, _, _), reply in zip(batch, replies):
+            response_queues[slot].put((request_id, *reply))
+        n_early = sum(1 for reply in replies if reply[2])
+        logging.debug(f"[ASR-{pid}] Decoded batch of {len(batch)} ({n_early} rejected early)")
+
+
+class ASRService:
+    """
+    ASR validation shared by every TTS worker.
+
+    One process per entry in `devices` (repeat a device for more processes), each running
+    its own copy of the chosen backend (see workers/asr_backends.py), reads from a
+    single request queue, batches whatever arrives within `max_wait_ms` (up to `max_batch`
+    candidates), and sends each transcript and similarity back on the requesting worker's
+    own response queue. TTS workers get a slot (their response queue) through
+    `client_args()`, which is passed to them at spawn, since multiprocessing queues can
+    only be shared by inheritance.
+    """
+    def __init__(self, devices=("cpu",), backend=ASR_BACKEND, model_name=ASR_MODEL_NAME, precision=ASR_PRECISION, max_batch=16, max_wait_ms=20):
+        self.devices = tuple(devices) or ("cpu",)
+        self.backend = backend
+        self.model_name = model_name
+        self.precision = precision
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000.0
+        self._procs = []
+        self._request_queue = None
+        self._response_queues = []
+        self._slot_queue = None
+        self.status_queue = None
+
+    def start(self, n_clients, ctx=None, status_queue=None):
+        ctx = ctx or multiprocessing.get_context('spawn')
+        self._request_queue = ctx.Queue()
+        self._response_queues = [ctx.Queue() for _ in range(n_clients)]
+        self._slot_queue = ctx.Queue()
+        for slot in range(n_clients):
+            self._slot_queue.put(slot)
+        self.status_queue = status_queue or ctx.Queue()
+        self._procs = [
+            ctx.Process(target=_asr_service_main, name=f"asr-{device}",
+                        args=(device, self.backend, self.model_name, self.precision, self._request_queue, self._response_queues, self.status_queue, self.max_batch, self.max_wait_s),
+                        daemon=True)
+            for device in self.devices
+        ]
+        for proc in self._procs:
+            proc.start()
+        logging.info(f"Starting ASR service ({self.backend}:{self.model_name}, {self.precision}): {', '.join(self.devices)} serving {n_clients} TTS workers")
+
+    def client_args(self):
+        """What a TTS worker needs to build its ASRClient: (request queue, all response queues, slot queue)."""
+        return self._request_queue, self._response_queues, self._slot_queue
+
+    def is_alive(self):
+        return any(proc.is_alive() for proc in self._procs)
+
+    def shutdown(self):
+        if self._request_queue is not None:
+            for _ in self._procs:
+                try:
+                    self._request_queue.put(None)
+                except (OSError, ValueError):
+                    break
+        for proc in self._procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+        self._procs, self._request_queue, self._response_queues, self._slot_queue = [], None, [], None
+
+
+class ASRClient:
+    """A TTS worker's handle on the ASR service. Safe to use from several threads of one worker."""
+    def __init__(self, request_queue, response_queue, slot):
+        self._request_queue = request_queue
+        self._response_queue = response_queue
+        self._slot = slot
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._results = {}
+
+    @classmethod
+    def from_client_args(cls, client_args):
+        request_queue, response_queues, slot_queue = client_args
+        slot = slot_queue.get()
+        return cls(request_queue, response_queues[slot], slot)
+
+    def submit(self, audio_16k, reference_text, threshold=None):
+        """
+        Queues 16 kHz mono audio for transcription and returns a request id for `result()`. With a
+        `threshold`, decoding stops once the candidate can no longer pass; its similarity is then that of the partial transcript.
+        """
+        request_id = next(self._ids)
+        self._request_queue.put((self._slot, request_id, np.ascontiguousarray(audio_16k, dtype=np.float32), reference_text, threshold))
+        return request_id
+
+    def result(self, request_id, timeout=ASR_TIMEOUT_S):
+        """(transcript, similarity ratio) for `request_id`; early-exit transcripts are partial. Raises on a service error or timeout."""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while request_id not in self._results:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No ASR result after {timeout:.0f}s")
+                try:
+                    rid, text, ratio, _, error = self._response_queue.get(timeout=remaining)
+                except queue.Empty:
+                    continue
+                self._results[rid] = (text, ratio, error)
+            text, ratio, error = self._results.pop(request_id)
+        if error is not None:
+            raise RuntimeError(f"ASR service error: {error}")
+        return text, ratio
+
+    def transcribe(self, audio_16k, reference_text, threshold=None, timeout=ASR_TIMEOUT_S):
+        return self.result(self.submit(audio_16k, reference_text, threshold), timeout)
+
+
+class LocalASR:
+    """An in-process ASR backend with the ASRClient interface, for workers running outside a WorkerPool."""
+    def __init__(self, device_str="cpu", backend=ASR_BACKEND, model_name=ASR_MODEL_NAME, precision=ASR_PRECISION):
+        self.backend = create_backend(backend, model_name, device_str, precision).load()
+        self.model = getattr(self.backend, "model", None)
+        self._lock = threading.Lock()
+
+    def transcribe(self, audio_16k, reference_text, threshold=None, timeout=None):
+        with self._lock:
+            text, ratio, _ = self.backend.transcribe_batch([(np.asarray(audio_16k, dtype=np.float32), reference_text, threshold)])[0]
+        return text, ratio
@@ -0,0 +1,118 @@
+# workers/incremental_asr.py
+"""
+Early-exit ASR validation.
+
+Whisper is decoded greedily token by token, and every few tokens the partial
+transcript is aligned word by word against the expected text, using the same
+normalization and bit-parallel LCS as workers/asr_scoring.py. That gives an upper
+bound on the final similarity, assuming the rest of the expected text gets
+transcribed perfectly; below the threshold, the candidate is rejected.
+
+There is no early accept. A perfect prefix says nothing about what follows it:
+trailing babble or a repeated phrase, both common TTS failures, only show up at
+the end, so a passing verdict needs the full transcript.
+
+The last whitespace-separated token of a partial transcript may still be growing
+("4" -> "42"), so it is held back until the next one starts.
+"""
+import numpy as np
+import torch
+from whisper.tokenizer import get_tokenizer
+
+from workers.asr_scoring import _symbol_masks, lcs_bits, normalize_words
+
+
+class IncrementalValidator:
+    """Tracks a growing transcript against `reference` and decides as soon as `threshold` is settled."""
+    def __init__(self, reference, threshold):
+        self.a = normalize_words(reference)
+        self.threshold = threshold
+        self._masks = _symbol_masks(self.a)
+        self._v = (1 << len(self.a)) - 1
+        self._seen = []
+
+    def _prefix_lcs(self):
+        """LCS(a[:j], transcript) for j = 0..len(a)."""
+        n_bytes = max(1, (len(self.a) + 7) // 8)
+        bits = np.unpackbits(np.frombuffer(self._v.to_bytes(n_bytes, "little"), dtype=np.uint8), bitorder="little")[:len(self.a)]
+        ones = np.concatenate([[0], np.cumsum(bits)])
+        return np.arange(len(self.a) + 1) - ones
+
+    def feed(self, partial_text):
+        """Returns ("reject", upper_bound) once the candidate can no longer pass, else None."""
+        complete = partial_text if partial_text[-1:].isspace() else partial_text.rpartition(" ")[0]
+        norm = normalize_words(complete)
+        if norm[:len(self._seen)] != self._seen:
+            # Normalization changed earlier words; realign from scratch.
+            self._v, self._seen = (1 << len(self.a)) - 1, []
+        self._v = lcs_bits(self.a, norm[len(self._seen):], self._masks, self._v)
+        self._seen = norm
+        if not self.a or not norm:
+            return None
+
+        la, lp = len(self.a), len(norm)
+        prefix_lcs = self._prefix_lcs()
+        j = np.arange(la + 1)
+        upper = float(np.max(2.0 * (prefix_lcs + la - j) / (2 * la + lp - j)))
+        if upper < self.threshold:
+            return "reject", upper
+        return None
+
+
+def greedy_decode_with_early_exit(model, mels, validators, check_every=4):
+    """
+    Greedy English decoding of a batch of 30 s log-mel windows, (B, n_mels, 3000), equivalent to
+    whisper.decode at temperature 0 without timestamps. Rows whose validator (None = decode fully)
+    settles are dropped from the batch, KV cache included. Returns [(text, decision)] where
+    decision is None for a full decode or the validator's (verdict, bound).
+    """
+    tokenizer = get_tokenizer(model.is_multilingual, language="en", task="transcribe")
+    suppress = set(tokenizer.non_speech_tokens) | {
+        tokenizer.transcribe, tokenizer.translate, tokenizer.sot, tokenizer.sot_prev, tokenizer.sot_lm, tokenizer.no_timestamps,
+    }
+    if tokenizer.no_speech is not None:
+        suppress.add(tokenizer.no_speech)
+    suppress = sorted(suppress)
+    blank = tokenizer.encode(" ") + [tokenizer.eot]
+    n = mels.shape[0]
+    out_tokens = [[] for _ in range(n)]
+    decisions = [None] * n
+
+    with torch.inference_mode():
+        audio_features = model.embed_audio(mels)
+        tokens = torch.tensor([list(tokenizer.sot_sequence_including_notimestamps)] * n, device=mels.device)
+        rows = list(range(n))
+        kv_cache, hooks = model.install_kv_cache_hooks()
+        try:
+            for step in range(model.dims.n_text_ctx // 2):
+                logits = model.decoder(tokens if step == 0 else tokens[:, -1:], audio_features, kv_cache=kv_cache)[:, -1].float()
+                logits[:, suppress] = -np.inf
+                logits[:, tokenizer.timestamp_begin:] = -np.inf
+                if step == 0:
+                    logits[:, blank] = -np.inf
+                next_tokens = logits.argmax(dim=-1)
+                tokens = torch.cat([tokens, next_tokens[:, None]], dim=-1)
+
+                keep = []
+                for i, (row, token) in enumerate(zip(rows, next_tokens.tolist())):
+                    if token == tokenizer.eot:
+                        continue
+                    out_tokens[row].append(token)
+                    if validators[row] is not None and len(out_tokens[row]) % check_every == 0:
+                        decisions[row] = validators[row].feed(tokenizer.decode(out_tokens[row]))
+                        if decisions[row] is not None:
+                            continue
+                    keep.append(i)
+                if not keep:
+                    break
+                if len(keep) < len(rows):
+                    idx = torch.tensor(keep, device=tokens.device)
+                    tokens, audio_features = tokens[idx], audio_features[idx]
+                    for module in kv_cache:
+                        kv_cache[module] = kv_cache[module][idx]
+                    rows = [rows[i] for i in keep]
+        finally:
+            for hook in hooks:
+                hook.remove()
+
+    return [(tokenizer.decode(out_tokens[i]).strip(), decisions[i]) for i in range(n)]
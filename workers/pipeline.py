@@ -0,0 +1,146 @@
+# workers/pipeline.py
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+import torch
+
+_DONE = object()
+
+
+class StageTimings:
+    """Wall-clock seconds and call counts per pipeline stage. Thread-safe."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seconds = defaultdict(float)
+        self.counts = defaultdict(int)
+
+    @contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.seconds[stage] += seconds
+            self.counts[stage] += 1
+
+    def merge(self, other):
+        with other._lock:
+            seconds, counts = dict(other.seconds), dict(other.counts)
+        with self._lock:
+            for stage, value in seconds.items():
+                self.seconds[stage] += value
+                self.counts[stage] += counts[stage]
+
+    def mean(self, stage):
+        """Average seconds per call of `stage`, or None before it has run."""
+        with self._lock:
+            return self.seconds[stage] / self.counts[stage] if self.counts.get(stage) else None
+
+    def as_dict(self):
+        with self._lock:
+            return {stage: round(seconds, 4) for stage, seconds in self.seconds.items()}
+
+    def summary(self):
+        with self._lock:
+            return ", ".join(f"{stage}={self.seconds[stage]:.2f}s/{self.counts[stage]}" for stage in self.seconds)
+
+
+def _stage_stream_context(device_str):
+    """Each stage thread gets its own CUDA stream so its kernels can overlap the model thread's."""
+    if device_str and "cuda" in device_str and torch.cuda.is_available():
+        return torch.cuda.stream(torch.cuda.Stream(torch.device(device_str)))
+    return nullcontext()
+
+
+class StagePipeline:
+    """
+    Runs items through a chain of stages, one thread per stage, linked by bounded queues.
+
+    `stages` is a list of (name, fn). Each fn takes an item (a dict) and returns it,
+    usually with fields added. An exception in a stage is logged and stored on the
+    item as 'error', and later stages pass the item through untouched. Items come out
+    of `poll()` / `drain()` in submission order, since every stage is a single FIFO
+    thread. `submit()` blocks once the first queue holds `depth` items, which bounds
+    how far the producer can run ahead of the slowest stage.
+
+    One pipeline can serve a sequence of tasks. An item may then bring its own stage
+    functions as 'stages' (name -> fn; a missing name passes it through), its own
+    StageTimings as 'timings', and a threading.Event as 'skip', which, once set,
+    passes it through the remaining stages untouched.
+    """
+    def __init__(self, stages, depth=1, timings=None, device_str=None, name="pipeline"):
+        self.timings = timings or StageTimings()
+        self._device_str = device_str
+        self._queues = [queue.Queue(maxsize=depth) for _ in stages]
+        self._out = queue.Queue()
+        self._threads = []
+        self.pending = 0
+        for i, (stage_name, fn) in enumerate(stages):
+            out_q = self._queues[i + 1] if i + 1 < len(stages) else self._out
+            thread = threading.Thread(target=self._run_stage, args=(stage_name, fn, self._queues[i], out_q),
+                                      name=f"{name}-{stage_name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run_stage(self, stage_name, fn, in_q, out_q):
+        with _stage_stream_context(self._device_str):
+            while True:
+                item = in_q.get()
+                if item is _DONE:
+                    out_q.put(_DONE)
+                    return
+                stage_fn = item["stages"].get(stage_name) if "stages" in item else fn
+                skip = item.get("skip")
+                if stage_fn is not None and item.get("error") is None and not (skip is not None and skip.is_set()):
+                    try:
+                        with item.get("timings", self.timings).time(stage_name):
+                            item = stage_fn(item)
+                    except Exception as e:
+                        logging.error(f"[Worker-{os.getpid()}] Pipeline stage '{stage_name}' failed: {e}", exc_info=True)
+                        item["error"] = f"{stage_name}: {e}"
+                out_q.put(item)
+
+    def submit(self, item):
+        self.pending += 1
+        self._queues[0].put(item)
+
+    def poll(self):
+        """Items that have finished every stage so far, without blocking."""
+        finished = []
+        while True:
+            try:
+                item = self._out.get_nowait()
+            except queue.Empty:
+                return finished
+            self.pending -= 1
+            finished.append(item)
+
+    def next(self):
+        """Blocks until the next item finishes every stage."""
+        item = self._out.get()
+        self.pending -= 1
+        return item
+
+    def drain(self):
+        """Closes the pipeline and returns every item still in it."""
+        self._queues[0].put(_DONE)
+        finished = []
+        while True:
+            item = self._out.get()
+            if item is _DONE:
+                break
+            self.pending -= 1
+            finished.append(item)
+        for thread in self._threads:
+            thread.join()
+        return finished
+
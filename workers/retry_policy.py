@@ -0,0 +1,64 @@
+# workers/retry_policy.py
+"""
+Escalating retries for chunks that fail validation.
+
+Instead of retrying a failed chunk with identical settings and a new seed, each attempt
+takes the next rung of a ladder. A rung runs for `attempts` attempts (None = all that are
+left) and may lower the temperature, shift the CFG weight, and/or generate the chunk one
+sentence at a time and join the pieces. Rungs are cumulative by convention: a later rung
+repeats the earlier adjustments it still wants. The rung that produced the chosen candidate
+is reported back, so a run shows which escalations actually pay off.
+"""
+from sentence_splitter import SentenceSplitter
+
+DEFAULT_RETRY_LADDER = (
+    {"name": "base", "attempts": 1},
+    {"name": "cooler", "attempts": 1, "temperature_scale": 0.75},
+    {"name": "cfg", "attempts": 1, "temperature_scale": 0.75, "cfg_weight_delta": 0.2},
+    {"name": "split", "attempts": None, "temperature_scale": 0.75, "cfg_weight_delta": 0.2, "split": True},
+)
+BASE_RUNG = {"name": "base", "attempts": None}
+
+MIN_TEMPERATURE = 0.05
+# Silence put between pieces of a split chunk.
+SPLIT_PAUSE_S = 0.15
+
+_SPLITTER = None
+
+
+def rung_for_attempt(ladder, attempt_num):
+    """The rung for 1-based `attempt_num`. No ladder means every attempt is a plain retry."""
+    if not ladder:
+        return BASE_RUNG
+    for rung in ladder:
+        if rung.get("attempts") is None:
+            return rung
+        if attempt_num <= rung["attempts"]:
+            return rung
+        attempt_num -= rung["attempts"]
+    return ladder[-1]
+
+
+def apply_rung(rung, temperature, cfg_weight):
+    """(temperature, cfg_weight) for an attempt on `rung`."""
+    temperature = max(temperature * rung.get("temperature_scale", 1.0), MIN_TEMPERATURE)
+    cfg_weight = min(max(cfg_weight + rung.get("cfg_weight_delta", 0.0), 0.0), 1.0)
+    return temperature, cfg_weight
+
+
+def split_text(text):
+    """
+    Pieces to generate separately: the chunk's sentences, or, for a single sentence, its two
+    halves at the clause break nearest the middle. A single piece means it can't be split.
+    """
+    global _SPLITTER
+    if _SPLITTER is None:
+        _SPLITTER = SentenceSplitter(language='en')
+    pieces = [s.strip() for s in _SPLITTER.split(text) if s.strip()]
+    if len(pieces) > 1:
+        return pieces
+    breaks = [i for i, ch in enumerate(text) if ch == "," and 0 < i < len(text) - 1]
+    if not breaks:
+        return [text]
+    cut = min(breaks, key=lambda i: abs(i - len(text) / 2))
+    return [text[:cut + 1].strip(), text[cut + 1:].strip()]
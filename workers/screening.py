@@ -0,0 +1,79 @@
+# workers/screening.py
+"""
+Cheap checks that reject obviously broken candidates before they reach Whisper, and
+a score that ranks them.
+
+All signal checks run on the whole waveform at once (framed RMS, peak and clipping
+via tensor reductions); the speaker check compares a VoiceEncoder embedding with
+the reference voice's. Thresholds are deliberately loose: screening is only meant to
+catch garbage, and ASR still decides everything else. The score orders candidates
+that never reach ASR, so the least broken one is kept when nothing passes.
+"""
+import torch
+
+# Typical read-aloud English pace, used to turn text length into an expected duration.
+CHARS_PER_SECOND = 14.5
+
+DEFAULT_SCREENING = {
+    "min_duration_ratio": 0.35,      # actual / expected duration
+    "max_duration_ratio": 2.5,
+    "silence_db": -40.0,             # frames quieter than this count as silence
+    "max_silence_ratio": 0.6,
+    "min_peak": 0.01,
+    "clip_level": 0.999,
+    "max_clipped_ratio": 0.001,
+    "min_speaker_similarity": 0.6,   # None skips the VoiceEncoder check
+}
+
+
+def expected_duration(text):
+    return max(len(text.strip()) / CHARS_PER_SECOND, 0.5)
+
+
+def audio_metrics(wav, sr, text, config):
+    """Duration ratio, silence ratio, peak and clipped-sample ratio of a mono waveform."""
+    x = wav.reshape(-1).float()
+    frame = max(1, int(sr * 0.02))
+    padded = torch.nn.functional.pad(x, (0, frame - x.numel())) if x.numel() < frame else x
+    frames = padded[:padded.numel() // frame * frame].view(-1, frame)
+    frame_db = 20 * torch.log10(frames.pow(2).mean(dim=1).sqrt() + 1e-8)
+    magnitude = x.abs()
+    return {
+        "duration_ratio": x.numel() / sr / expected_duration(text),
+        "silence_ratio": (frame_db < config["silence_db"]).float().mean().item(),
+        "peak": magnitude.max().item(),
+        "clipped_ratio": (magnitude >= config["clip_level"]).float().mean().item(),
+    }
+
+
+def screen_candidate(metrics, config):
+    """Returns the reason a candidate is rejected, or None if it should go on to ASR."""
+    if not config["min_duration_ratio"] <= metrics["duration_ratio"] <= config["max_duration_ratio"]:
+        return f"duration ratio {metrics['duration_ratio']:.2f} outside [{config['min_duration_ratio']}, {config['max_duration_ratio']}]"
+    if metrics["peak"] < config["min_peak"]:
+        return f"near-silent (peak {metrics['peak']:.3f})"
+    if metrics["silence_ratio"] > config["max_silence_ratio"]:
+        return f"mostly silence ({metrics['silence_ratio']:.0%})"
+    if metrics["clipped_ratio"] > config["max_clipped_ratio"]:
+        return f"clipping ({metrics['clipped_ratio']:.2%} of samples)"
+    speaker_sim = metrics.get("speaker_similarity")
+    if speaker_sim is not None and config.get("min_speaker_similarity") is not None and speaker_sim < config["min_speaker_similarity"]:
+        return f"voice mismatch (similarity {speaker_sim:.2f})"
+    return None
+
+
+def screening_score(metrics, config):
+    """0-1, higher is better: the mean of how close to ideal each signal metric (and speaker similarity, if measured) is."""
+    ratio = metrics["duration_ratio"]
+    parts = [
+        min(ratio, 1.0 / ratio) if ratio > 0 else 0.0,
+        1.0 - metrics["silence_ratio"],
+        1.0 - min(metrics["clipped_ratio"] / max(config["max_clipped_ratio"], 1e-9), 1.0),
+    ]
+    if metrics.get("speaker_similarity") is not None:
+        parts.append(max(metrics["speaker_similarity"], 0.0))
+    return sum(parts) / len(parts)
+
+
+def format_metrics(metrics):
+    return ", ".join(f"{k}={v:.3f}" for k, v in metrics.items() if v is not None)
@@ -1,38 +1,86 @@
 # workers/tts_worker.py
 import os
-import re
+import math
 import random
 import logging
-from pathlib import Path
 import shutil
-import difflib
+import threading
+import time
+from pathlib import Path
 
 import torch
 import torchaudio
 
 # Chatterbox-specific imports
 from chatterbox.tts import ChatterboxTTS
-import whisper
+from core.cpu_partition import apply_cpu_assignment
+from workers.pipeline import StagePipeline, StageTimings
+from workers.asr_scoring import format_mismatches, mismatched_words
+from workers.asr_service import ASR_SR, ASRClient, LocalASR
+from workers.retry_policy import SPLIT_PAUSE_S, apply_rung, rung_for_attempt, split_text
+from workers.screening import audio_metrics, screen_candidate, screening_score, format_metrics
 
 # --- Worker-Specific Globals ---
-_WORKER_TTS_MODEL, _WORKER_WHISPER_MODEL = None, None
+_WORKER_TTS_MODEL, _WORKER_ASR = None, None
+_WORKER_DEVICE = None
+_WORKER_RACE_BOARD = None
 
 def get_or_init_worker_models(device_str: str):
-    """Initializes models once per worker process to save memory and time."""
-    global _WORKER_TTS_MODEL, _WORKER_WHISPER_MODEL
+    """
+    Initializes models once per worker process to save memory and time. ASR goes through the
+    shared ASR service when the pool set one up (see init_worker), else a local Whisper.
+    """
+    global _WORKER_TTS_MODEL, _WORKER_ASR, _WORKER_DEVICE
     pid = os.getpid()
     if _WORKER_TTS_MODEL is None:
+        _WORKER_DEVICE = device_str
         logging.info(f"[Worker-{pid}] Initializing models for device: {device_str}")
         try:
-            _WORKER_TTS_MODEL = ChatterboxTTS.from_pretrained(device_str)
-            whisper_device = torch.device(device_str if "cuda" in device_str and torch.cuda.is_available() else "cpu")
-            _WORKER_WHISPER_MODEL = whisper.load_model("base.en", device=whisper_device, download_root=str(Path.home() / ".cache" / "whisper"))
+            # Conditioning encoders are only loaded when a voice is missing from every cache.
+            _WORKER_TTS_MODEL = ChatterboxTTS.from_pretrained(device_str, encoder_policy="offload")
+            if _WORKER_ASR is None:
+                _WORKER_ASR = LocalASR(device_str)
             logging.info(f"[Worker-{pid}] Models loaded successfully on {device_str}.")
+            log_worker_memory(_WORKER_TTS_MODEL, getattr(_WORKER_ASR, "model", None))
         except Exception as e:
             logging.critical(f"[Worker-{pid}] CRITICAL ERROR: Failed to initialize models: {e}", exc_info=True)
-            _WORKER_TTS_MODEL, _WORKER_WHISPER_MODEL = None, None
+            _WORKER_TTS_MODEL = None
             raise
-    return _WORKER_TTS_MODEL, _WORKER_WHISPER_MODEL
+    return _WORKER_TTS_MODEL, _WORKER_ASR
+
+def init_worker(device_queue, status_queue, asr_client_args=None, race_board=None):
+    """Pool initializer: binds this process to a device and loads its models before any task arrives."""
+    global _WORKER_ASR, _WORKER_RACE_BOARD
+    if asr_client_args is not None:
+        _WORKER_ASR = ASRClient.from_client_args(asr_client_args)
+    _WORKER_RACE_BOARD = race_board
+    item = device_queue.get()
+    # CPU workers also receive their core set: (device, CpuAssignment)
+    device_str, cpu_assignment = item if isinstance(item, tuple) else (item, None)
+    pid = os.getpid()
+    if cpu_assignment is not None:
+        apply_cpu_assignment(cpu_assignment)
+        logging.info(f"[Worker-{pid}] Pinned to cores {cpu_assignment.cores} with {cpu_assignment.intra_op_threads} threads")
+    status_queue.put((pid, device_str, "loading", None))
+    try:
+        get_or_init_worker_models(device_str)
+        status_queue.put((pid, device_str, "ready", None))
+    except Exception as e:
+        # Keep the process alive; tasks will report the load failure instead of breaking the pool.
+        status_queue.put((pid, device_str, "error", str(e)))
+
+def worker_ping():
+    """No-op task used to spawn pool workers eagerly and report whether their models are loaded."""
+    return {"pid": os.getpid(), "device": _WORKER_DEVICE, "warm": _WORKER_TTS_MODEL is not None, "stage_timings": _WORKER_TIMINGS.as_dict()}
+
+def log_worker_memory(tts_model, whisper_model=None):
+    """Logs resident memory per model component for this worker."""
+    report = tts_model.memory_report()
+    if whisper_model is not None:
+        report["whisper"] = sum(t.numel() * t.element_size() for t in list(whisper_model.parameters()) + list(whisper_model.buffers()))
+    parts = ", ".join(f"{name}={nbytes / 2**20:.0f}MB" for name, nbytes in report.items() if nbytes is not None)
+    logging.info(f"[Worker-{os.getpid()}] Resident memory: {parts}")
+    return report
 
 def set_seed(seed: int):
     """Sets random seeds for reproducibility."""
@@ -43,106 +91,305 @@ def set_seed(seed: int):
     if torch.cuda.is_available():
         torch.cuda.manual_seed_all(seed)
 
-def get_similarity_ratio(text1, text2):
-    norm1 = re.sub(r'[\W_]+', '', text1).lower()
-    norm2 = re.sub(r'[\W_]+', '', text2).lower()
-    if not norm1 or not norm2: return 0.0
-    return difflib.SequenceMatcher(None, norm1, norm2).ratio()
+# --- Pipelining ---
+# An attempt runs through: generate (T3 + S3Gen/HiFT, on this thread) -> watermark (+ one resample
+# to 16 kHz for ASR) -> screen (cheap checks, see workers/screening.py) -> asr. Candidates stay in
+# memory; only the chosen one is ever written. Each worker keeps one pipeline for all its tasks, so
+# a chunk never waits for speculative attempts it no longer needs: they skip their remaining stages
+# while the next chunk is already generating.
+PIPELINE_DEPTH = 1
+PIPELINE_STAGES = ("watermark", "screen", "asr")
+# Another attempt is started before the in-flight ones are validated only when it pays for itself:
+# it saves about one ASR wait if they fall short, and wastes one generate if they don't (see
+# `_should_speculate`). Generation is usually the slower stage, so with the 3/4 pass prior a
+# single-candidate chunk waits for its attempt's ASR instead of speculating.
+_WORKER_ASR_STATS = {"passed": 3, "total": 4}  # prior: most candidates pass
+_WORKER_TIMINGS = StageTimings()
+_WORKER_PIPELINE = None
+
+def get_worker_pipeline(device_str):
+    """This worker's stage pipeline, created on first use and shared by every chunk it processes."""
+    global _WORKER_PIPELINE
+    if _WORKER_PIPELINE is None:
+        _WORKER_PIPELINE = StagePipeline([(name, None) for name in PIPELINE_STAGES], depth=PIPELINE_DEPTH, device_str=device_str, name="worker")
+    return _WORKER_PIPELINE
+
+def _should_speculate(in_flight, needed, bypass_asr):
+    """
+    True when another attempt should start now: always if fewer are in flight than `needed`,
+    otherwise only when the expected ASR wait it saves beats the expected generate it wastes,
+    from this worker's measured stage times. Never before both stages have been timed.
+    """
+    if in_flight < needed:
+        return True
+    if bypass_asr:
+        return False
+    generate_s, asr_s = _WORKER_TIMINGS.mean("generate"), _WORKER_TIMINGS.mean("asr")
+    if generate_s is None or asr_s is None:
+        return False
+    p = _WORKER_ASR_STATS["passed"] / _WORKER_ASR_STATS["total"]
+    p_short = sum(math.comb(in_flight, k) * p**k * (1 - p)**(in_flight - k) for k in range(needed))
+    return p_short * asr_s > (1 - p_short) * generate_s
+
+# --- Tail racing ---
+# Once a run's queue is empty, idle workers race extra copies of the chunks still in flight (see
+# WorkerPool.run). Copy n (its "racer" number, 0 for the original) draws its own block of seeds,
+# master_seed + n * max_attempts + attempt, and writes beside the final file; the pool cancels the
+# losers through a shared board, which each copy checks between attempts and before writing.
+_RACE_STATUS_RANK = {"success": 2, "failed_placeholder": 1}
+
+def race_key(task_bundle):
+    """Identifies a chunk within a run: 'run_idx:uuid'."""
+    return f"{task_bundle[15]}:{task_bundle[17]}"
+
+def _race_cancelled(key):
+    if _WORKER_RACE_BOARD is None:
+        return False
+    try:
+        return bool(_WORKER_RACE_BOARD.get(key))
+    except Exception:
+        return False
+
+def _chunk_wav_path(output_dir_str, session_name, uuid, racer=0):
+    suffix = f".race{racer}" if racer else ""
+    return Path(output_dir_str) / session_name / "Sentence_wavs" / f"audio_{uuid}{suffix}.wav"
+
+class ChunkRace:
+    """How WorkerPool.run races worker_process_chunk tasks: which copy wins and where its audio ends up."""
+    key = staticmethod(race_key)
+
+    def variant(self, task_bundle, racer):
+        """The task bundle for racer number `racer`, or None when racing can't help (ASR bypassed: every attempt passes)."""
+        if task_bundle[13]:
+            return None
+        return task_bundle[:21] + (racer,)
+
+    def settles(self, result):
+        return bool(result) and result.get("status") == "success"
+
+    def score(self, result):
+        if not result:
+            return (0, 0.0)
+        return (_RACE_STATUS_RANK.get(result.get("status"), 0), result.get("similarity_ratio") or 0.0)
+
+    def claim(self, task_bundle, result):
+        """Puts the winning racer's audio at the chunk's final path as soon as it wins."""
+        final_path = _chunk_wav_path(task_bundle[16], task_bundle[14], task_bundle[17])
+        if result and result.get("path") and Path(result["path"]) != final_path:
+            shutil.copyfile(result["path"], final_path)
+            result["race_path"], result["path"] = result["path"], str(final_path)
+
+    def resolve(self, task_bundle, winner, losers):
+        """Once every copy has stopped: restores the winner if a loser wrote the final path late, and removes racer files."""
+        final_path = _chunk_wav_path(task_bundle[16], task_bundle[14], task_bundle[17])
+        winner_race_path = (winner or {}).get("race_path")
+        if winner_race_path and any(loser and loser.get("path") == str(final_path) for loser in losers):
+            shutil.copyfile(winner_race_path, final_path)
+        leftovers = [winner_race_path] + [loser.get("path") for loser in losers if loser]
+        for path in leftovers:
+            if path and Path(path) != final_path:
+                Path(path).unlink(missing_ok=True)
 
 def worker_process_chunk(task_bundle):
     """The main function executed by each worker process to generate a single audio chunk."""
     (task_index, original_index, sentence_number, text_chunk, device_str, master_seed, ref_audio_path,
      exaggeration, temperature, cfg_weight, disable_watermark, num_candidates, max_attempts,
-     bypass_asr, session_name, run_idx, output_dir_str, uuid, asr_threshold) = task_bundle
+     bypass_asr, session_name, run_idx, output_dir_str, uuid, asr_threshold, screening, retry_ladder, racer) = task_bundle
 
     pid = os.getpid()
-    logging.info(f"[Worker-{pid}] Starting chunk (Idx: {original_index}, #: {sentence_number}, UUID: {uuid[:8]}) on device {device_str}")
+    # Pool workers are bound to a device at start; the device stamped on the task is only a preference.
+    device_str = _WORKER_DEVICE or device_str
+    key = race_key(task_bundle)
+    racer_label = f", racer {racer}" if racer else ""
+    logging.info(f"[Worker-{pid}] Starting chunk (Idx: {original_index}, #: {sentence_number}, UUID: {uuid[:8]}{racer_label}) on device {device_str}")
+    chunk_start = time.perf_counter()
 
     try:
-        tts_model, whisper_model = get_or_init_worker_models(device_str)
-        if tts_model is None or whisper_model is None:
+        tts_model, asr = get_or_init_worker_models(device_str)
+        if tts_model is None or asr is None:
             raise RuntimeError(f"Model initialization failed for device {device_str}")
     except Exception as e_model_load:
         return {"original_index": original_index, "status": "error", "error_message": f"Model Load Fail: {e_model_load}"}
 
-    run_temp_dir = Path(output_dir_str) / session_name / f"run_{run_idx+1}_temp"
-    run_temp_dir.mkdir(exist_ok=True, parents=True)
-    
-    base_candidate_path_prefix = run_temp_dir / f"c_{uuid}_cand"
-
     try:
         tts_model.prepare_conditionals(ref_audio_path, exaggeration=min(exaggeration, 1.0), use_cache=True)
     except Exception as e:
         logging.error(f"[Worker-{pid}] Failed to prepare conditionals for chunk {sentence_number}: {e}", exc_info=True)
         return {"original_index": original_index, "status": "error", "error_message": f"Conditional Prep Fail: {e}"}
 
-    passed_candidates = []
-    best_failed_candidate = None
-    
-    for attempt_num in range(max_attempts):
-        if len(passed_candidates) >= num_candidates:
-            logging.info(f"Met required number of candidates ({num_candidates}). Stopping early.")
-            break
+    # Screening runs on a stage thread, possibly after the next chunk has switched voices.
+    speaker_emb = tts_model.conds.t3.speaker_emb
 
-        if master_seed != 0:
-            seed = master_seed + attempt_num
-        else:
-            seed = random.randint(1, 2**32 - 1)
-        
-        logging.info(f"[Worker-{pid}] Chunk #{sentence_number}, Attempt {attempt_num + 1}/{max_attempts} with seed {seed}")
-        set_seed(seed)
-        
-        temp_path_str = str(base_candidate_path_prefix) + f"_{attempt_num+1}_seed{seed}.wav"
+    def watermark_stage(cand):
+        if not disable_watermark:
+            wav_np = tts_model.watermarker.apply_watermark(cand["wav"].squeeze(0).numpy(), sample_rate=tts_model.sr)
+            cand["wav"] = torch.from_numpy(wav_np).unsqueeze(0)
+        if not bypass_asr:
+            cand["audio_16k"] = torchaudio.functional.resample(cand["wav"], tts_model.sr, ASR_SR).squeeze(0).numpy()
+        return cand
 
+    def screen_stage(cand):
+        metrics = audio_metrics(cand["wav"], tts_model.sr, text_chunk, screening)
+        reason = screen_candidate(metrics, screening)
+        if reason is None and screening.get("min_speaker_similarity") is not None:
+            metrics["speaker_similarity"] = float(tts_model.speaker_similarity([cand["audio_16k"]], speaker_emb)[0])
+            reason = screen_candidate(metrics, screening)
+        cand["screen_score"] = screening_score(metrics, screening)
+        decision = f"REJECT ({reason})" if reason else "PASS"
+        logging.info(f"[Worker-{pid}] Screening chunk #{sentence_number}, attempt {cand['attempt']}: {decision}, score {cand['screen_score']:.2f} [{format_metrics(metrics)}]")
+        if reason:
+            cand["screen_reason"] = reason
+            cand.pop("audio_16k")
+        return cand
+
+    def asr_stage(cand):
+        if cand.get("screen_reason"):
+            cand['similarity_ratio'] = 0.0
+            return cand
+        ratio, transcript = 0.0, ""
         try:
-            wav_tensor = tts_model.generate(text_chunk, cfg_weight=cfg_weight, temperature=temperature, apply_watermark=not disable_watermark)
-            if not (torch.is_tensor(wav_tensor) and wav_tensor.numel() > tts_model.sr * 0.1):
-                logging.warning(f"Generation failed (empty audio) for chunk #{sentence_number}, attempt {attempt_num+1}.")
-                continue
-            
-            torchaudio.save(temp_path_str, wav_tensor.cpu(), tts_model.sr)
-            duration = wav_tensor.shape[-1] / tts_model.sr
-            
+            # Greedy decoding only, so validation never draws from the RNG the generate thread is seeded on.
+            # With the threshold, decoding stops as soon as the candidate can no longer pass.
+            transcript, ratio = asr.transcribe(cand.pop("audio_16k"), text_chunk, asr_threshold)
         except Exception as e:
-            logging.error(f"Generation crashed for chunk #{sentence_number}, attempt {attempt_num+1}: {e}", exc_info=True)
-            if Path(temp_path_str).exists(): os.remove(temp_path_str) # Clean up partial file
-            continue
+            logging.error(f"Whisper transcription failed for chunk #{sentence_number}, attempt {cand['attempt']}: {e}")
+        cand['similarity_ratio'] = ratio
+        cand['transcript'] = transcript or ""
+        return cand
 
-        current_candidate_data = {"path": temp_path_str, "duration": duration, "seed": seed}
+    timings = StageTimings()
+    stages = {"watermark": watermark_stage}
+    if not bypass_asr:
+        if screening:
+            stages["screen"] = screen_stage
+        stages["asr"] = asr_stage
+    pipeline = get_worker_pipeline(device_str)
+    # Set once this chunk is decided: its attempts still in the pipeline skip their remaining stages.
+    superseded = threading.Event()
+    in_flight = 0
 
+    passed_candidates = []
+    best_failed_candidate = None
+
+    def fallback_rank(cand):
+        # Any transcribed failure beats one screening rejected; then ASR similarity, then the screening score.
+        return not cand.get("screen_reason"), cand["similarity_ratio"], cand.get("screen_score", 0.0)
+
+    def handle_finished(cand):
+        """Applies one validated attempt, in attempt order, exactly as a sequential loop would."""
+        nonlocal best_failed_candidate
+        attempt_label = f"chunk #{sentence_number}, attempt {cand['attempt']}"
+        if len(passed_candidates) >= num_candidates:
+            # Speculative attempt the sequential loop would never have made.
+            return
+        if cand.get("error"):
+            logging.error(f"Candidate for {attempt_label} failed: {cand['error']}")
+            return
         if bypass_asr:
-            current_candidate_data['similarity_ratio'] = None 
-            passed_candidates.append(current_candidate_data)
-            logging.info(f"ASR bypassed for chunk #{sentence_number}, attempt {attempt_num+1}")
-            continue
+            cand['similarity_ratio'] = None
+            passed_candidates.append(cand)
+            logging.info(f"ASR bypassed for {attempt_label}")
+            return
 
-        # --- ASR Validation Logic ---
-        ratio = 0.0
-        try:
-            transcribed = whisper_model.transcribe(temp_path_str, fp16=(whisper_model.device.type == 'cuda'))['text']
-            ratio = get_similarity_ratio(text_chunk, transcribed)
-        except Exception as e:
-            logging.error(f"Whisper transcription failed for {temp_path_str}: {e}")
+        _WORKER_ASR_STATS["total"] += 1
+        if cand.get("screen_reason"):
+            logging.warning(f"Screening REJECTED {attempt_label}: {cand['screen_reason']} (score {cand['screen_score']:.2f}, skipped ASR)")
+            if best_failed_candidate is None or fallback_rank(cand) > fallback_rank(best_failed_candidate):
+                best_failed_candidate = cand
+            return
 
-        current_candidate_data['similarity_ratio'] = ratio
-        
+        ratio = cand['similarity_ratio']
         if ratio >= asr_threshold:
-            logging.info(f"ASR PASSED for chunk #{sentence_number}, attempt {attempt_num+1} (Sim: {ratio:.2f})")
-            passed_candidates.append(current_candidate_data)
+            _WORKER_ASR_STATS["passed"] += 1
+            logging.info(f"ASR PASSED for {attempt_label} (Sim: {ratio:.2f}, rung: {cand['escalation']})")
+            passed_candidates.append(cand)
         else:
-            logging.warning(f"ASR FAILED for chunk #{sentence_number}, attempt {attempt_num+1} (Sim: {ratio:.2f})")
-            # FIX: Simplified logic to robustly track the best failure
-            if best_failed_candidate is None or ratio > best_failed_candidate['similarity_ratio']:
-                # If there was a previous best failure, delete its audio file
-                if best_failed_candidate and Path(best_failed_candidate['path']).exists():
-                    os.remove(best_failed_candidate['path'])
-                best_failed_candidate = current_candidate_data
+            # An early reject only heard part of the chunk, so its tail shows up as missing.
+            mismatches = format_mismatches(mismatched_words(text_chunk, cand['transcript']))
+            logging.warning(f"ASR FAILED for {attempt_label} (Sim: {ratio:.2f}): {mismatches}")
+            if best_failed_candidate is None or fallback_rank(cand) > fallback_rank(best_failed_candidate):
+                best_failed_candidate = cand
+
+    def collect(block=False):
+        """Handles this chunk's attempts that have cleared the pipeline; with `block`, waits for at least one."""
+        nonlocal in_flight
+        got = 0
+        while True:
+            items = pipeline.poll()
+            if not items and block and not got:
+                items = [pipeline.next()]
+            if not items:
+                return
+            for cand in items:
+                if cand.get("skip") is not superseded:
+                    continue  # a superseded attempt of an earlier chunk
+                in_flight -= 1
+                got += 1
+                handle_finished(cand)
+
+    attempt_num = 0
+    try:
+        while attempt_num < max_attempts:
+            collect()
+            needed = num_candidates - len(passed_candidates)
+            if needed <= 0:
+                logging.info(f"Met required number of candidates ({num_candidates}). Stopping early.")
+                break
+            if _race_cancelled(key):
+                logging.info(f"[Worker-{pid}] Chunk #{sentence_number}{racer_label}: another copy already won. Stopping.")
+                break
+            if in_flight and not _should_speculate(in_flight, needed, bypass_asr):
+                collect(block=True)
+                continue
+
+            if master_seed != 0:
+                seed = master_seed + racer * max_attempts + attempt_num
             else:
-                # This attempt is worse than our stored best failure, so delete its audio
-                os.remove(temp_path_str)
+                seed = random.randint(1, 2**32 - 1)
+            attempt_num += 1
+            rung = rung_for_attempt(retry_ladder, attempt_num)
+            attempt_temperature, attempt_cfg_weight = apply_rung(rung, temperature, cfg_weight)
+            pieces = split_text(text_chunk) if rung.get("split") else [text_chunk]
+
+            escalation = "" if rung["name"] == "base" else f" [{rung['name']}: temp {attempt_temperature:.2f}, cfg {attempt_cfg_weight:.2f}, {len(pieces)} piece(s)]"
+            logging.info(f"[Worker-{pid}] Chunk #{sentence_number}, Attempt {attempt_num}/{max_attempts} with seed {seed}{escalation}")
+            set_seed(seed)
+
+            try:
+                with timings.time("generate"):
+                    wavs = [tts_model.generate(piece, exaggeration=min(exaggeration, 1.0), cfg_weight=attempt_cfg_weight, temperature=attempt_temperature, apply_watermark=False)
+                            for piece in pieces]
+                    if len(wavs) == 1:
+                        wav_tensor = wavs[0]
+                    else:
+                        pause = torch.zeros(wavs[0].shape[0], int(tts_model.sr * SPLIT_PAUSE_S), dtype=wavs[0].dtype, device=wavs[0].device)
+                        wav_tensor = torch.cat([part for wav in wavs for part in (wav, pause)][:-1], dim=-1)
+            except Exception as e:
+                logging.error(f"Generation crashed for chunk #{sentence_number}, attempt {attempt_num}: {e}", exc_info=True)
+                continue
+            if not (torch.is_tensor(wav_tensor) and wav_tensor.numel() > tts_model.sr * 0.1):
+                logging.warning(f"Generation failed (empty audio) for chunk #{sentence_number}, attempt {attempt_num}.")
+                continue
+
+            pipeline.submit({
+                "wav": wav_tensor.cpu(),
+                "duration": wav_tensor.shape[-1] / tts_model.sr,
+                "seed": seed,
+                "attempt": attempt_num,
+                "escalation": rung["name"],
+                "stages": stages,
+                "timings": timings,
+                "skip": superseded,
+            })
+            in_flight += 1
+    finally:
+        # Wait only for attempts that can still change the outcome.
+        while in_flight and len(passed_candidates) < num_candidates and not _race_cancelled(key):
+            collect(block=True)
+        superseded.set()
 
     # --- Final Selection Logic ---
-    final_wav_path = Path(output_dir_str) / session_name / "Sentence_wavs" / f"audio_{uuid}.wav"
+    final_wav_path = _chunk_wav_path(output_dir_str, session_name, uuid, racer)
     final_wav_path.parent.mkdir(exist_ok=True, parents=True)
     
     chosen_candidate = None
@@ -159,25 +406,28 @@ def worker_process_chunk(task_bundle):
         status = "failed_placeholder"
     
     # --- Finalize and Cleanup ---
-    if chosen_candidate:
-        # Move the chosen file to the final destination
-        if Path(chosen_candidate['path']).exists():
-            shutil.move(chosen_candidate['path'], final_wav_path)
-        
-        # Clean up any other temporary candidate files that might still exist
-        # This is for passed candidates that were not the shortest
-        for cand in passed_candidates:
-            if cand['path'] != chosen_candidate['path'] and Path(cand['path']).exists():
-                os.remove(cand['path'])
+    if _race_cancelled(key):
+        # Another copy of this chunk won the race; its audio is already in place.
+        return_payload.update({"status": "cancelled", "racer": racer})
+    elif chosen_candidate:
+        # The only file this chunk writes
+        with timings.time("write"):
+            torchaudio.save(str(final_wav_path), chosen_candidate['wav'], tts_model.sr)
 
         return_payload.update({
             "status": status,
             "path": str(final_wav_path),
             "seed": chosen_candidate.get('seed'),
-            "similarity_ratio": chosen_candidate.get('similarity_ratio')
+            "similarity_ratio": chosen_candidate.get('similarity_ratio'),
+            "escalation": chosen_candidate.get('escalation'),
+            "racer": racer,
         })
         logging.info(f"Chunk #{sentence_number} (Status: {status}) processed. Final audio: {final_wav_path.name}")
     else:
         return_payload.update({"status": "error", "error_message": "All generation attempts failed."})
 
-    return return_payload
\ No newline at end of file
+    timings.add("wall", time.perf_counter() - chunk_start)
+    _WORKER_TIMINGS.merge(timings)
+    return_payload.update({"stage_timings": timings.as_dict(), "attempts": attempt_num, "device": device_str})
+    logging.info(f"[Worker-{pid}] Chunk #{sentence_number} stage timings: {timings.summary()}")
+    return return_payload